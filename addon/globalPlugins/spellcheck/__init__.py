@@ -17,12 +17,21 @@ import languageHandler
 import winUser
 import NVDAObjects.behaviors
 from contextlib import suppress
+from functools import partial
 from scriptHandler import script
 from logHandler import log
 
 from .helpers import play_sound
 from .spellcheck_ui import SpellCheckMenu, SCRCAT__SPELLCHECK
+from .check_engine import SpellcheckJob
+from .filters import FilterChain, get_filter_rules
+from .suggestion_cache import SUGGESTION_CACHE
+from .warmup import DICTIONARY_WARMER
+from .script_routing import get_script_routed_dictionary
+from .language_resolver import load_mixed_script_lang_tags
+from .language_detection import get_detected_dictionary
 from .language_dictionary import (
+    DICTIONARY_CACHE,
     set_enchant_language_dictionaries_directory,
     get_all_possible_languages,
     get_enchant_language_dictionary,
@@ -48,6 +57,10 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
         super().__init__(*args, **kwargs)
         set_enchant_language_dictionaries_directory()
         self._active_spellcheck_language = None
+        self._spellcheck_job = None
+        self._spellcheck_progress_announced = False
+        DICTIONARY_WARMER.start()
+        DICTIONARY_CACHE.start_eviction()
         # Add menu item under Tools after GUI is ready
         wx.CallAfter(self._addToolsMenu)
 
@@ -60,6 +73,13 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
             # Log for diagnostics but avoid crashing the plugin
             log.exception("Failed to add Spellcheck settings to Tools menu")
 
+    def terminate(self):
+        self.cancel_spellcheck_job()
+        DICTIONARY_WARMER.stop()
+        DICTIONARY_CACHE.stop_eviction()
+        SUGGESTION_CACHE.save()
+        super().terminate()
+
     def on_language_variance_download(self, lang_tag):
         wx.CallAfter(LanguageDictionaryDownloader(lang_tag, ask_user=False).download)
 
@@ -92,13 +112,25 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
         text = self.getSelectedText()
         if not text:
             return
-        if self._active_spellcheck_language is None:
-            spellcheck_language = self.get_input_language(
-                api.getFocusObject().windowThreadID
-            )
-        else:
-            spellcheck_language = self._active_spellcheck_language
-        self.spellcheck(spellcheck_language, text)
+        focus = api.getFocusObject()
+        app_name = None
+        with suppress(Exception):
+            app_name = focus.appModule.appName
+        if self._active_spellcheck_language is not None:
+            self.spellcheck(self._active_spellcheck_language, text, app_name, focus)
+            return
+        # The languages of the paragraphs are detected on the check worker
+        self.start_spellcheck_job(
+            None,
+            text,
+            app_name,
+            resolve_dictionary=partial(
+                get_detected_dictionary,
+                fallback_lang_tag=self.get_input_language(focus.windowThreadID),
+                mixed_script_lang_tags=load_mixed_script_lang_tags(),
+            ),
+            focus=focus,
+        )
 
     @script(
         gesture="kb:nvda+alt+shift+l",
@@ -141,21 +173,111 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
                 _("Using the active Input language for spellchecking"),
             )
 
-    def spellcheck(self, language_tag, text_to_spellcheck):
+    def spellcheck(self, language_tag, text_to_spellcheck, app_name=None, focus=None):
         language_dictionary = self.obtain_language_dictionary(language_tag)
         if not language_dictionary:
             return
+        # Words written in other scripts go to the dictionaries configured for them
+        language_dictionary = get_script_routed_dictionary(
+            language_dictionary, load_mixed_script_lang_tags()
+        )
+        self.start_spellcheck_job(language_dictionary, text_to_spellcheck, app_name, focus=focus)
+
+    def start_spellcheck_job(
+        self, language_dictionary, text_to_spellcheck, app_name=None, resolve_dictionary=None, focus=None
+    ):
+        """Check the text on a worker; `focus` is the control the corrected text goes back to."""
+        self.cancel_spellcheck_job()
+        job = SpellcheckJob(
+            language_dictionary,
+            text_to_spellcheck,
+            filter_chain=FilterChain(get_filter_rules(app_name)),
+            resolve_dictionary=resolve_dictionary,
+            on_done=self.on_spellcheck_done,
+            on_first_misspelling=partial(self.on_first_misspelling, focus=focus),
+            on_progress=self.on_spellcheck_progress,
+            on_cancelled=self.on_spellcheck_finished,
+            on_error=self.on_spellcheck_error,
+        )
+        self._spellcheck_job = job
+        self._spellcheck_progress_announced = False
+        # Escape cancels the check for as long as it is running
+        self.bindGesture("kb:escape", "cancel_spellcheck")
+        job.start()
+
+    def script_cancel_spellcheck(self, gesture):
+        if self.cancel_spellcheck_job():
+            # translators: announced when the user cancels a running spellcheck.
+            ui.message(_("Spellcheck cancelled"))
+        else:
+            gesture.send()
+
+    def cancel_spellcheck_job(self):
+        """Cancel the running check, if any. Returns True if a check was cancelled."""
+        job = self._spellcheck_job
+        if job is None:
+            return False
+        job.cancel()
+        self.on_spellcheck_finished(job)
+        return True
+
+    def on_spellcheck_finished(self, job):
+        if job is not self._spellcheck_job:
+            return
+        self._spellcheck_job = None
+        with suppress(LookupError):
+            self.removeGestureBinding("kb:escape")
+
+    def on_spellcheck_progress(self, job, fraction):
+        if job is not self._spellcheck_job:
+            return
+        if not self._spellcheck_progress_announced:
+            self._spellcheck_progress_announced = True
+            # translators: announced when a spellcheck takes a while.
+            ui.message(_("Checking spelling, press escape to cancel"))
+        else:
+            # Same pitch curve as NVDA's progress bar beeps
+            tones.beep(110 * 2 ** (fraction * 4), 40)
+
+    def on_spellcheck_error(self, job, exception):
+        if job is not self._spellcheck_job:
+            return
+        self.on_spellcheck_finished(job)
+        if isinstance(exception, LanguageDictionaryNotAvailable):
+            self.on_language_dictionary_not_available(exception)
+            return
+        # translators: announced when the spellcheck failed unexpectedly.
+        ui.message(_("Could not check spelling"))
+
+    def on_spellcheck_done(self, job):
+        if job is not self._spellcheck_job:
+            return
+        self.on_spellcheck_finished(job)
+        if not len(job.misspellings):
+            # translators: announced when there are no spelling errors in a selected text.
+            ui.message("No spelling mistakes")
+
+    def on_first_misspelling(self, job, focus=None):
+        """Open the menu as soon as there is something to show; checking goes on meanwhile.
+
+        The menu belongs to `focus`, the control focused when the check
+        started, even if the focus has moved since.
+        """
+        if job is not self._spellcheck_job:
+            return
+        # From now on, Escape belongs to the menu, and closing the menu cancels the check
+        with suppress(LookupError):
+            self.removeGestureBinding("kb:escape")
+        self._spellcheck_progress_announced = True
         # Create our fake menu object
         misspellingsMenu = SpellCheckMenu(
             # translators: the name of the menu that shows up when the addon is being activated.
             name=_("Spelling Errors"),
-            language_dictionary=language_dictionary,
-            text_to_process=text_to_spellcheck,
+            parent=focus,
+            language_dictionary=job.language_dictionary,
+            text_to_process=job.text,
+            misspellings=job.misspellings,
         )
-        if not misspellingsMenu.items:
-            # translators: announced when there are no spelling errors in a selected text.
-            ui.message("No spelling mistakes")
-            return
         eventHandler.queueEvent("gainFocus", misspellingsMenu)
         queueHandler.queueFunction(
             queueHandler.eventQueue,
@@ -166,24 +288,30 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
     def obtain_language_dictionary(self, language_tag):
         try:
             return get_enchant_language_dictionary(language_tag)
-        except MultipleDownloadableLanguagesFound as e:
+        except LanguageDictionaryNotAvailable as e:
+            self.on_language_dictionary_not_available(e)
+        return False
+
+    def on_language_dictionary_not_available(self, error):
+        """Offer to download the missing dictionary, or tell the user there is none."""
+        if isinstance(error, MultipleDownloadableLanguagesFound):
             choice_dialog = LanguageChoiceDialog(
-                e.available_variances,
+                error.available_variances,
                 gui.mainFrame,
                 # Translators: message of a dialog containing language choices
                 _(
                     "Dialects found for language {lang}.\nPlease select the one you want to download."
-                ).format(lang=languageHandler.getLanguageDescription(e.language)),
+                ).format(lang=languageHandler.getLanguageDescription(error.language)),
                 # Translators: title of a dialog containing a list of languages
                 _("Dialects Found"),
             )
             gui.runScriptModalDialog(choice_dialog, self.on_language_variance_download)
-        except LanguageDictionaryDownloadable as e:
-            wx.CallAfter(LanguageDictionaryDownloader(e.language).download)
-        except LanguageDictionaryNotAvailable as e:
-            lang = languageHandler.getLanguageDescription(e.language)
+        elif isinstance(error, LanguageDictionaryDownloadable):
+            wx.CallAfter(LanguageDictionaryDownloader(error.language).download)
+        else:
+            lang = languageHandler.getLanguageDescription(error.language)
             if lang is None:
-                lang = e.language
+                lang = error.language
             queueHandler.queueFunction(
                 queueHandler.eventQueue,
                 ui.message,
@@ -191,7 +319,6 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
                     lang=lang
                 ),
             )
-        return False
 
     @staticmethod
     def get_input_language(thread_id):
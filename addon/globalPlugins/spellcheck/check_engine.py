@@ -0,0 +1,588 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Spellchecking.
+check_text checks a text and returns its misspellings as a compact
+CheckResult. Tokenizing and checking a large selection can take a while, so
+the add-on does it on a worker thread with a SpellcheckJob. Misspellings are published to a MisspellingStream as soon as
+they are found, and progress is handed back to NVDA's main thread through
+queueHandler. Very large texts are split at line breaks into shards, which
+are checked on a small pool of threads: ctypes releases the GIL while
+hunspell looks a word up, so the lookups of different shards overlap.
+"""
+
+import os
+import queue
+import threading
+import time
+import queueHandler
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from logHandler import log
+from .language_dictionary import DICTIONARY_CACHE, get_dictionary_lock, LanguageDictionaryNotAvailable
+from .normalization import get_normalizer
+from .script_routing import RoutingDictionary
+from .language_detection import MultilingualDictionary
+from .tokenizers import get_tokenizer
+# Registers the tokenizers of scripts written without spaces
+from . import segmentation  # noqa: F401
+
+
+# Seconds to wait before reporting progress, so that short checks stay silent
+PROGRESS_REPORT_DELAY = 0.5
+# Seconds between two progress reports
+PROGRESS_REPORT_INTERVAL = 1.0
+# Number of tokens checked between two looks at the cancel flag and the clock
+PROGRESS_CHECK_EVERY = 256
+# Texts of at least this many characters are checked in parallel shards
+PARALLEL_CHECK_THRESHOLD = 1_000_000
+# Characters per shard, the shard ends at the next line break
+SHARD_SIZE = 256 * 1024
+# Threads checking shards, each with a dictionary of its own. One means never in parallel
+PARALLEL_CHECK_WORKERS = min(4, os.cpu_count() or 1)
+
+
+# A misspelled word, and where it is in the checked text
+Misspelling = namedtuple("Misspelling", "word offset length")
+
+
+class SpellcheckCancelled(Exception):
+    """Raised inside the worker when the user cancels the check."""
+
+
+class MisspellingStream:
+    """A thread-safe list of misspellings that grows while the text is checked.
+
+    The worker appends to it, and the UI reads from it, waiting
+    when it needs an item that has not been found yet. The misspellings
+    are stored in `result`, a CheckResult.
+    """
+
+    def __init__(self):
+        self.result = CheckResult()
+        # word -> offsets of its occurrences, in document order
+        self._positions = {}
+        self._condition = threading.Condition()
+        self._finished = False
+        self.cancel_event = threading.Event()
+
+    @classmethod
+    def from_result(cls, result):
+        """Return a finished stream of the misspellings of `result`, a CheckResult."""
+        stream = cls()
+        for misspelling in result:
+            stream.append(misspelling)
+        stream.result.statistics = result.statistics
+        stream.finish()
+        return stream
+
+    def __len__(self):
+        return len(self.result)
+
+    def __getitem__(self, index):
+        return self.result[index]
+
+    def __iter__(self):
+        # Only the misspellings found so far
+        for index in range(len(self.result)):
+            yield self.result[index]
+
+    @property
+    def is_finished(self):
+        """True once no more misspellings will be added."""
+        return self._finished
+
+    @property
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def append(self, misspelling):
+        with self._condition:
+            self.result.append(misspelling)
+            self._positions.setdefault(misspelling.word, []).append(misspelling.offset)
+            self._condition.notify_all()
+
+    def positions_of(self, word):
+        """Return the offsets of every occurrence of `word` found so far."""
+        with self._condition:
+            return list(self._positions.get(word, ()))
+
+    def finish(self):
+        with self._condition:
+            self._finished = True
+            self._condition.notify_all()
+
+    def cancel(self):
+        """Ask the worker to stop looking for misspellings."""
+        self.cancel_event.set()
+
+    def wait_for(self, count, timeout=None):
+        """Wait until the stream holds more than `count` items, or is finished.
+
+        Returns True if the item at index `count` is available.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: len(self.result) > count or self._finished, timeout
+            )
+            return len(self.result) > count
+
+
+class CheckStatistics:
+    """Counts the dictionary work done by one checking pass."""
+
+    def __init__(self):
+        self.tokens = 0
+        self.dictionary_lookups = 0
+        # Words dropped by the filter chain before any lookup
+        self.skipped_by_filters = 0
+
+    def add(self, other):
+        """Add the counts of `other`, a CheckStatistics, to these."""
+        self.tokens += other.tokens
+        self.dictionary_lookups += other.dictionary_lookups
+        self.skipped_by_filters += other.skipped_by_filters
+
+    @property
+    def lookups_saved(self):
+        return self.tokens - self.dictionary_lookups
+
+    @property
+    def hit_rate(self):
+        """Fraction of tokens whose verdict was already known."""
+        if not self.tokens:
+            return 0.0
+        return self.lookups_saved / self.tokens
+
+    def __str__(self):
+        return (
+            f"{self.tokens} tokens, {self.dictionary_lookups} distinct words looked up, "
+            f"{self.lookups_saved} lookups saved ({self.hit_rate:.1%} hit rate), "
+            f"{self.skipped_by_filters} words skipped by filters"
+        )
+
+
+class _WordChecker:
+    """Finds the misspelled words of a text, and can be cancelled.
+
+    The text is tokenized as the immutable str it is given, and words
+    are handled with their integer offsets into it, so the text is never
+    copied. Each distinct word is looked up in the dictionary only once per
+    pass; the verdict is reused for every other occurrence of the word.
+    Words are found by the tokenizer registered for the language, and
+    those the filter chain skips are never looked up. Checkers working on
+    parts of the same text may share their `verdicts`. Lookups are made
+    under `dictionary_lock`, by default the one shared by every user of
+    the dictionary.
+    """
+
+    def __init__(
+        self,
+        language_dictionary,
+        cancel_event,
+        progress_callback=None,
+        tokenizer=None,
+        filter_chain=None,
+        verdicts=None,
+        statistics=None,
+        dictionary_lock=None,
+    ):
+        self.language_dictionary = language_dictionary
+        self.dictionary_lock = (
+            get_dictionary_lock(language_dictionary) if dictionary_lock is None else dictionary_lock
+        )
+        self.cancel_event = cancel_event
+        self.progress_callback = progress_callback
+        self.tokenizer = tokenizer or get_tokenizer(getattr(language_dictionary, "tag", None))
+        self.filter_chain = filter_chain
+        self.statistics = statistics if statistics is not None else CheckStatistics()
+        # word -> bool, as returned by the dictionary
+        self._verdicts = {} if verdicts is None else verdicts
+
+    def iter_misspellings(self, text):
+        """Yield a Misspelling for every misspelled word of `text`, in order.
+
+        Raises SpellcheckCancelled if the cancel event gets set.
+        """
+        statistics = self.statistics
+        verdicts = self._verdicts
+        check = self.language_dictionary.check
+        dictionary_lock = self.dictionary_lock
+        cancel_event = self.cancel_event
+        progress_callback = self.progress_callback
+        tokens = self.tokenizer(text)
+        if self.filter_chain:
+            tokens = self.filter_chain.filter(text, tokens, statistics)
+        for word, position in tokens:
+            statistics.tokens += 1
+            if not statistics.tokens % PROGRESS_CHECK_EVERY:
+                if cancel_event.is_set():
+                    raise SpellcheckCancelled
+                if progress_callback is not None:
+                    progress_callback(position)
+            is_correct = verdicts.get(word)
+            if is_correct is None:
+                with dictionary_lock:
+                    is_correct = verdicts[word] = check(word)
+                statistics.dictionary_lookups += 1
+            if not is_correct:
+                yield Misspelling(word, position, len(word))
+
+
+def split_into_shards(text, shard_size=SHARD_SIZE):
+    """Return the (start, end) spans of `text`, cut after the first line break past every `shard_size` characters.
+
+    No word spans a line break, so checking the shards finds the same words as checking the whole text.
+    """
+    shards = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = text.find("\n", start + shard_size)
+        end = length if end == -1 else end + 1
+        shards.append((start, end))
+        start = end
+    return shards
+
+
+class CheckResult:
+    """The misspellings of a text, stored compactly.
+
+    A misspelling takes three integers, in arrays: its offset and length in
+    the text, and the id of its word. Each distinct word is stored once in
+    `words`, in the order it was first found, and its id is its index
+    there. Indexing returns Misspelling tuples, built on demand.
+    """
+
+    def __init__(self):
+        self.offsets = array("q")
+        self.lengths = array("l")
+        self.word_ids = array("l")
+        self.words = []
+        # word -> id
+        self._word_ids = {}
+        self.statistics = CheckStatistics()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        return Misspelling(self.words[self.word_ids[index]], self.offsets[index], self.lengths[index])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def append(self, misspelling):
+        word_id = self._word_ids.get(misspelling.word)
+        if word_id is None:
+            word_id = self._word_ids[misspelling.word] = len(self.words)
+            self.words.append(misspelling.word)
+        self.word_ids.append(word_id)
+        self.lengths.append(misspelling.length)
+        # Last, as the length of the result, for readers on other threads
+        self.offsets.append(misspelling.offset)
+
+    def get_word_id(self, word):
+        """Return the id of `word`, or None if it was not found misspelled."""
+        return self._word_ids.get(word)
+
+
+# How to check a text, every option left to None takes the default of the language
+CheckOptions = namedtuple(
+    "CheckOptions",
+    "tokenizer filter_chain normalizer parallel_threshold workers",
+    defaults=(None, None, None, None, None),
+)
+
+
+def check_text(language_dictionary, text, options=CheckOptions(), cancel_event=None, progress_callback=None):
+    """Check `text` with `language_dictionary` and return a CheckResult.
+
+    This is the whole check, in the calling thread; see iter_misspellings.
+    """
+    result = CheckResult()
+    for misspelling in iter_misspellings(
+        language_dictionary, text, options, cancel_event, progress_callback, result.statistics
+    ):
+        result.append(misspelling)
+    return result
+
+
+def iter_misspellings(
+    language_dictionary,
+    text,
+    options=CheckOptions(),
+    cancel_event=None,
+    progress_callback=None,
+    statistics=None,
+):
+    """Yield a Misspelling for every misspelled word of `text`, in document order.
+
+    The text is normalized, split into words by the tokenizer, passed
+    through the filter chain, and checked in shards on several threads if
+    it has at least `parallel_threshold` characters. Misspellings have
+    offsets and lengths in `text` itself.
+    `progress_callback(position)` is called every now and then, and counts
+    are added to `statistics`, a CheckStatistics.
+    Raises SpellcheckCancelled if `cancel_event` gets set.
+    """
+    cancel_event = cancel_event or threading.Event()
+    statistics = statistics if statistics is not None else CheckStatistics()
+    if isinstance(language_dictionary, MultilingualDictionary):
+        yield from _iter_multilingual_misspellings(
+            language_dictionary, text, options, cancel_event, progress_callback, statistics
+        )
+        return
+    lang_tag = getattr(language_dictionary, "tag", None)
+    normalizer = options.normalizer or get_normalizer(lang_tag)
+    normalized_text, offset_map = normalizer.normalize(text)
+    misspellings = _iter_normalized_misspellings(
+        language_dictionary, normalized_text, options, cancel_event, progress_callback, statistics
+    )
+    if offset_map is None:
+        yield from misspellings
+        return
+    for misspelling in misspellings:
+        offset, length = offset_map.to_original_span(misspelling.offset, misspelling.length)
+        yield misspelling._replace(offset=offset, length=length)
+
+
+def _iter_multilingual_misspellings(language_dictionary, text, options, cancel_event, progress_callback, statistics):
+    """Check each run of `text` with its own dictionary, normalization and tokenizer."""
+    for start, end, run_dictionary in language_dictionary.runs:
+        run_progress_callback = None
+        if progress_callback is not None:
+            run_progress_callback = partial(_shifted_progress, progress_callback, start)
+        for misspelling in iter_misspellings(
+            run_dictionary, text[start:end], options, cancel_event, run_progress_callback, statistics
+        ):
+            language_dictionary.assign(misspelling.word, run_dictionary)
+            yield misspelling._replace(offset=start + misspelling.offset)
+
+
+def _shifted_progress(progress_callback, start, position):
+    progress_callback(start + position)
+
+
+def _iter_normalized_misspellings(language_dictionary, text, options, cancel_event, progress_callback, statistics):
+    workers = PARALLEL_CHECK_WORKERS if options.workers is None else options.workers
+    parallel_threshold = (
+        PARALLEL_CHECK_THRESHOLD if options.parallel_threshold is None else options.parallel_threshold
+    )
+    shards = []
+    if workers > 1 and len(text) >= parallel_threshold:
+        shards = split_into_shards(text)
+    # Handles are loaded for a single language, so routed texts are checked in one piece
+    if len(shards) > 1 and not isinstance(language_dictionary, RoutingDictionary):
+        try:
+            handles = DICTIONARY_CACHE.request_handles(
+                language_dictionary.tag, min(workers, len(shards))
+            )
+        except Exception:
+            log.exception("Could not load dictionaries for checking in parallel")
+        else:
+            yield from _iter_misspellings_in_parallel(
+                language_dictionary, text, shards, handles, options, cancel_event, progress_callback, statistics
+            )
+            return
+    checker = _WordChecker(
+        language_dictionary,
+        cancel_event,
+        progress_callback=progress_callback,
+        tokenizer=options.tokenizer,
+        filter_chain=options.filter_chain,
+        statistics=statistics,
+    )
+    yield from checker.iter_misspellings(text)
+
+
+def _iter_misspellings_in_parallel(
+    language_dictionary, text, shards, handles, options, cancel_event, progress_callback, statistics
+):
+    """Check `shards` on a pool of threads, one per DictionaryHandle, yielding in document order.
+
+    Each handle has a hunspell instance of its own, so the threads never
+    wait for one another. Only a few shards are checked ahead of the one
+    being yielded, so memory stays bounded. The handles were loaded before
+    any word the user has added since, so the misspellings they find are
+    confirmed with the shared dictionary.
+    """
+    free_handles = queue.SimpleQueue()
+    for handle in handles:
+        free_handles.put(handle)
+    verdicts = {}
+
+    def check_shard(start, end):
+        handle = free_handles.get()
+        try:
+            checker = _WordChecker(
+                handle.dictionary,
+                cancel_event,
+                tokenizer=options.tokenizer,
+                filter_chain=options.filter_chain,
+                verdicts=verdicts,
+                dictionary_lock=handle.lock,
+            )
+            found = [
+                misspelling._replace(offset=start + misspelling.offset)
+                for misspelling in checker.iter_misspellings(text[start:end])
+            ]
+            return found, checker.statistics
+        finally:
+            free_handles.put(handle)
+
+    check = language_dictionary.check
+    dictionary_lock = get_dictionary_lock(language_dictionary)
+    # word -> bool, as returned by the shared dictionary
+    confirmed = {}
+    remaining_shards = iter(shards)
+    pending = deque()
+    executor = ThreadPoolExecutor(len(handles), thread_name_prefix="spellcheck-shard")
+    try:
+        for start, end in remaining_shards:
+            pending.append((end, executor.submit(check_shard, start, end)))
+            if len(pending) == 2 * len(handles):
+                break
+        while pending:
+            end, future = pending.popleft()
+            found, shard_statistics = future.result()
+            for start, next_end in remaining_shards:
+                pending.append((next_end, executor.submit(check_shard, start, next_end)))
+                break
+            statistics.add(shard_statistics)
+            for misspelling in found:
+                is_correct = confirmed.get(misspelling.word)
+                if is_correct is None:
+                    with dictionary_lock:
+                        is_correct = confirmed[misspelling.word] = check(misspelling.word)
+                if not is_correct:
+                    yield misspelling
+            if progress_callback is not None:
+                progress_callback(end)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+class SpellcheckJob:
+    """Checks a text on a worker thread.
+
+    Misspellings are appended to `self.misspellings` as they are found.
+    All callbacks are called on NVDA's main thread, with the job as first argument:
+      - on_first_misspelling(job): as soon as the first misspelling has been found
+      - on_done(job): once the whole text has been checked
+      - on_progress(job, fraction): periodically for long checks, fraction is in [0, 1]
+      - on_cancelled(job): if cancel() was called before the check finished
+      - on_error(job, exception): if checking failed
+    If `language_dictionary` is None, `resolve_dictionary(text)` is called on
+    the worker thread to get it, and may raise LanguageDictionaryNotAvailable.
+    The remaining arguments are the CheckOptions of the check.
+    """
+
+    def __init__(
+        self,
+        language_dictionary,
+        text,
+        on_done,
+        on_first_misspelling=None,
+        on_progress=None,
+        on_cancelled=None,
+        on_error=None,
+        filter_chain=None,
+        parallel_threshold=None,
+        workers=None,
+        resolve_dictionary=None,
+    ):
+        self.language_dictionary = language_dictionary
+        self.resolve_dictionary = resolve_dictionary
+        self.text = text
+        self.options = CheckOptions(
+            filter_chain=filter_chain,
+            parallel_threshold=parallel_threshold,
+            workers=workers,
+        )
+        self.on_done = on_done
+        self.on_first_misspelling = on_first_misspelling
+        self.on_progress = on_progress
+        self.on_cancelled = on_cancelled
+        self.on_error = on_error
+        self.misspellings = MisspellingStream()
+        self.statistics = CheckStatistics()
+        self._thread = None
+        self._started_at = None
+        self._last_report = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def is_cancelled(self):
+        return self.misspellings.is_cancelled
+
+    def start(self):
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._run, name="spellcheck-worker", daemon=True
+        )
+        self._thread.start()
+
+    def cancel(self):
+        self.misspellings.cancel()
+
+    def _run(self):
+        misspellings = self.misspellings
+        try:
+            if self.language_dictionary is None:
+                self.language_dictionary = self.resolve_dictionary(self.text)
+            for misspelling in iter_misspellings(
+                self.language_dictionary,
+                self.text,
+                self.options,
+                misspellings.cancel_event,
+                self._report_progress,
+                self.statistics,
+            ):
+                misspellings.append(misspelling)
+                if len(misspellings) == 1:
+                    self._call_on_main_thread(self.on_first_misspelling)
+        except SpellcheckCancelled:
+            misspellings.finish()
+            self._call_on_main_thread(self.on_cancelled)
+            return
+        except LanguageDictionaryNotAvailable as e:
+            misspellings.finish()
+            self._call_on_main_thread(self.on_error, e)
+            return
+        except Exception as e:
+            log.exception("Spellcheck failed")
+            misspellings.finish()
+            self._call_on_main_thread(self.on_error, e)
+            return
+        misspellings.finish()
+        log.debug(f"Spellcheck statistics: {self.statistics}")
+        if self.is_cancelled:
+            self._call_on_main_thread(self.on_cancelled)
+        else:
+            self._call_on_main_thread(self.on_done)
+
+    def _report_progress(self, position):
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        if now - self._started_at < PROGRESS_REPORT_DELAY:
+            return
+        if self._last_report is not None and now - self._last_report < PROGRESS_REPORT_INTERVAL:
+            return
+        self._last_report = now
+        fraction = position / len(self.text) if self.text else 1.0
+        self._call_on_main_thread(self.on_progress, fraction)
+
+    def _call_on_main_thread(self, func, *args):
+        if func is not None:
+            queueHandler.queueFunction(queueHandler.eventQueue, func, self, *args)
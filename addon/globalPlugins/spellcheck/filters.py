@@ -0,0 +1,217 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Filters skipping text that is not prose before it reaches the dictionary.
+URLs, e-mail addresses, hashtags, identifiers and numbers found in pasted
+logs or code are never in a dictionary: looking them up is wasted work, and
+each of them would end up as a misspelling with a slow suggestion lookup.
+Which filters are used depends on the application the text comes from.
+"""
+
+import re
+from collections import namedtuple
+from .helpers import import_bundled_library
+from .tokenizers import whitespace_tokenize
+
+
+with import_bundled_library():
+    from enchant.tokenize import (
+        Filter,
+        URLFilter,
+        EmailFilter,
+        HashtagFilter,
+        MentionFilter,
+        WikiWordFilter,
+    )
+
+
+class IdentifierFilter(Filter):
+    r"""Filter skipping over identifiers from source code.
+    This filter skips any words containing an underscore, a letter next to a
+    digit, a lowercase letter followed by an uppercase one, or a member access
+    (., :: or ->) between two word characters, such as snake_case, camelCase,
+    utf8 or os.path.
+    """
+
+    _pattern = re.compile(r"_|[^\W\d_]\d|\d[^\W\d_]|[a-z][A-Z]|\w(?:\.|::|->)\w")
+
+    def _skip(self, word):
+        return self._pattern.search(word) is not None
+
+
+class NumberFilter(Filter):
+    r"""Filter skipping over numbers, with their units or ordinal suffixes.
+    This filter skips any words starting with a digit, optionally after a
+    sign, currency or version prefix, such as 42, 3.14, 1st, 10km, -5°C,
+    $20, v2.1 or 0x1F.
+    """
+
+    _pattern = re.compile(r"^[-+±~$€£¥#]?(?:[vV]|0[xX])?\d")
+
+    def _skip(self, word):
+        return self._pattern.match(word) is not None
+
+
+# name -> filter class, skipping whitespace delimited chunks
+FILTERS = {
+    "url": URLFilter,
+    "email": EmailFilter,
+    "mention": MentionFilter,
+    "hashtag": HashtagFilter,
+    "wikiword": WikiWordFilter,
+    "identifier": IdentifierFilter,
+    "number": NumberFilter,
+}
+# name -> pattern found in every chunk the filter skips, so that other chunks need no look
+FILTER_HINTS = {
+    "url": r"://",
+    "email": r"@",
+    "mention": r"@",
+    "hashtag": r"#",
+    "wikiword": r"[A-Z]",
+    "identifier": r"[_\d.:>]|[a-z][A-Z]",
+    "number": r"\d",
+}
+# A tag, or a lone "<"
+_HTML_SEPARATOR = re.compile(r"<(?:/|(?=[^\W\d_]))[^>]*>|<")
+
+
+def iter_html_text_spans(text):
+    """Yield the (start, end) spans of `text` outside HTML tags.
+
+    These are the chunks enchant's HTMLChunker yields, found with a regex
+    instead of a character by character walk.
+    """
+    start = 0
+    for match in _HTML_SEPARATOR.finditer(text):
+        if match.start() > start:
+            yield start, match.start()
+        start = match.end()
+    if start < len(text):
+        yield start, len(text)
+
+
+# name -> chunker, yielding the spans of a text which hold checkable content
+CHUNKERS = {
+    "html": iter_html_text_spans,
+}
+
+# Names of the filters and chunkers applied to a text
+FilterRules = namedtuple("FilterRules", "filters chunkers")
+
+DEFAULT_FILTER_RULES = FilterRules(
+    filters=("url", "email", "mention", "hashtag", "number"),
+    chunkers=(),
+)
+CODE_FILTER_RULES = FilterRules(
+    filters=DEFAULT_FILTER_RULES.filters + ("identifier", "wikiword"),
+    chunkers=("html",),
+)
+TERMINAL_FILTER_RULES = FilterRules(
+    filters=DEFAULT_FILTER_RULES.filters + ("identifier",),
+    chunkers=(),
+)
+# NVDA app module name -> rules for the text selected in that application
+APP_FILTER_RULES = {
+    "code": CODE_FILTER_RULES,
+    "devenv": CODE_FILTER_RULES,
+    "notepad++": CODE_FILTER_RULES,
+    "sublime_text": CODE_FILTER_RULES,
+    "idea64": CODE_FILTER_RULES,
+    "pycharm64": CODE_FILTER_RULES,
+    "eclipse": CODE_FILTER_RULES,
+    "windowsterminal": TERMINAL_FILTER_RULES,
+    "cmd": TERMINAL_FILTER_RULES,
+    "conhost": TERMINAL_FILTER_RULES,
+    "powershell": TERMINAL_FILTER_RULES,
+    "putty": TERMINAL_FILTER_RULES,
+}
+
+
+def get_filter_rules(app_name=None):
+    """Return the rules for text selected in the application with the given app module name."""
+    return APP_FILTER_RULES.get((app_name or "").lower(), DEFAULT_FILTER_RULES)
+
+
+class FilterChain:
+    """Drops the words of a text lying in chunks skipped by a filter.
+
+    As in enchant's SpellChecker, chunkers leave out parts of the text, the
+    rest is split on whitespace, and each filter may skip a whole chunk. The
+    words found by the language tokenizer are only kept if their chunk
+    survived, so filtering works with any tokenizer, including segmenting
+    ones. Chunks that contain none of the filters' hints cannot be skipped,
+    so they are found with one regex scan and never looked at in Python.
+    """
+
+    def __init__(self, rules=DEFAULT_FILTER_RULES):
+        self.rules = rules
+        self._skip_functions = [FILTERS[name](None)._skip for name in rules.filters]
+        self._chunkers = [CHUNKERS[name] for name in rules.chunkers]
+        hints = [FILTER_HINTS.get(name) for name in rules.filters]
+        self._candidate_pattern = None
+        if hints and all(hints):
+            # Whole chunks containing a hint
+            self._candidate_pattern = re.compile(f"(?<!\\S)\\S*(?:{'|'.join(hints)})\\S*")
+
+    def __bool__(self):
+        return bool(self._skip_functions or self._chunkers)
+
+    def _skips(self, chunk):
+        return any(skip(chunk) for skip in self._skip_functions)
+
+    def _iter_regions(self, text):
+        """Yield the (start, end) spans of `text` left by the chunkers."""
+        regions = [(0, len(text))]
+        for chunker in self._chunkers:
+            regions = [
+                (region_start + start, region_start + end)
+                for region_start, region_end in regions
+                for start, end in chunker(text[region_start:region_end])
+            ]
+        return regions
+
+    def iter_checked_spans(self, text):
+        """Yield the (start, end) spans of `text` whose words are to be checked, in order."""
+        for region_start, region_end in self._iter_regions(text):
+            region = text if region_end - region_start == len(text) else text[region_start:region_end]
+            for start, end in self._iter_checked_region_spans(region):
+                yield region_start + start, region_start + end
+
+    def _iter_checked_region_spans(self, text):
+        if self._candidate_pattern is None:
+            for chunk, position in whitespace_tokenize(text):
+                if not self._skips(chunk):
+                    yield position, position + len(chunk)
+            return
+        # Only chunks containing a hint may be skipped: the spans between them are checked
+        strip_from_start = whitespace_tokenize.strip_from_start
+        strip_from_end = whitespace_tokenize.strip_from_end
+        checked_start = 0
+        for match in self._candidate_pattern.finditer(text):
+            chunk = match.group()
+            start = len(chunk) - len(chunk.lstrip(strip_from_start))
+            end = len(chunk.rstrip(strip_from_end))
+            if start < end and self._skips(chunk[start:end]):
+                yield checked_start, match.start() + start
+                checked_start = match.start() + end
+        yield checked_start, len(text)
+
+    def filter(self, text, tokens, statistics=None):
+        """Yield the `(word, position)` tokens of `text` which are not skipped.
+
+        The number of dropped words is added to `statistics.skipped_by_filters`.
+        """
+        spans = self.iter_checked_spans(text)
+        end_of_text = (len(text) + 1, len(text) + 1)
+        span_start, span_end = next(spans, end_of_text)
+        for word, position in tokens:
+            while span_end <= position:
+                span_start, span_end = next(spans, end_of_text)
+            if span_start <= position and position + len(word) <= span_end:
+                yield word, position
+            elif statistics is not None:
+                statistics.skipped_by_filters += 1
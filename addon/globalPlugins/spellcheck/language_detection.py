@@ -0,0 +1,492 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Language detection.
+The keyboard layout of the focused window says little about the language
+of pasted text. Each paragraph is scored against character n-gram
+profiles of the installed dictionaries, built once per dictionary version
+and cached on disk, and checked with the dictionary of its language. The
+input language is only used when no paragraph can be told apart.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, namedtuple
+from functools import partial
+from itertools import repeat
+from operator import add
+from logHandler import log
+from .language_dictionary import (
+    SPELLCHECK_DICTIONARIES_DIRECTORY,
+    get_installed_dictionary_files,
+    get_installed_dictionary_version,
+    replace_file,
+    get_enchant_language_dictionary,
+    add_dictionary_change_listener,
+    is_affected_by_dictionary_change,
+    LanguageDictionaryNotAvailable,
+)
+from .script_routing import (
+    RoutingDictionary,
+    get_language_script,
+    get_script,
+    get_script_routed_dictionary,
+)
+from .tokenizers import get_text_word_pattern
+from .word_index import read_aff_encoding, read_dictionary_entries
+
+
+PROFILE_CACHE_DIRECTORY = os.path.join(SPELLCHECK_DICTIONARIES_DIRECTORY, "language_profiles")
+# Bump when the format of the cached profiles, or the way they are built, changes
+PROFILE_FORMAT = 1
+# Lengths of the character n-grams a language is recognized by
+NGRAM_LENGTHS = (1, 2, 3)
+# Number of the most frequent n-grams of each length kept in the profile of a dictionary
+PROFILE_SIZE = 1000
+# Dictionary words a profile is built from, evenly spread over the .dic file
+PROFILE_MAX_WORDS = 100_000
+# Only the start of a paragraph is scored, which is plenty to recognize its language
+MAX_DETECTION_CHARACTERS = 200
+# Words whose scores are remembered, for each script
+MAX_SCORED_WORDS = 100_000
+# Words of a paragraph whose script is looked at
+SCRIPT_SAMPLE_SIZE = 5
+# Paragraphs with fewer letters are too short to be told apart from their neighbours
+MIN_DETECTION_LETTERS = 16
+# Lowest difference in the log probability of a paragraph between the best language and the next one
+CONFIDENCE_MARGIN = 10.0
+# Highest shortfall of the best score from the score of the dictionary's own words
+MAX_SCORE_SHORTFALL = 2.0
+# Log probability given to n-grams the dictionary never has, below its rarest n-gram of the same length
+UNSEEN_NGRAM_PENALTY = 1.5
+# A line break, with any blank lines after it
+_PARAGRAPH_SEPARATOR = re.compile(r"\n\s*")
+
+# A part of a text, and the language tag it is in
+LanguageRun = namedtuple("LanguageRun", "start end lang_tag")
+# A part of a text, and the dictionary it is checked with
+DictionaryRun = namedtuple("DictionaryRun", "start end dictionary")
+# log_probabilities: n-gram -> log probability among the n-grams of its length, for the most frequent ones
+# unseen: n-gram length -> log probability of each n-gram of that length missing from log_probabilities
+# typical_score: the mean log probability per n-gram of the dictionary's own words
+LanguageProfile = namedtuple("LanguageProfile", "lang_tag script log_probabilities unseen typical_score")
+
+
+def get_ngrams(words, length):
+    """Return the list of the n-grams of `length` of `words`, each padded with a space on both sides."""
+    if length == 1:
+        return list("".join(words))
+    text = f" {' '.join(words)} "
+    if length == 2:
+        return list(map(add, text, text[1:]))
+    # Longer n-grams holding a space other than at their ends would join two words
+    return [
+        text[index:index + length]
+        for index in range(len(text) - length + 1)
+        if " " not in text[index + 1:index + length - 1]
+    ]
+
+
+def build_profile(lang_tag, words, size=PROFILE_SIZE):
+    """Return the LanguageProfile of `lang_tag` made from the lowercase `words`."""
+    ngrams = {length: get_ngrams(words, length) for length in NGRAM_LENGTHS}
+    log_probabilities = {}
+    unseen = {}
+    for length, items in ngrams.items():
+        counts = Counter(items)
+        total = sum(counts.values()) or 1
+        most_common = counts.most_common(size)
+        log_probabilities.update((ngram, math.log(count / total)) for ngram, count in most_common)
+        left_out = len(counts) - len(most_common)
+        if left_out:
+            # The n-grams left out of the profile share what is left of the probability
+            left_out_count = total - sum(count for _ngram, count in most_common)
+            unseen[length] = math.log(left_out_count / left_out / total)
+        else:
+            unseen[length] = math.log(min((count for _ngram, count in most_common), default=1) / total)
+            unseen[length] -= UNSEEN_NGRAM_PENALTY
+    profile = LanguageProfile(lang_tag, get_language_script(lang_tag), log_probabilities, unseen, 0.0)
+    count = sum(len(items) for items in ngrams.values()) or 1
+    return profile._replace(typical_score=score_ngrams(profile, ngrams) / count)
+
+
+def score_ngrams(profile, ngrams):
+    """Return the log probability under `profile` of `ngrams`, lists of n-grams by length."""
+    get = profile.log_probabilities.get
+    return sum(sum(map(get, items, repeat(profile.unseen[length]))) for length, items in ngrams.items())
+
+
+class _WordScorer:
+    """Scores words under the profiles of the languages written in one script.
+
+    N-grams never span two words, so the score of a text is the sum of the
+    scores of its words. Those are remembered, and each word is scored
+    only the first time it is seen, from a table of the log probabilities
+    of each n-gram under all the profiles at once.
+    """
+
+    def __init__(self, profiles):
+        self.profiles = tuple(profiles)
+        # n-gram length -> log probability under each profile of an n-gram none of them has
+        self._unseen = {
+            length: tuple(profile.unseen[length] for profile in self.profiles) for length in NGRAM_LENGTHS
+        }
+        # n-gram -> log probability under each profile
+        self._table = {}
+        for ngram in set().union(*(profile.log_probabilities for profile in self.profiles)):
+            unseen = self._unseen[len(ngram)]
+            self._table[ngram] = tuple(
+                profile.log_probabilities.get(ngram, unseen[index]) for index, profile in enumerate(self.profiles)
+            )
+        # word -> (log probability under each profile, ..., number of n-grams)
+        self._scores = {}
+
+    def score(self, words):
+        """Return the log probabilities of `words` under the profiles, and their number of n-grams."""
+        scores = self._scores
+        new_words = [word for word in dict.fromkeys(words) if word not in scores]
+        if new_words:
+            new_scores = dict(zip(new_words, self._score_new_words(new_words)))
+            if len(scores) < MAX_SCORED_WORDS:
+                scores.update(new_scores)
+            vectors = [scores.get(word) or new_scores[word] for word in words]
+        else:
+            vectors = list(map(scores.__getitem__, words))
+        *totals, count = map(sum, zip(*vectors))
+        return totals, count
+
+    def _score_new_words(self, words):
+        """Yield the score of each of `words`, looking up all their n-grams in one go."""
+        get = self._table.get
+        joined = " ".join(words)
+        padded = f" {joined} "
+        bigrams = list(map(add, padded, padded[1:]))
+        # The n-grams get_ngrams gives for the word at an offset of `joined`
+        # on its own start at that offset in each of these lists
+        unigrams = list(map(get, joined, repeat(self._unseen[1])))
+        trigrams = list(map(get, map(add, bigrams, padded[2:]), repeat(self._unseen[3])))
+        bigrams = list(map(get, bigrams, repeat(self._unseen[2])))
+        offset = 0
+        for word in words:
+            end = offset + len(word)
+            vectors = [*unigrams[offset:end], *bigrams[offset:end + 1], *trigrams[offset:end]]
+            yield (*map(sum, zip(*vectors)), len(vectors))
+            offset = end + 1
+
+
+def _get_profile_version(lang_tag):
+    return [PROFILE_FORMAT, *get_installed_dictionary_version(lang_tag)]
+
+
+class LanguageDetector:
+    """Tells which installed dictionary each paragraph of a text is written for.
+
+    Only the languages written in the script of the paragraph are scored.
+    A paragraph is attributed to a language when the language scores
+    clearly better than any other base language, and close to how its own
+    dictionary words score. Profiles missing from the disk cache are built
+    on a background thread, and their languages are not detected meanwhile.
+    A profile that failed to build is not tried again until its dictionary
+    files change.
+    """
+
+    def __init__(self, cache_directory=PROFILE_CACHE_DIRECTORY):
+        self.cache_directory = cache_directory
+        self._lock = threading.Lock()
+        # tag -> LanguageProfile
+        self._profiles = {}
+        # Tags of the installed dictionaries with no usable profile
+        self._missing = set()
+        # tag -> version of the dictionary files its profile failed to be built from
+        self._failed = {}
+        self._builder = None
+        # script -> _WordScorer of the profiles of that script
+        self._scorers = {}
+
+    def invalidate(self, lang_tag=None):
+        with self._lock:
+            if lang_tag is None:
+                self._profiles.clear()
+                self._missing.clear()
+                self._failed.clear()
+                return
+            for tag in list(self._profiles):
+                if is_affected_by_dictionary_change(tag, lang_tag):
+                    del self._profiles[tag]
+            self._missing = {
+                tag for tag in self._missing if not is_affected_by_dictionary_change(tag, lang_tag)
+            }
+            for tag in list(self._failed):
+                if is_affected_by_dictionary_change(tag, lang_tag):
+                    del self._failed[tag]
+
+    def get_profiles(self):
+        """Return the profiles of the installed dictionaries that have one, building the others later."""
+        installed = get_installed_dictionary_files()
+        profiles = {}
+        with self._lock:
+            for tag in installed:
+                profile = self._profiles.get(tag)
+                if profile is None and tag not in self._missing:
+                    profile = self._load_profile(tag)
+                if profile is not None:
+                    profiles[tag] = profile
+            if self._builder is None and any(
+                self._can_build(tag) for tag in installed.keys() & self._missing
+            ):
+                self._builder = threading.Thread(
+                    target=self.prepare, name="spellcheck-language-profiles", daemon=True
+                )
+                self._builder.start()
+        return profiles
+
+    def prepare(self):
+        """Build the profiles of the installed dictionaries that have none, in the calling thread.
+
+        The scoring tables and the word pattern are made ready as well, so
+        that the first detection does not wait for them.
+        """
+        try:
+            for tag, (dic_path, aff_path) in get_installed_dictionary_files().items():
+                with self._lock:
+                    if tag in self._profiles:
+                        continue
+                    if tag not in self._missing and self._load_profile(tag) is not None:
+                        continue
+                    if not self._can_build(tag):
+                        continue
+                try:
+                    version = _get_profile_version(tag)
+                except OSError:
+                    # Removed meanwhile
+                    continue
+                try:
+                    self._build_profile(tag, dic_path, aff_path, version)
+                except Exception:
+                    log.exception(f"Failed to build the language profile of {tag}")
+                    with self._lock:
+                        self._failed[tag] = version
+            with self._lock:
+                profiles = dict(self._profiles)
+            self._get_scorers(profiles)
+            get_text_word_pattern("")
+        finally:
+            with self._lock:
+                self._builder = None
+
+    def _can_build(self, tag):
+        """Return True unless building the profile of `tag` already failed with its current dictionary files."""
+        failed_version = self._failed.get(tag)
+        if failed_version is None:
+            return True
+        try:
+            return _get_profile_version(tag) != failed_version
+        except OSError:
+            return False
+
+    def _get_cache_path(self, tag):
+        return os.path.join(self.cache_directory, f"{tag}.json")
+
+    def _load_profile(self, tag):
+        try:
+            version = _get_profile_version(tag)
+        except OSError:
+            return None
+        try:
+            with open(self._get_cache_path(tag), "r", encoding="utf-8") as file:
+                cached = json.load(file)
+            if cached["version"] == version:
+                profile = LanguageProfile(
+                    tag,
+                    get_language_script(tag),
+                    cached["log_probabilities"],
+                    {int(length): value for length, value in cached["unseen"].items()},
+                    cached["typical_score"],
+                )
+                self._profiles[tag] = profile
+                return profile
+        except FileNotFoundError:
+            pass
+        except Exception:
+            log.exception(f"Discarding unreadable language profile for {tag}")
+        self._missing.add(tag)
+        return None
+
+    def _build_profile(self, tag, dic_path, aff_path, version):
+        words = [word for word, _flags in read_dictionary_entries(dic_path, read_aff_encoding(aff_path))]
+        step = max(len(words) // PROFILE_MAX_WORDS, 1)
+        profile = build_profile(tag, [word.lower() for word in words[::step]])
+        cached = {
+            "version": version,
+            "log_probabilities": profile.log_probabilities,
+            "unseen": profile.unseen,
+            "typical_score": profile.typical_score,
+        }
+        try:
+            replace_file(
+                self._get_cache_path(tag),
+                partial(json.dump, cached, ensure_ascii=False),
+                mode="w",
+                encoding="utf-8",
+            )
+        except Exception:
+            log.exception(f"Failed to cache the language profile of {tag}")
+        with self._lock:
+            self._profiles[tag] = profile
+            self._missing.discard(tag)
+            self._failed.pop(tag, None)
+
+    def _get_scorers(self, profiles):
+        """Return the script -> _WordScorer of `profiles`, reusing those of the same profiles."""
+        by_script = {}
+        for tag in sorted(profiles):
+            by_script.setdefault(profiles[tag].script, []).append(profiles[tag])
+        scorers = {}
+        for script, candidates in by_script.items():
+            scorer = self._scorers.get(script)
+            if scorer is None or scorer.profiles != tuple(candidates):
+                # Built outside the lock: a scorer made twice is only wasted work
+                scorer = _WordScorer(candidates)
+                with self._lock:
+                    self._scorers[script] = scorer
+            scorers[script] = scorer
+        return scorers
+
+    def detect(self, text, profiles=None):
+        """Return the tag of the language of `text`, or None if it cannot be told with confidence."""
+        if profiles is None:
+            profiles = self.get_profiles()
+        return self._detect(text, self._get_scorers(profiles))
+
+    def _detect(self, text, scorers):
+        words = get_text_word_pattern(text).findall(text[:MAX_DETECTION_CHARACTERS].lower())
+        if not words:
+            return None
+        # A sample of the words is enough to tell the script of the paragraph
+        scripts = Counter(map(get_script, words[::max(len(words) // SCRIPT_SAMPLE_SIZE, 1)]))
+        scorer = scorers.get(scripts.most_common(1)[0][0])
+        if scorer is None or sum(map(len, words)) < MIN_DETECTION_LETTERS:
+            return None
+        totals, count = scorer.score(words)
+        scores = sorted(zip(totals, scorer.profiles), key=lambda item: item[0], reverse=True)
+        best_score, best = scores[0]
+        if best_score / count < best.typical_score - MAX_SCORE_SHORTFALL:
+            return None
+        base = best.lang_tag.split("_")[0]
+        # Variants of the same language cannot be told apart, nor need to be
+        for score, profile in scores[1:]:
+            if profile.lang_tag.split("_")[0] != base:
+                if best_score - score < CONFIDENCE_MARGIN:
+                    return None
+                break
+        return best.lang_tag
+
+    def detect_paragraph_languages(self, text, fallback_lang_tag):
+        """Split `text` into LanguageRuns of consecutive paragraphs in the same language.
+
+        Paragraphs whose language cannot be told, such as headings too short
+        to score, are taken to be in the language of the paragraph before
+        them, or for the first ones, after them. `fallback_lang_tag` is used
+        only if no paragraph can be told. When it is installed, it is
+        preferred to the variant detected for the same language.
+        """
+        profiles = self.get_profiles()
+        scorers = self._get_scorers(profiles)
+        paragraphs = []
+        start = 0
+        for match in _PARAGRAPH_SEPARATOR.finditer(text):
+            paragraphs.append((start, match.end()))
+            start = match.end()
+        if start < len(text) or not paragraphs:
+            paragraphs.append((start, len(text)))
+        fallback_base = fallback_lang_tag.replace("-", "_").split("_")[0] if fallback_lang_tag else None
+        languages = []
+        for start, end in paragraphs:
+            lang_tag = self._detect(text[start:min(end, start + MAX_DETECTION_CHARACTERS)], scorers)
+            if lang_tag is not None and lang_tag.split("_")[0] == fallback_base and fallback_lang_tag in profiles:
+                lang_tag = fallback_lang_tag
+            languages.append(lang_tag)
+        known = [lang_tag for lang_tag in languages if lang_tag is not None]
+        if not known:
+            return [LanguageRun(0, len(text), fallback_lang_tag)]
+        runs = []
+        lang_tag = known[0]
+        for (start, end), detected in zip(paragraphs, languages):
+            lang_tag = detected or lang_tag
+            if runs and runs[-1].lang_tag == lang_tag:
+                runs[-1] = runs[-1]._replace(end=end)
+            else:
+                runs.append(LanguageRun(start, end, lang_tag))
+        return runs
+
+
+class MultilingualDictionary(RoutingDictionary):
+    """The dictionary of a text whose parts are checked with different dictionaries.
+
+    The text is checked run by run, each with its own dictionary, and each
+    misspelled word is then handled by the dictionary that reported it,
+    the first time it was reported. Other words go to the dictionary of the
+    longest run.
+    """
+
+    def __init__(self, runs):
+        self.runs = [DictionaryRun(*run) for run in runs]
+        self.primary = max(self.runs, key=lambda run: run.end - run.start).dictionary
+        self.tag = getattr(self.primary, "tag", None)
+        # word -> the dictionary which reported it
+        self._dictionaries_by_word = {}
+
+    def assign(self, word, dictionary):
+        self._dictionaries_by_word.setdefault(word, dictionary)
+
+    def dictionary_for(self, word):
+        return self._dictionaries_by_word.get(word, self.primary)
+
+
+def get_detected_dictionary(text, fallback_lang_tag, mixed_script_lang_tags, detector=None):
+    """Return the dictionary to check `text` with, from the languages detected in its paragraphs.
+
+    Meant for the check worker, as detecting and loading dictionaries
+    takes a while. Runs in a language whose dictionary cannot be had are
+    checked with the dictionary of the longest text. Raises the
+    LanguageDictionaryNotAvailable of the longest run if no dictionary at
+    all can be had.
+    """
+    detector = detector or LANGUAGE_DETECTOR
+    try:
+        language_runs = detector.detect_paragraph_languages(text, fallback_lang_tag)
+    except Exception:
+        log.exception("Failed to detect the language of the text")
+        language_runs = []
+    if not language_runs:
+        language_runs = [LanguageRun(0, len(text), fallback_lang_tag)]
+    dictionaries = {}
+    error = None
+    for run in sorted(language_runs, key=lambda run: run.end - run.start, reverse=True):
+        if run.lang_tag in dictionaries:
+            continue
+        try:
+            dictionaries[run.lang_tag] = get_script_routed_dictionary(
+                get_enchant_language_dictionary(run.lang_tag), mixed_script_lang_tags
+            )
+        except LanguageDictionaryNotAvailable as e:
+            dictionaries[run.lang_tag] = None
+            error = error or e
+    if not any(dictionaries.values()):
+        raise error
+    if len(dictionaries) == 1:
+        return dictionaries[language_runs[0].lang_tag]
+    longest = next(dictionary for dictionary in dictionaries.values() if dictionary is not None)
+    return MultilingualDictionary(
+        (run.start, run.end, dictionaries[run.lang_tag] or longest) for run in language_runs
+    )
+
+
+LANGUAGE_DETECTOR = LanguageDetector()
+add_dictionary_change_listener(LANGUAGE_DETECTOR.invalidate)
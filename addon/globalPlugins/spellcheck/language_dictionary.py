@@ -5,22 +5,22 @@
 
 import math
 import os
+import threading
+import time
 import globalVars
 import languageHandler
+from collections import namedtuple
+from contextlib import nullcontext
 from io import BytesIO
 from functools import partial
 from logHandler import log
 from .helpers import import_bundled_library, DATA_DIRECTORY
+from . import network
+from .word_index import IndexedDictionary, find_word_index, remove_word_indexes
 
 
 with import_bundled_library():
-    # Suppress DeprecationWarning from Python stdlib 'cgi' module imported by older httpx versions.
-    # Python 3.12 warns that 'cgi' is deprecated and will be removed in 3.13.
-    # This filter targets only the 'cgi' module to avoid hiding other deprecations.
-    import warnings  # noqa: E402
-    warnings.filterwarnings("ignore", category=DeprecationWarning, module=r"^cgi$")
     import enchant  # noqa: E402
-    import httpx  # noqa: E402
     from concurrent.futures import ThreadPoolExecutor  # noqa: E402
 
 
@@ -37,6 +37,14 @@ SPELLCHECK_DICTIONARIES_DIRECTORY = os.path.join(
 )
 with open(os.path.join(DATA_DIRECTORY, "downloadable_languages.txt"), "r") as file:
     DOWNLOADABLE_LANGUAGES = [tag.strip() for tag in file if tag.strip()]
+# Maximum number of loaded dictionaries kept in memory
+DICTIONARY_CACHE_SIZE = 4
+# Seconds a loaded dictionary may stay unused before it is released
+DICTIONARY_CACHE_IDLE_TIMEOUT = 15 * 60
+# Seconds between two looks for dictionaries unused for longer than the idle timeout
+DICTIONARY_CACHE_EVICTION_INTERVAL = 60
+# Check words against a precompiled index of the dictionary, loading hunspell only for the others
+USE_WORD_INDEX = True
 
 # Metadata file to store installed dictionary versions (latest known commit sha)
 def _get_hunspell_dir() -> str:
@@ -110,6 +118,46 @@ def _get_hunspell_dir() -> str:
     return os.path.join(SPELLCHECK_DICTIONARIES_DIRECTORY, "hunspell")
 
 
+def get_installed_dictionary_files() -> dict:
+    """Return the tag -> (.dic path, .aff path) of the installed dictionaries, those with both files."""
+    d = _get_hunspell_dir()
+    try:
+        names = set(os.listdir(d))
+    except OSError:
+        return {}
+    return {
+        tag: (os.path.join(d, name), os.path.join(d, f"{tag}.aff"))
+        for tag, ext, name in ((*os.path.splitext(name), name) for name in names)
+        if ext == ".dic" and f"{tag}.aff" in names
+    }
+
+
+def get_installed_dictionary_version(tag: str) -> list:
+    """Identify the installed files of `tag`: the commit they were downloaded from, and the size and modification time of each.
+
+    Data derived from the files is cached along with it, and rebuilt once it
+    changes. Raises OSError if the dictionary is not installed.
+    """
+    d = _get_hunspell_dir()
+    version = [get_local_dictionary_version(tag)]
+    for ext in (".dic", ".aff"):
+        stat = os.stat(os.path.join(d, f"{tag}{ext}"))
+        version += [stat.st_size, stat.st_mtime_ns]
+    return version
+
+
+def replace_file(path: str, write, mode: str = "wb", encoding: str | None = None) -> None:
+    """Make the file at `path` with `write(file)`, replacing any previous one only once it is complete.
+
+    The directory of `path` is created if needed.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, mode, encoding=encoding) as file:
+        write(file)
+    os.replace(temp_path, path)
+
+
 def list_installed_dictionaries(include_remote: bool = False):
     """List installed dictionary tags, size, and optional version info.
 
@@ -117,31 +165,14 @@ def list_installed_dictionaries(include_remote: bool = False):
     status: "upToDate" | "updateAvailable" | "unknown"
     If include_remote is False, latestVersion and status may be omitted/unknown.
     """
-    d = _get_hunspell_dir()
-    if not os.path.isdir(d):
-        return []
-    entries = {}
-    try:
-        for name in os.listdir(d):
-            base, ext = os.path.splitext(name)
-            if ext.lower() not in DICTIONARY_FILE_EXTS:
-                continue
-            full = os.path.join(d, name)
-            size = 0
-            with open(full, "rb") as f:
-                f.seek(0, os.SEEK_END)
-                size = f.tell()
-            entries.setdefault(base, {"need": set([".dic", ".aff"]), "size": 0})
-            entries[base]["need"].discard(ext.lower())
-            entries[base]["size"] += size
-    except Exception:
-        return []
     result = []
-    for tag, info in entries.items():
-        if info["need"]:
+    for tag, paths in get_installed_dictionary_files().items():
+        try:
+            size = sum(os.path.getsize(p) for p in paths)
+        except OSError:
             continue
         localCommit = get_local_dictionary_version(tag)
-        rec = {"tag": tag, "size": info["size"], "localVersion": localCommit}
+        rec = {"tag": tag, "size": size, "localVersion": localCommit}
         if include_remote and tag in DOWNLOADABLE_LANGUAGES:
             try:
                 latest = get_latest_remote_dictionary_version(tag)
@@ -208,7 +239,7 @@ def list_languages_status(include_remote: bool = False):
 def get_latest_remote_dictionary_version(lang_tag: str) -> str | None:
     """Return latest commit sha for lang folder on master branch via GitHub API."""
     url = DICT_GITHUB_COMMITS_API_URL.format(lang_tag=lang_tag)
-    resp = httpx.get(url, timeout=10)
+    resp = network.get(url, timeout=10)
     resp.raise_for_status()
     data = resp.json()
     if isinstance(data, list) and data:
@@ -223,7 +254,7 @@ def get_latest_remote_versions(tags: list[str]) -> dict[str, str | None]:
     This performs network requests and should be called off the UI thread.
     """
     results: dict[str, str | None] = {}
-    with httpx.Client(timeout=10) as client:
+    with network.make_client(timeout=10) as client:
         for tag in tags:
             try:
                 url = DICT_GITHUB_COMMITS_API_URL.format(lang_tag=tag)
@@ -254,6 +285,8 @@ def remove_installed_dictionary(tag: str) -> bool:
             set_local_dictionary_version(tag, None)
         except Exception:
             pass
+        invalidate_dictionary_cache(tag)
+        remove_word_indexes(d, tag)
     return removed
 
 
@@ -261,9 +294,272 @@ def get_all_possible_languages():
     return set(DOWNLOADABLE_LANGUAGES)
 
 
+class DictionaryCache:
+    """Process-wide LRU cache of loaded enchant dictionaries.
+
+    Loading a hunspell dictionary parses its .dic/.aff files, which is
+    expensive for large languages, so loaded dictionaries are kept around
+    keyed by language tag. Entries are evicted when the cache grows beyond
+    `max_size`, or when they have not been used for `idle_timeout` seconds,
+    which is looked at every `eviction_interval` seconds between
+    `start_eviction` and `stop_eviction`.
+    """
+
+    def __init__(
+        self,
+        max_size=DICTIONARY_CACHE_SIZE,
+        idle_timeout=DICTIONARY_CACHE_IDLE_TIMEOUT,
+        eviction_interval=DICTIONARY_CACHE_EVICTION_INTERVAL,
+    ):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.eviction_interval = eviction_interval
+        self._lock = threading.RLock()
+        # tag -> (dictionary, last access time), least recently used first
+        self._entries = {}
+        # tag -> additional dictionaries for checking in parallel
+        self._handles = {}
+        # tag -> event set once `preload` has finished loading it
+        self._preloading = {}
+        # Incremented by `invalidate`, so that dictionaries preloaded from replaced files are not cached
+        self._generation = 0
+        self._eviction_stopped = threading.Event()
+        self._evictor = None
+
+    def request(self, lang_tag):
+        """Return the dictionary for `lang_tag`, loading it if necessary.
+
+        Raises enchant.errors.DictNotFoundError if no such dictionary exists.
+        Must not be called with the cache lock held: a preload of the same
+        language can only finish once it gets the lock.
+        """
+        while True:
+            with self._lock:
+                preloading = self._preloading.get(lang_tag)
+                if preloading is None:
+                    self._evict_idle()
+                    entry = self._entries.pop(lang_tag, None)
+                    if entry is None:
+                        dictionary = self._load(lang_tag)
+                    else:
+                        dictionary = entry[0]
+                    self._add(lang_tag, dictionary)
+                    return dictionary
+            # Loading it a second time would only take longer
+            preloading.wait()
+
+    def preload(self, lang_tag):
+        """Load the dictionary for `lang_tag` ahead of its first request.
+
+        Unlike `request`, the dictionary is loaded without holding the cache
+        lock, so requests for other languages are not kept waiting meanwhile.
+        Returns False if there is no such dictionary.
+        """
+        with self._lock:
+            if lang_tag in self._entries or lang_tag in self._preloading:
+                return True
+            loaded = self._preloading[lang_tag] = threading.Event()
+            generation = self._generation
+        dictionary = None
+        try:
+            if enchant.dict_exists(lang_tag):
+                dictionary = self._load(lang_tag)
+                if isinstance(dictionary, IndexedDictionary):
+                    # Words missing from the index would otherwise load hunspell while the user waits
+                    dictionary.load()
+        finally:
+            with self._lock:
+                del self._preloading[lang_tag]
+                if (
+                    dictionary is not None
+                    and generation == self._generation
+                    and lang_tag not in self._entries
+                ):
+                    self._add(lang_tag, dictionary)
+            loaded.set()
+        return dictionary is not None
+
+    def _load(self, lang_tag):
+        if USE_WORD_INDEX:
+            try:
+                dictionary_version = get_installed_dictionary_version(lang_tag)
+            except OSError:
+                # Not installed by the add-on, so never indexed
+                dictionary_version = None
+            if dictionary_version is not None:
+                word_index = find_word_index(_get_hunspell_dir(), lang_tag, dictionary_version)
+                if word_index is not None:
+                    return IndexedDictionary(lang_tag, word_index, enchant.request_dict)
+        return enchant.request_dict(lang_tag)
+
+    def __contains__(self, lang_tag):
+        with self._lock:
+            return lang_tag in self._entries
+
+    def _add(self, lang_tag, dictionary):
+        self._entries[lang_tag] = (dictionary, time.monotonic())
+        while len(self._entries) > max(self.max_size, 1):
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+
+    def request_handles(self, lang_tag, count):
+        """Return `count` DictionaryHandles for `lang_tag`, loaded apart from the dictionary `request` returns.
+
+        Hunspell is not thread-safe, so each thread checking in parallel
+        needs a dictionary of its own. A broker hands out the same hunspell
+        instance for every request of a tag, so each handle is requested
+        from a broker of its own. They are kept as long as the dictionary
+        `request` returns is.
+        """
+        dictionary = self.request(lang_tag)
+        with self._lock:
+            handles = self._handles.setdefault(lang_tag, [])
+            while len(handles) < count:
+                handles.append(DictionaryHandle(_load_handle(lang_tag, dictionary), threading.Lock()))
+            return handles[:count]
+
+    def invalidate(self, lang_tag=None):
+        """Drop the cached dictionary for `lang_tag`, or all dictionaries if None.
+
+        Other variants of the language are kept, unless
+        is_affected_by_dictionary_change says otherwise.
+        """
+        with self._lock:
+            self._generation += 1
+            if lang_tag is None:
+                self._entries.clear()
+                self._handles.clear()
+                return
+            for tag in list(self._entries):
+                if is_affected_by_dictionary_change(tag, lang_tag):
+                    self._drop(tag)
+
+    def start_eviction(self):
+        """Release the idle dictionaries periodically on a background thread, until `stop_eviction`."""
+        if self._evictor is not None or self.idle_timeout is None:
+            return
+        # A thread of its own, so that a thread stopped earlier cannot be revived
+        self._eviction_stopped = threading.Event()
+        self._evictor = threading.Thread(
+            target=self._run_eviction,
+            args=(self._eviction_stopped,),
+            name="spellcheck-dictionary-eviction",
+            daemon=True,
+        )
+        self._evictor.start()
+
+    def stop_eviction(self):
+        self._eviction_stopped.set()
+        self._evictor = None
+
+    def _run_eviction(self, stopped):
+        while not stopped.wait(self.eviction_interval):
+            with self._lock:
+                self._evict_idle()
+
+    def _evict_idle(self):
+        if self.idle_timeout is None:
+            return
+        now = time.monotonic()
+        for tag, (dictionary, last_access) in list(self._entries.items()):
+            if now - last_access > self.idle_timeout:
+                self._drop(tag)
+
+    def _drop(self, tag):
+        del self._entries[tag]
+        self._handles.pop(tag, None)
+
+
+DICTIONARY_CACHE = DictionaryCache()
+
+
+# A dictionary for checking in parallel, and the lock serializing calls into it
+DictionaryHandle = namedtuple("DictionaryHandle", "dictionary lock")
+
+
+def _load_handle(lang_tag, dictionary):
+    request_dict = enchant.Broker().request_dict
+    if isinstance(dictionary, IndexedDictionary):
+        # Hunspell is only loaded once a word is missing from the shared index
+        return IndexedDictionary(lang_tag, dictionary.word_index, request_dict)
+    return request_dict(lang_tag)
+
+
+# lang tag -> lock of the hunspell instance the global broker hands out for it
+_DICTIONARY_LOCKS = {}
+_DICTIONARY_LOCKS_GUARD = threading.Lock()
+
+
+def get_dictionary_lock(dictionary):
+    """Return the lock serializing calls into `dictionary` from different threads.
+
+    A single enchant dictionary is shared by the checking worker,
+    the suggestions prefetcher and the UI, and hunspell is not thread-safe.
+    The lock belongs to the language tag rather than to `dictionary`: the
+    broker hands out the same hunspell instance for every request of a tag,
+    whichever object wraps it. Dictionaries setting `locks_its_dictionaries`
+    take the locks of the dictionaries they call themselves, so they get
+    no lock of their own.
+    """
+    if getattr(dictionary, "locks_its_dictionaries", False):
+        return nullcontext()
+    with _DICTIONARY_LOCKS_GUARD:
+        lock = _DICTIONARY_LOCKS.get(dictionary.tag)
+        if lock is None:
+            lock = _DICTIONARY_LOCKS[dictionary.tag] = threading.RLock()
+        return lock
+
+
+def is_affected_by_dictionary_change(lang_tag, changed_lang_tag):
+    """Return True if what was loaded for `lang_tag` may come from the dictionary of `changed_lang_tag`.
+
+    That is the same tag, or a regional variant of a changed base language
+    (e.g. de_DE for de): enchant falls back to the base dictionary for a
+    region that has none of its own.
+    """
+    return lang_tag == changed_lang_tag or lang_tag.startswith(f"{changed_lang_tag}_")
+
+
+# Callables taking a language tag, notified when that dictionary changes on disk
+_dictionary_change_listeners = []
+
+
+def add_dictionary_change_listener(callback):
+    """Call `callback(lang_tag)` whenever a dictionary is installed, updated or removed.
+
+    Use this to drop anything derived from the dictionary files.
+    """
+    if callback not in _dictionary_change_listeners:
+        _dictionary_change_listeners.append(callback)
+
+
+def invalidate_dictionary_cache(lang_tag=None):
+    """Forget loaded dictionaries for `lang_tag` after its files changed on disk."""
+    DICTIONARY_CACHE.invalidate(lang_tag)
+    if lang_tag is None:
+        return
+    for callback in _dictionary_change_listeners:
+        try:
+            callback(lang_tag)
+        except Exception:
+            log.exception(f"Dictionary change listener failed for {lang_tag}")
+
+
+def preload_language_dictionary(lang_tag):
+    """Load the installed dictionary `get_enchant_language_dictionary` would return for `lang_tag`.
+
+    Never offers a download. Returns False if no dictionary is installed for the language.
+    """
+    if DICTIONARY_CACHE.preload(lang_tag):
+        return True
+    if "_" in lang_tag:
+        return preload_language_dictionary(lang_tag.split("_")[0])
+    return False
+
+
 def get_enchant_language_dictionary(lang_tag):
     try:
-        return enchant.request_dict(lang_tag)
+        return DICTIONARY_CACHE.request(lang_tag)
     except enchant.errors.DictNotFoundError:
         if lang_tag in DOWNLOADABLE_LANGUAGES:
             raise LanguageDictionaryDownloadable(lang_tag)
@@ -292,7 +588,7 @@ def download_language_dictionary(lang_tag, progress_callback, done_callback):
 
 
 def get_language_dictionary_download_info(lang_tag):
-    directory_listing = httpx.get(DICT_GITHUB_API_URL.format(lang_tag=lang_tag)).json()
+    directory_listing = network.get(DICT_GITHUB_API_URL.format(lang_tag=lang_tag)).json()
     return {
         entry["name"]: (entry["download_url"], entry["size"])
         for entry in directory_listing
@@ -307,7 +603,7 @@ def _do_download__and_extract_lang_dictionary(lang_tag, progress_callback):
     downloaded_til_now = 0
     for (filename, (download_url, file_size)) in download_info.items():
         downloaded_this_file = 0
-        with httpx.Client() as client:
+        with network.make_client() as client:
             with client.stream("GET", download_url) as response:
                 file_buffer = BytesIO()
                 for data in response.iter_bytes():
@@ -346,6 +642,8 @@ def _do_download__and_extract_lang_dictionary(lang_tag, progress_callback):
         set_local_dictionary_version(lang_tag, latest)
     except Exception:
         set_local_dictionary_version(lang_tag, None)
+    # Only now, so that whatever is rebuilt from the new files is tagged with the new version
+    invalidate_dictionary_cache(lang_tag)
 
 
 def _done_callback(done_callback, future):
@@ -354,7 +652,8 @@ def _done_callback(done_callback, future):
     try:
         result = future.result()
         done_callback(None)
-    except httpx.HTTPError:
-        done_callback(ConnectionError("Failed to get language dictionary"))
     except Exception as e:
-        done_callback(e)
+        if network.is_http_error(e):
+            done_callback(ConnectionError("Failed to get language dictionary"))
+        else:
+            done_callback(e)
@@ -40,22 +40,43 @@ def _state_path() -> str:
     return os.path.join(globalVars.appArgs.configPath, "spellcheck_state.json")
 
 
-def load_active_lang_tag() -> str | None:
+def _load_state() -> dict:
     try:
         with open(_state_path(), "r", encoding="utf-8") as f:
             data = json.load(f)
-            val = data.get("activeLangTag")
-            return val if isinstance(val, str) and val else None
+            return data if isinstance(data, dict) else {}
     except Exception:
-        return None
+        return {}
 
 
-def save_active_lang_tag(tag: str | None) -> None:
+def _save_state(**updates) -> None:
     try:
-        path = _state_path()
-        data = {"activeLangTag": tag if isinstance(tag, str) and tag else None}
-        with open(path, "w", encoding="utf-8") as f:
+        # Keep the other settings stored in the file
+        data = _load_state()
+        data.update(updates)
+        with open(_state_path(), "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
     except Exception:
         # Persistence is best-effort; ignore failures silently.
         pass
+
+
+def load_active_lang_tag() -> str | None:
+    val = _load_state().get("activeLangTag")
+    return val if isinstance(val, str) and val else None
+
+
+def save_active_lang_tag(tag: str | None) -> None:
+    _save_state(activeLangTag=tag if isinstance(tag, str) and tag else None)
+
+
+def load_mixed_script_lang_tags() -> list[str]:
+    """Return the languages whose dictionaries check the words written in their script, whatever the main language."""
+    val = _load_state().get("mixedScriptLangTags")
+    if not isinstance(val, list):
+        return []
+    return [tag for tag in val if isinstance(tag, str) and tag]
+
+
+def save_mixed_script_lang_tags(tags: list[str]) -> None:
+    _save_state(mixedScriptLangTags=[tag for tag in tags if isinstance(tag, str) and tag])
@@ -0,0 +1,56 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Network access.
+Importing httpx pulls in httpcore, anyio, h11, idna, certifi, rfc3986 and
+more, which would slow down every NVDA start although most sessions never
+download anything. httpx is only imported when a request is first made.
+"""
+
+import threading
+from .helpers import import_bundled_library
+
+
+_httpx = None
+_import_lock = threading.Lock()
+
+
+def get_httpx():
+    """Return the httpx module, importing it on first use."""
+    global _httpx
+    if _httpx is None:
+        with _import_lock:
+            if _httpx is None:
+                with import_bundled_library():
+                    # Suppress DeprecationWarning from Python stdlib 'cgi' module imported by older httpx versions.
+                    # Python 3.12 warns that 'cgi' is deprecated and will be removed in 3.13.
+                    # This filter targets only the 'cgi' module to avoid hiding other deprecations.
+                    import warnings
+
+                    warnings.filterwarnings("ignore", category=DeprecationWarning, module=r"^cgi$")
+                    import httpx
+                _httpx = httpx
+    return _httpx
+
+
+def is_loaded():
+    """True once httpx has been imported."""
+    return _httpx is not None
+
+
+def get(url, **kwargs):
+    """Send a GET request, as `httpx.get`."""
+    return get_httpx().get(url, **kwargs)
+
+
+def make_client(**kwargs):
+    """Return an `httpx.Client`, to be used as a context manager."""
+    return get_httpx().Client(**kwargs)
+
+
+def is_http_error(exception):
+    """True if `exception` is an httpx error, which it cannot be before httpx is imported."""
+    return _httpx is not None and isinstance(exception, _httpx.HTTPError)
@@ -0,0 +1,157 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Text normalization before checking.
+Arabic diacritics (tashkeel) and kashida (tatweel), typographic apostrophes,
+soft hyphens and invisible bidi controls are not part of the words hunspell
+knows, so words containing them are reported as misspelled. They are removed
+or replaced before the text is tokenized, and an offset map translates the
+positions found in the normalized text back to the original one.
+"""
+
+import re
+import unicodedata
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+
+
+# Characters removed, as the body of a regex character class, and characters replaced by another single one
+NormalizationRules = namedtuple("NormalizationRules", "removed replaced")
+
+# Soft hyphen, word joiner, byte order mark, and the bidi marks, embeddings and isolates
+_INVISIBLE_CHARACTERS = "\u00ad\u2060\ufeff\u200e\u200f\u202a-\u202e\u2066-\u2069"
+# Tatweel, the tashkeel and the superscript alef
+_ARABIC_MARKS = "\u0640\u064b-\u065f\u0670"
+
+DEFAULT_NORMALIZATION_RULES = NormalizationRules(
+    removed=_INVISIBLE_CHARACTERS,
+    replaced={
+        # Typographic apostrophes and the modifier letter apostrophe
+        "\u2018": "'",
+        "\u2019": "'",
+        "\u02bc": "'",
+    },
+)
+ARABIC_SCRIPT_NORMALIZATION_RULES = DEFAULT_NORMALIZATION_RULES._replace(
+    removed=DEFAULT_NORMALIZATION_RULES.removed + _ARABIC_MARKS,
+)
+# language -> rules, for the language and its regional variants
+LANGUAGE_NORMALIZATION_RULES = {
+    "ar": ARABIC_SCRIPT_NORMALIZATION_RULES,
+    "fa": ARABIC_SCRIPT_NORMALIZATION_RULES,
+    "ur": ARABIC_SCRIPT_NORMALIZATION_RULES,
+    "ps": ARABIC_SCRIPT_NORMALIZATION_RULES,
+    "ug": ARABIC_SCRIPT_NORMALIZATION_RULES,
+}
+
+
+def get_normalization_rules(lang_tag=None):
+    """Return the rules for `lang_tag`, trying the whole tag and then its base language."""
+    if lang_tag is not None:
+        lang_tag = lang_tag.replace("-", "_")
+        rules = LANGUAGE_NORMALIZATION_RULES.get(lang_tag) or LANGUAGE_NORMALIZATION_RULES.get(
+            lang_tag.split("_")[0]
+        )
+        if rules is not None:
+            return rules
+    return DEFAULT_NORMALIZATION_RULES
+
+
+class OffsetMap:
+    """Translates offsets in a normalized text to offsets in the original text.
+
+    Replacements keep offsets as they are, so only the runs of removed
+    characters are recorded: the offset in the normalized text each run
+    precedes, and the number of characters removed up to its end. Lookups
+    bisect these two arrays.
+    """
+
+    def __init__(self, original_text):
+        self.original_text = original_text
+        self._offsets = array("q")
+        self._removed = array("q")
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def add_removed_run(self, offset, length):
+        """Record that `length` characters were removed before `offset` of the normalized text."""
+        total = (self._removed[-1] if self._removed else 0) + length
+        self._offsets.append(offset)
+        self._removed.append(total)
+
+    def to_original(self, offset):
+        """Return the offset in the original text of the character at `offset`."""
+        index = bisect_right(self._offsets, offset)
+        return offset + (self._removed[index - 1] if index else 0)
+
+    def to_original_span(self, offset, length):
+        """Return the (offset, length) in the original text of a word of the normalized text.
+
+        Removed characters within the word belong to it, and so do removed
+        combining marks right after its last character, such as the
+        tashkeel of a final Arabic letter.
+        """
+        start = self.to_original(offset)
+        if not length:
+            return start, 0
+        end = self.to_original(offset + length - 1) + 1
+        original_text = self.original_text
+        # Up to the next character of the normalized text, all characters were removed
+        if offset + length < self.normalized_length:
+            next_offset = self.to_original(offset + length)
+        else:
+            next_offset = len(original_text)
+        while end < next_offset and unicodedata.category(original_text[end])[0] == "M":
+            end += 1
+        return start, end - start
+
+    @property
+    def normalized_length(self):
+        return len(self.original_text) - (self._removed[-1] if self._removed else 0)
+
+
+class Normalizer:
+    """Applies NormalizationRules to texts."""
+
+    def __init__(self, rules=DEFAULT_NORMALIZATION_RULES):
+        self.rules = rules
+        self._removed_pattern = re.compile(f"[{rules.removed}]+") if rules.removed else None
+        changed = rules.removed + "".join(re.escape(char) for char in rules.replaced)
+        self._changed_pattern = re.compile(f"[{changed}]") if changed else None
+
+    def normalize(self, text):
+        """Return the normalized text, and an OffsetMap back to `text`.
+
+        The offset map is None if there was nothing to normalize, in
+        which case `text` itself is returned, without a copy.
+        """
+        if self._changed_pattern is None or self._changed_pattern.search(text) is None:
+            return text, None
+        offset_map = OffsetMap(text)
+        if self._removed_pattern is not None:
+            pieces = []
+            last_end = 0
+            removed = 0
+            for match in self._removed_pattern.finditer(text):
+                pieces.append(text[last_end:match.start()])
+                offset_map.add_removed_run(match.start() - removed, match.end() - match.start())
+                removed += match.end() - match.start()
+                last_end = match.end()
+            pieces.append(text[last_end:])
+            normalized = "".join(pieces)
+        else:
+            normalized = text
+        # Much faster than str.translate for a few characters
+        for char, replacement in self.rules.replaced.items():
+            if char in normalized:
+                normalized = normalized.replace(char, replacement)
+        return normalized, offset_map
+
+
+def get_normalizer(lang_tag=None):
+    return Normalizer(get_normalization_rules(lang_tag))
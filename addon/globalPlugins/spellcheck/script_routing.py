@@ -0,0 +1,227 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Checking texts mixing languages written in different scripts.
+Arabic or Russian text often holds English terms, which the Arabic or
+Russian dictionary reports as misspelled, each at the cost of a suggestion
+lookup. Each word is given instead to the dictionary of its script, among
+the languages the user has configured, so that a single check, and a single
+menu, covers the whole text.
+"""
+
+from bisect import bisect_right
+from logHandler import log
+from .language_dictionary import (
+    get_dictionary_lock,
+    get_enchant_language_dictionary,
+    LanguageDictionaryNotAvailable,
+)
+
+
+# (first, last) codepoints -> script, for the letters and marks of the scripts with dictionaries
+SCRIPT_RANGES = (
+    (0x0041, 0x024F, "Latin"),
+    (0x0250, 0x02AF, "Latin"),
+    (0x0370, 0x03FF, "Greek"),
+    (0x0400, 0x052F, "Cyrillic"),
+    (0x0530, 0x058F, "Armenian"),
+    (0x0590, 0x05FF, "Hebrew"),
+    (0x0600, 0x06FF, "Arabic"),
+    (0x0750, 0x077F, "Arabic"),
+    (0x0870, 0x08FF, "Arabic"),
+    (0x0900, 0x097F, "Devanagari"),
+    (0x0980, 0x09FF, "Bengali"),
+    (0x0A00, 0x0A7F, "Gurmukhi"),
+    (0x0A80, 0x0AFF, "Gujarati"),
+    (0x0B00, 0x0B7F, "Oriya"),
+    (0x0B80, 0x0BFF, "Tamil"),
+    (0x0C00, 0x0C7F, "Telugu"),
+    (0x0C80, 0x0CFF, "Kannada"),
+    (0x0D00, 0x0D7F, "Malayalam"),
+    (0x0D80, 0x0DFF, "Sinhala"),
+    (0x0E00, 0x0E7F, "Thai"),
+    (0x0E80, 0x0EFF, "Lao"),
+    (0x0F00, 0x0FFF, "Tibetan"),
+    (0x1000, 0x109F, "Myanmar"),
+    (0x10A0, 0x10FF, "Georgian"),
+    (0x1100, 0x11FF, "Hangul"),
+    (0x1200, 0x139F, "Ethiopic"),
+    (0x1780, 0x17FF, "Khmer"),
+    (0x1800, 0x18AF, "Mongolian"),
+    (0x1C80, 0x1C8F, "Cyrillic"),
+    (0x1C90, 0x1CBF, "Georgian"),
+    (0x1E00, 0x1EFF, "Latin"),
+    (0x1F00, 0x1FFF, "Greek"),
+    (0x2C60, 0x2C7F, "Latin"),
+    (0x2DE0, 0x2DFF, "Cyrillic"),
+    (0x3130, 0x318F, "Hangul"),
+    (0xA640, 0xA69F, "Cyrillic"),
+    (0xA720, 0xA7FF, "Latin"),
+    (0xAB30, 0xAB6F, "Latin"),
+    (0xAC00, 0xD7AF, "Hangul"),
+    (0xFB00, 0xFB06, "Latin"),
+    (0xFB1D, 0xFB4F, "Hebrew"),
+    (0xFB50, 0xFDFF, "Arabic"),
+    (0xFE70, 0xFEFF, "Arabic"),
+    (0xFF21, 0xFF5A, "Latin"),
+)
+# language -> script its dictionary is written in, for the languages not written in Latin
+LANGUAGE_SCRIPTS = {
+    "ar": "Arabic",
+    "fa": "Arabic",
+    "ur": "Arabic",
+    "ps": "Arabic",
+    "ug": "Arabic",
+    "be": "Cyrillic",
+    "bg": "Cyrillic",
+    "kk": "Cyrillic",
+    "ky": "Cyrillic",
+    "mk": "Cyrillic",
+    "mn": "Cyrillic",
+    "ru": "Cyrillic",
+    "sr": "Cyrillic",
+    "tg": "Cyrillic",
+    "uk": "Cyrillic",
+    "el": "Greek",
+    "hy": "Armenian",
+    "he": "Hebrew",
+    "yi": "Hebrew",
+    "hi": "Devanagari",
+    "mr": "Devanagari",
+    "ne": "Devanagari",
+    "sa": "Devanagari",
+    "bn": "Bengali",
+    "as": "Bengali",
+    "pa": "Gurmukhi",
+    "gu": "Gujarati",
+    "or": "Oriya",
+    "ta": "Tamil",
+    "te": "Telugu",
+    "kn": "Kannada",
+    "ml": "Malayalam",
+    "si": "Sinhala",
+    "th": "Thai",
+    "lo": "Lao",
+    "bo": "Tibetan",
+    "dz": "Tibetan",
+    "my": "Myanmar",
+    "ka": "Georgian",
+    "ko": "Hangul",
+    "am": "Ethiopic",
+    "ti": "Ethiopic",
+    "km": "Khmer",
+}
+DEFAULT_SCRIPT = "Latin"
+_RANGE_STARTS = [first for first, _last, _script in SCRIPT_RANGES]
+
+
+def get_script(word):
+    """Return the script of the first character of `word` that belongs to one, or None."""
+    for char in word:
+        codepoint = ord(char)
+        index = bisect_right(_RANGE_STARTS, codepoint) - 1
+        if index >= 0 and codepoint <= SCRIPT_RANGES[index][1]:
+            return SCRIPT_RANGES[index][2]
+    return None
+
+
+def get_language_script(lang_tag):
+    """Return the script the dictionary of `lang_tag` is written in."""
+    return LANGUAGE_SCRIPTS.get(lang_tag.replace("-", "_").split("_")[0], DEFAULT_SCRIPT)
+
+
+class RoutingDictionary:
+    """A dictionary handing each word to one of several dictionaries, chosen by `dictionary_for`.
+
+    Each dictionary is called under its own lock, so the dictionaries stay
+    shared with the rest of the add-on. The routing dictionary has no lock
+    of its own: holding the lock of its tag around those calls could
+    deadlock with a routing dictionary taking the same locks the other way
+    round. Texts are checked in one piece rather than in parallel shards.
+    """
+
+    locks_its_dictionaries = True
+
+    def dictionary_for(self, word):
+        """Return the dictionary `word` is checked with."""
+        raise NotImplementedError
+
+    def _call(self, method_name, word, *args):
+        dictionary = self.dictionary_for(word)
+        with get_dictionary_lock(dictionary):
+            return getattr(dictionary, method_name)(word, *args)
+
+    def check(self, word):
+        return self._call("check", word)
+
+    def suggest(self, word):
+        return self._call("suggest", word)
+
+    def add(self, word):
+        return self._call("add", word)
+
+    def remove(self, word):
+        return self._call("remove", word)
+
+    def is_added(self, word):
+        return self._call("is_added", word)
+
+    def store_replacement(self, word, replacement):
+        return self._call("store_replacement", word, replacement)
+
+
+def get_final_dictionary(language_dictionary, word):
+    """Return the dictionary that actually checks `word`, through any routing dictionaries."""
+    while isinstance(language_dictionary, RoutingDictionary):
+        language_dictionary = language_dictionary.dictionary_for(word)
+    return language_dictionary
+
+
+class ScriptRoutedDictionary(RoutingDictionary):
+    """A dictionary handing each word to the dictionary of its script.
+
+    The first dictionary is the one the user asked for: it gets the words
+    of its own script, and those of scripts no other dictionary covers,
+    which are then reported as before. It also gives the text its tokenizer
+    and normalization.
+    """
+
+    def __init__(self, dictionaries):
+        self.dictionaries = list(dictionaries)
+        self.primary = self.dictionaries[0]
+        self.tag = self.primary.tag
+        self.tags = [dictionary.tag for dictionary in self.dictionaries]
+        # script -> dictionary, the first one given for the script
+        self._dictionaries_by_script = {}
+        for dictionary in self.dictionaries:
+            self._dictionaries_by_script.setdefault(get_language_script(dictionary.tag), dictionary)
+
+    def dictionary_for(self, word):
+        return self._dictionaries_by_script.get(get_script(word), self.primary)
+
+
+def get_script_routed_dictionary(primary_dictionary, lang_tags):
+    """Return a dictionary checking the words of other scripts with the installed dictionaries of `lang_tags`.
+
+    Languages written in the script of the primary dictionary, or whose
+    dictionary is not installed, are left out. If none is left, the primary
+    dictionary itself is returned. No download is ever offered.
+    """
+    scripts = {get_language_script(primary_dictionary.tag)}
+    dictionaries = [primary_dictionary]
+    for lang_tag in lang_tags:
+        script = get_language_script(lang_tag)
+        if script in scripts:
+            continue
+        try:
+            dictionaries.append(get_enchant_language_dictionary(lang_tag))
+        except LanguageDictionaryNotAvailable:
+            log.debug(f"No dictionary installed for {lang_tag}, not checking {script} words")
+            continue
+        scripts.add(script)
+    if len(dictionaries) == 1:
+        return primary_dictionary
+    return ScriptRoutedDictionary(dictionaries)
@@ -0,0 +1,240 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Word segmentation for scripts written without spaces between words.
+Thai, Lao and Tibetan phrases are split into words by maximal matching
+against a trie of the words of the installed hunspell dictionary. The trie
+is built once per dictionary version and cached on disk.
+"""
+
+import os
+import pickle
+import threading
+import unicodedata
+from functools import partial
+from logHandler import log
+from .language_dictionary import (
+    SPELLCHECK_DICTIONARIES_DIRECTORY,
+    get_installed_dictionary_files,
+    get_installed_dictionary_version,
+    replace_file,
+    add_dictionary_change_listener,
+)
+from .tokenizers import WORD_INNER_CHARACTERS, get_text_word_pattern, register_tokenizer
+from .word_index import read_aff_encoding, read_dictionary_entries
+
+
+TRIE_CACHE_DIRECTORY = os.path.join(SPELLCHECK_DICTIONARIES_DIRECTORY, "segmentation")
+# Bump when the format of the cached tries changes
+TRIE_CACHE_FORMAT = 1
+# language -> characters of its script
+SEGMENTED_SCRIPTS = {
+    "th": ("\u0e00", "\u0e7f"),
+    "lo": ("\u0e80", "\u0eff"),
+    "bo": ("\u0f00", "\u0fff"),
+}
+# language -> characters separating syllables, which belong to no word
+SYLLABLE_SEPARATORS = {
+    # Tsheg and non breaking tsheg
+    "bo": "\u0f0b\u0f0c",
+}
+# Marks the end of a word in a trie node
+_END = ""
+
+
+def read_dictionary_words(dic_path, encoding="utf-8"):
+    """Yield the words of a hunspell .dic file, without their affix flags."""
+    for word, _flags in read_dictionary_entries(dic_path, encoding):
+        yield word
+
+
+def build_trie(words):
+    """Return a trie of `words` as nested dicts keyed by character."""
+    root = {}
+    for word in words:
+        node = root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[_END] = True
+    return root
+
+
+def _find_dictionary_files(lang_tag):
+    """Return (tag, .dic path, .aff path) of the installed dictionary for `lang_tag`, or None.
+
+    That is the dictionary of `lang_tag` itself, or else the first variant of its language.
+    """
+    installed = get_installed_dictionary_files()
+    base = lang_tag.split("_")[0]
+    candidates = sorted(tag for tag in installed if tag.split("_")[0] == base)
+    if lang_tag in installed:
+        candidates.insert(0, lang_tag)
+    if not candidates:
+        return None
+    return (candidates[0], *installed[candidates[0]])
+
+
+class DictionarySegmenter:
+    """A tokenizer splitting the phrases of an unspaced script into dictionary words.
+
+    Phrases are found as usual, then each phrase containing characters of
+    the script is segmented by maximal matching: the segmentation with the
+    fewest characters outside dictionary words, then the fewest words, is
+    chosen. Runs of characters outside dictionary words are yielded as one
+    token, so that they are reported as misspelled. Segmentation takes time
+    linear in the length of the phrase.
+    If no dictionary file can be found, phrases are yielded unsegmented.
+    The dictionary files are looked for once, and again only after
+    `invalidate`, which is called whenever a dictionary changes.
+    """
+
+    def __init__(self, lang_tag, cache_directory=TRIE_CACHE_DIRECTORY):
+        self.lang_tag = lang_tag
+        self.cache_directory = cache_directory
+        self.script_range = SEGMENTED_SCRIPTS[lang_tag]
+        self.separators = SYLLABLE_SEPARATORS.get(lang_tag, "")
+        self._lock = threading.Lock()
+        self._trie = None
+        self._version = None
+        # Whether the dictionary files have been looked for since the last `invalidate`
+        self._resolved = False
+
+    def __call__(self, text):
+        trie = self.get_trie()
+        first, last = self.script_range
+        word_pattern = get_text_word_pattern(text, WORD_INNER_CHARACTERS + self.separators)
+        for match in word_pattern.finditer(text):
+            phrase = match.group()
+            if trie is None or not any(first <= char <= last for char in phrase):
+                yield phrase, match.start()
+                continue
+            offset = match.start()
+            for start, end in self.segment(phrase, trie):
+                yield phrase[start:end], offset + start
+
+    def invalidate(self):
+        with self._lock:
+            self._resolved = False
+
+    def get_trie(self):
+        """Return the trie of the installed dictionary, or None if there is none."""
+        with self._lock:
+            if not self._resolved:
+                self._resolve()
+                self._resolved = True
+            return self._trie
+
+    def _resolve(self):
+        files = _find_dictionary_files(self.lang_tag)
+        if files is None:
+            self._trie = self._version = None
+            return
+        tag, dic_path, aff_path = files
+        try:
+            version = [TRIE_CACHE_FORMAT, *get_installed_dictionary_version(tag)]
+        except OSError:
+            self._trie = self._version = None
+            return
+        if self._trie is None or self._version != version:
+            self._trie = self._load_trie(tag, dic_path, aff_path, version)
+            self._version = version
+
+    def _get_cache_path(self, tag):
+        return os.path.join(self.cache_directory, f"{tag}.trie")
+
+    def _load_trie(self, tag, dic_path, aff_path, version):
+        cache_path = self._get_cache_path(tag)
+        try:
+            with open(cache_path, "rb") as file:
+                cached_version, trie = pickle.load(file)
+        except FileNotFoundError:
+            pass
+        except Exception:
+            log.exception(f"Discarding unreadable segmentation trie for {tag}")
+        else:
+            if cached_version == version:
+                return trie
+        trie = build_trie(read_dictionary_words(dic_path, read_aff_encoding(aff_path)))
+        try:
+            replace_file(
+                cache_path,
+                partial(pickle.dump, (version, trie), protocol=pickle.HIGHEST_PROTOCOL),
+            )
+        except Exception:
+            log.exception(f"Failed to cache the segmentation trie for {tag}")
+        return trie
+
+    def segment(self, phrase, trie):
+        """Return the (start, end) spans of the words of `phrase`."""
+        length = len(phrase)
+        separators = self.separators
+        # A word may not start or end before a combining mark
+        is_boundary = [
+            index == length or unicodedata.category(phrase[index])[0] != "M"
+            for index in range(length + 1)
+        ]
+        # best[i]: (characters outside words, word count) of the best segmentation of phrase[:i]
+        best = [None] * (length + 1)
+        best[0] = (0, 0)
+        # back[i]: (start of the last piece ending at i, whether it is a dictionary word)
+        back = [None] * (length + 1)
+
+        def relax(end, cost, start, piece_kind):
+            if best[end] is None or cost < best[end]:
+                best[end] = cost
+                back[end] = (start, piece_kind)
+
+        for start in range(length):
+            if best[start] is None or not is_boundary[start]:
+                continue
+            unknown, words = best[start]
+            if phrase[start] in separators:
+                relax(start + 1, (unknown, words), start, None)
+                continue
+            node = trie
+            end = start
+            while end < length:
+                node = node.get(phrase[end])
+                if node is None:
+                    break
+                end += 1
+                if _END in node and is_boundary[end]:
+                    relax(end, (unknown, words + 1), start, True)
+            # Otherwise skip one character with its marks
+            end = start + 1
+            while not is_boundary[end]:
+                end += 1
+            relax(end, (unknown + end - start, words + 1), start, False)
+        pieces = []
+        end = length
+        while end > 0:
+            start, piece_kind = back[end]
+            pieces.append((start, end, piece_kind))
+            end = start
+        spans = []
+        for start, end, piece_kind in reversed(pieces):
+            if piece_kind is None:
+                continue
+            if piece_kind is False and spans and spans[-1][2] is False and spans[-1][1] == start:
+                # Merge runs of unknown characters
+                spans[-1][1] = end
+            else:
+                spans.append([start, end, piece_kind])
+        return [(start, end) for start, end, _piece_kind in spans]
+
+
+_SEGMENTERS = {lang_tag: DictionarySegmenter(lang_tag) for lang_tag in SEGMENTED_SCRIPTS}
+
+
+def _on_dictionary_changed(lang_tag):
+    segmenter = _SEGMENTERS.get(lang_tag.split("_")[0])
+    if segmenter is not None:
+        segmenter.invalidate()
+
+
+for _lang_tag, _segmenter in _SEGMENTERS.items():
+    register_tokenizer(_lang_tag, _segmenter)
+add_dictionary_change_listener(_on_dictionary_changed)
@@ -4,7 +4,8 @@
 Settings UI and related dialogs for the Spellcheck add-on.
 Includes:
 - LanguageChoiceDialog: choose a dialect/language
-- SpellcheckSettingsDialog: manage dictionaries (install/update/delete)
+- SpellcheckSettingsDialog: manage dictionaries (install/update/delete), and
+  choose those which check the words of their script in any text
 - LanguageDictionaryDownloader: download/install/update flow with progress
 """
 
@@ -21,6 +22,7 @@ from .language_dictionary import (
     remove_installed_dictionary,
     download_language_dictionary,
 )
+from .language_resolver import load_mixed_script_lang_tags, save_mixed_script_lang_tags
 
 import addonHandler
 addonHandler.initTranslation()
@@ -73,6 +75,14 @@ class SpellcheckSettingsDialog(wx.Dialog):
         self.listCtrl.InsertColumn(1, _("Status"), width=460)
         panelSizer.Add(self.listCtrl, 1, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.TOP, 10)
 
+        # Words written in the script of the selected dictionary are checked with it
+        self.mixedScriptCheckBox = wx.CheckBox(
+            panel,
+            # Translators: label of a checkbox in the spellcheck settings, applying to the selected dictionary
+            label=_("Check the words written in the script of this language with its dictionary, in any text"),
+        )
+        panelSizer.Add(self.mixedScriptCheckBox, 0, wx.LEFT | wx.RIGHT | wx.TOP, 10)
+
         # Buttons
         btnSizer = wx.BoxSizer(wx.HORIZONTAL)
         self.refreshBtn = wx.Button(panel, label=_("Refresh"))
@@ -101,6 +111,7 @@ class SpellcheckSettingsDialog(wx.Dialog):
         self._items = []
         self._rows = []  # list index -> tag
         self._filterMode = 'all'
+        self._mixedScriptTags = []
 
         # Bindings
         self.refreshBtn.Bind(wx.EVT_BUTTON, self.onRefresh)
@@ -110,6 +121,7 @@ class SpellcheckSettingsDialog(wx.Dialog):
         self.closeBtn.Bind(wx.EVT_BUTTON, lambda evt: self.Close())
         self.filterChoice.Bind(wx.EVT_CHOICE, self.onFilterChanged)
         self.listCtrl.Bind(wx.EVT_LIST_ITEM_SELECTED, self.onSelectionChanged)
+        self.mixedScriptCheckBox.Bind(wx.EVT_CHECKBOX, self.onMixedScriptChanged)
 
         self.populate()
 
@@ -118,6 +130,7 @@ class SpellcheckSettingsDialog(wx.Dialog):
         self._rows = []
         # Get local snapshot without remote calls
         self._items = list_languages_status(include_remote=False)
+        self._mixedScriptTags = load_mixed_script_lang_tags()
         # Render initial view
         self._refresh_list()
         # Now asynchronously fetch remote versions for installed tags and update rows
@@ -158,6 +171,8 @@ class SpellcheckSettingsDialog(wx.Dialog):
                 msg = f"{base} — " + _("Checking for updates…")
             if sizeMB:
                 msg += f" — {sizeMB}"
+            if installed and rec['tag'] in self._mixedScriptTags:
+                msg += " — " + _("Checks its script in any text")
             self.listCtrl.SetItem(idx, 1, msg)
         self._updateButtons()
 
@@ -218,6 +233,8 @@ class SpellcheckSettingsDialog(wx.Dialog):
             self.installBtn.Enable(False)
             self.updateBtn.Enable(False)
             self.deleteBtn.Enable(False)
+            self.mixedScriptCheckBox.Enable(False)
+            self.mixedScriptCheckBox.SetValue(False)
             return
         rec = self._find_item_by_tag(tag)
         installed = rec.get('installed', False) if rec else False
@@ -225,6 +242,23 @@ class SpellcheckSettingsDialog(wx.Dialog):
         self.installBtn.Enable(not installed)
         self.deleteBtn.Enable(installed)
         self.updateBtn.Enable(installed and statusKey == 'updateAvailable')
+        self.mixedScriptCheckBox.Enable(installed)
+        self.mixedScriptCheckBox.SetValue(installed and tag in self._mixedScriptTags)
+
+    def onMixedScriptChanged(self, evt):
+        tag = self._get_selected_tag()
+        if not tag:
+            return
+        tags = [t for t in self._mixedScriptTags if t != tag]
+        if self.mixedScriptCheckBox.GetValue():
+            tags.append(tag)
+        save_mixed_script_lang_tags(tags)
+        self._mixedScriptTags = tags
+        sel = self.listCtrl.GetFirstSelected()
+        self._refresh_list()
+        if sel != -1 and sel < self.listCtrl.GetItemCount():
+            self.listCtrl.Select(sel)
+            self.listCtrl.Focus(sel)
 
     def onRefresh(self, evt):
         self.populate()
@@ -11,6 +11,9 @@ import controlTypes
 import speech
 import queueHandler
 import eventHandler
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
 from enum import Enum, auto
 from contextlib import suppress
 from NVDAObjects import NVDAObject
@@ -21,18 +24,22 @@ from NVDAObjects.behaviors import (
 from keyboardHandler import KeyboardInputGesture
 from scriptHandler import script
 from logHandler import log
-from .helpers import import_bundled_library, play_sound
-
-
-with import_bundled_library():
-    from cached_property import cached_property
-    from enchant.checker import SpellChecker
+from .helpers import play_sound
+from .suggestions import SuggestionPrefetcher
+from .check_engine import CheckResult, MisspellingStream
+from .language_dictionary import get_dictionary_lock
 
 
 # This should be set to Tru in the final release
 # It prevent any key strokes from reaching the application
 # Thereby avoiding any unintentional edits to the underlying text control
 CAPTURE_KEYS_WHILE_IN_FOCUS = True
+# Seconds to wait for the checker when the user moves past the misspellings found so far
+STREAM_WAIT_TIMEOUT = 0.5
+# Misspelling menu items kept around the focused one; the others are made again when reached
+MENU_ITEM_CACHE_SIZE = 32
+# Seconds to wait for suggestions when opening the suggestions menu, before showing it without them
+SUGGESTION_WAIT_TIMEOUT = 0.2
 # Defer creation of paste gesture until runtime to avoid layout issues during import
 
 
@@ -55,6 +62,7 @@ class UserChoiceType(Enum):
     NO_ACTION = auto()
     IGNORE_FOR_THIS_SESSION = auto()
     ADD_TO_PERSONAL_DICTIONARY = auto()
+    REPLACE_ALL = auto()
 
 
 class KeyboardNavigableNVDAObjectMixin:
@@ -75,6 +83,13 @@ class KeyboardNavigableNVDAObjectMixin:
 
 
 class ItemContainerMixin:
+    """A list of items, one of them current, navigated from edge to edge.
+
+    `index_of` compares by identity, as NVDAObject equality is not item
+    identity. It scans the items, which suits the short suggestion menus;
+    SpellCheckMenu looks its items up by misspelling index instead.
+    """
+
     def __len__(self):
         return len(self.items)
 
@@ -82,10 +97,7 @@ class ItemContainerMixin:
         return iter(self.items)
 
     def index_of(self, item):
-        items_hashes = [hash(i) for i in self.items]
-        item_hash = hash(item)
-        if item_hash in items_hashes:
-            return items_hashes.index(item_hash)
+        return next((index for index, other in enumerate(self.items) if other is item), None)
 
     def init_container_state(self, items, on_top_edge=None, on_bottom_edge=None):
         self.items = items
@@ -107,10 +119,6 @@ class ItemContainerMixin:
     def get_current_item(self):
         return self.get_item(self._current_index)
 
-    def remove_item(self, item):
-        item_index = self.index_of(item)
-        self.items.pop(item_index)
-
     def go_to_next(self):
         item = self.get_item(self._current_index + 1)
         if item is not None:
@@ -182,24 +190,55 @@ class MenuItemObject(KeyboardNavigableNVDAObjectMixin, NVDAObject):
 
 
 class MisspellingMenuItemObject(MenuItemObject):
-    def __init__(self, lang_dict, *args, **kwargs):
+    """A misspelling, made by the menu only when navigation reaches it.
+
+    The choice made for it is kept by the menu, so that an item can be
+    dropped and made again without losing anything.
+    """
+
+    def __init__(self, lang_dict, offset, length, misspelling_index, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.lang_dict = lang_dict
+        # Where the misspelling is in the checked text
+        self.offset = offset
+        self.length = length
+        # Index of the misspelling in the CheckResult of the menu
+        self.misspelling_index = misspelling_index
         # Save this here
         self.original_misspelling = self.name
-        self._user_choice = None
+        # Set when the next suggestion chosen applies to every occurrence of the word
+        self._replace_all_pending = False
+        self.update_description()
 
-    @cached_property
-    def suggestions(self):
-        return self.lang_dict.suggest(self.original_misspelling)
+    @property
+    def positionInfo(self):
+        if not self.parent.is_complete:
+            # Reported by reportFocus as "N of at least M" instead
+            return {}
+        return super().positionInfo
+
+    def reportFocus(self):
+        super().reportFocus()
+        if not self.parent.is_complete:
+            speech.speakMessage(
+                # translators: position of a misspelling while the text is still being checked.
+                _("{index} of at least {count}").format(
+                    index=self.parent.index_of(self) + 1, count=len(self.parent)
+                )
+            )
+
+    @property
+    def user_choice(self):
+        return self.parent.get_user_choice(self.misspelling_index)
 
     def get_replacement_info(self):
-        if self._user_choice is not None:
-            choice_type = self._user_choice.choice_type
+        user_choice = self.user_choice
+        if user_choice is not None:
+            choice_type = user_choice.choice_type
             choice_value = (
                 None
                 if choice_type is not UserChoiceType.SUGGESTION
-                else self._user_choice.name
+                else user_choice.name
             )
         else:
             choice_type = UserChoiceType.NO_ACTION
@@ -207,78 +246,58 @@ class MisspellingMenuItemObject(MenuItemObject):
         return (self.original_misspelling, choice_type, choice_value)
 
     def on_user_choice(self, choice):
-        self._user_choice = choice
-        if choice.choice_type is UserChoiceType.SUGGESTION:
-            # translators: appears between the misspelled word and the selected suggestion by the user.
-            desc = _("accepted: {suggestion}").format(suggestion=choice.name)
-        elif choice.choice_type is UserChoiceType.IGNORE_FOR_THIS_SESSION:
+        if choice.choice_type is UserChoiceType.REPLACE_ALL:
+            self._replace_all_pending = True
+            self.suggestions_menu.set_current(0)
+            # translators: announced after choosing "Replace all occurrences" in the suggestions menu.
+            ui.message(_("Choose the suggestion to use for every occurrence"))
+            eventHandler.queueEvent("gainFocus", self.suggestions_menu)
+            return
+        if choice.choice_type is UserChoiceType.IGNORE_FOR_THIS_SESSION:
+            self._replace_all_pending = False
             eventHandler.queueEvent("suggestionsClosed", FakeEditableNVDAObject())
             self.parent.ignore_for_this_session(self)
             return
+        if self._replace_all_pending and choice.choice_type is UserChoiceType.SUGGESTION:
+            self.parent.apply_choice_to_all(self.original_misspelling, choice)
+        else:
+            self.set_user_choice(choice)
+        self._replace_all_pending = False
+        self.back_to_misspelling()
+
+    def set_user_choice(self, choice):
+        self.parent.set_user_choice(self.misspelling_index, choice)
+        self.update_description()
+
+    def update_description(self):
+        choice = self.user_choice
+        if choice is None:
+            desc = ""
+        elif choice.choice_type is UserChoiceType.SUGGESTION:
+            # translators: appears between the misspelled word and the selected suggestion by the user.
+            desc = _("accepted: {suggestion}").format(suggestion=choice.name)
         elif choice.choice_type is UserChoiceType.ADD_TO_PERSONAL_DICTIONARY:
             # translators: appears in the misspelled words menu when a user chooses to add the erroneous word to the personal dictionary.
             desc = _("Added to personal dictionary")
         else:
             desc = self.description
         self.description = desc
-        self.back_to_misspelling()
+
+    @property
+    def suggestions_menu(self):
+        """The suggestions menu of the word, shared by all its occurrences, opened for this one."""
+        return self.parent.get_suggestions_menu(self)
 
     def back_to_misspelling(self):
+        self._replace_all_pending = False
         eventHandler.queueEvent("suggestionsClosed", FakeEditableNVDAObject())
         eventHandler.queueEvent("gainFocus", self.parent)
 
-    @cached_property
-    def suggestions_menu(self):
-        self._suggestions_menu = SuggestionsMenu(name="Suggestions")
-        common_kwargs = {
-            "acceptance_callback": self.on_user_choice,
-            "parent": self._suggestions_menu,
-        }
-        menu_items = [
-            SuggestionMenuItemObject(
-                choice_type=UserChoiceType.SUGGESTION, name=item, **common_kwargs
-            )
-            for item in self.suggestions
-        ]
-        if not menu_items:
-            # No suggestions
-            no_suggestions_item = SuggestionMenuItemObject(
-                choice_type=UserChoiceType.NO_ACTION,
-                name="No Suggestions",
-                **common_kwargs,
-            )
-            no_suggestions_item.states = {
-                controlTypes.STATE_UNAVAILABLE,
-            }
-            menu_items.append(no_suggestions_item)
-        menu_items.extend(
-            [
-                SuggestionMenuItemObject(
-                    choice_type=UserChoiceType.IGNORE_FOR_THIS_SESSION,
-                    # translators: name of the option in the suggestion menu
-                    name=_("Ignore for this session"),
-                    **common_kwargs,
-                ),
-                SuggestionMenuItemObject(
-                    choice_type=UserChoiceType.ADD_TO_PERSONAL_DICTIONARY,
-                    # translators: name of the option in the suggestion menu.
-                    name=_("Add to dictionary"),
-                    **common_kwargs,
-                ),
-            ]
-        )
-        self._suggestions_menu.init_container_state(
-            menu_items,
-            on_top_edge=self.back_to_misspelling,
-        )
-        return self._suggestions_menu
-
     @script(gesture="kb:backspace")
     def script_backspace(self, gesture):
         """Reject suggestion"""
-        if self._user_choice is not None:
-            self._user_choice = None
-            self.description = ""
+        if self.user_choice is not None:
+            self.set_user_choice(None)
             eventHandler.queueEvent("gainFocus", self)
 
     @script(gesture="kb:rightarrow")
@@ -368,10 +387,11 @@ class SuggestionMenuItemObject(MenuItemObject):
 class MenuObject(KeyboardNavigableNVDAObjectMixin, ItemContainerMixin, NVDAObject):
     role = controlTypes.ROLE_MENU
 
-    def __init__(self, name, *args, **kwargs):
+    def __init__(self, name, *args, parent=None, **kwargs):
+        """`parent` is the object focus returns to when the menu closes, the focused one by default."""
         super().__init__(*args, **kwargs)
         self.name = name
-        self.parent = api.getFocusObject()
+        self.parent = parent if parent is not None else api.getFocusObject()
         self.processID = self.parent.processID
 
     def close_menu(self):
@@ -383,71 +403,393 @@ class MenuObject(KeyboardNavigableNVDAObjectMixin, ItemContainerMixin, NVDAObjec
 
 
 class SuggestionsMenu(MenuObject):
+    """The suggestions for a word, shared by all its occurrences.
+
+    The choice goes to `owner`, the misspelling the menu was last opened for.
+    """
+
+    owner = None
+    # The items which do not depend on the suggestions, made once
+    action_items = None
+
+    def accept(self, choice):
+        self.owner.on_user_choice(choice)
+
     def close_menu(self):
         eventHandler.queueEvent("suggestionsClosed", FakeEditableNVDAObject())
         eventHandler.queueEvent("gainFocus", self.parent.parent)
 
 
+class _LazyMenuItems:
+    """The items of a SpellCheckMenu as a sequence, each made when it is accessed."""
+
+    def __init__(self, menu):
+        self._menu = menu
+
+    def __len__(self):
+        return len(self._menu._entries)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._menu._get_entry_item(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
 class SpellCheckMenu(MenuObject):
-    """This is a special menu object."""
+    """This is a special menu object.
+
+    Misspellings are listed as indices into the CheckResult of the stream,
+    and menu items are only made for the misspellings navigation reaches.
+    Only the last MENU_ITEM_CACHE_SIZE of them are kept.
+    """
 
-    def __init__(self, language_dictionary, text_to_process, *args, **kwargs):
+    def __init__(self, language_dictionary, text_to_process, misspellings, *args, **kwargs):
+        """`misspellings` is a `check_engine.MisspellingStream`, which may still be growing, or a CheckResult."""
         super().__init__(*args, **kwargs)
         self.language_dictionary = language_dictionary
         self.text_to_process = text_to_process
-        spellchecker = self.make_spellchecker(
-            self.language_dictionary, self.text_to_process
+        if isinstance(misspellings, CheckResult):
+            misspellings = MisspellingStream.from_result(misspellings)
+        self.misspellings = misspellings
+        self.suggestion_prefetcher = SuggestionPrefetcher(
+            language_dictionary, on_computed=self._on_suggestions_computed
         )
-        misspelling_menu_items = [
-            MisspellingMenuItemObject(
-                parent=self, name=item.word, lang_dict=spellchecker.dict
+        # 1 when the user is moving forward through the misspellings, -1 when moving backward
+        self._direction = 1
+        # Number of misspellings taken from the stream so far
+        self._pulled_count = 0
+        # Indices into the CheckResult of the misspellings in the menu, in document order
+        self._entries = array("l")
+        # misspelling index -> menu item, least recently used first
+        self._item_cache = OrderedDict()
+        self.init_container_state(items=_LazyMenuItems(self))
+        # Ids of the words ignored in this session
+        self._ignored_word_ids = set()
+        # word -> suggestions, computed once for all occurrences
+        self._suggestions_by_word = {}
+        # word -> (number of occurrences it was made for, suggestions menu)
+        self._suggestion_menus_by_word = {}
+        # misspelling index -> choice, for the few misspellings the user chose something for
+        self._choices = {}
+        # word -> choice applied to every occurrence, including those not found yet
+        self._choices_by_word = {}
+        self.pull_misspellings()
+
+    def index_of(self, item):
+        entries = self._entries
+        position = bisect_left(entries, item.misspelling_index)
+        if position < len(entries) and entries[position] == item.misspelling_index:
+            return position
+
+    @property
+    def is_complete(self):
+        """True once every misspelling in the text has been found, and listed in the menu.
+
+        The misspellings found since the last look are listed first, so the
+        length of the menu is final as soon as this is True.
+        """
+        # Read before pulling: once finished, the pull lists every misspelling
+        is_finished = self.misspellings.is_finished
+        self.pull_misspellings()
+        return is_finished
+
+    def pull_misspellings(self):
+        """List the misspellings found since the last call."""
+        word_ids = self.misspellings.result.word_ids
+        available = len(self.misspellings)
+        ignored_word_ids = self._ignored_word_ids
+        self._entries.extend(
+            index
+            for index in range(self._pulled_count, available)
+            if word_ids[index] not in ignored_word_ids
+        )
+        self._pulled_count = available
+
+    def _get_entry_item(self, position):
+        """Return the menu item of the misspelling at `position` in the menu, making it if needed."""
+        misspelling_index = self._entries[position]
+        item = self._item_cache.get(misspelling_index)
+        if item is not None:
+            self._item_cache.move_to_end(misspelling_index)
+            return item
+        misspelling = self.misspellings[misspelling_index]
+        item = self._item_cache[misspelling_index] = MisspellingMenuItemObject(
+            parent=self,
+            name=misspelling.word,
+            lang_dict=self.language_dictionary,
+            offset=misspelling.offset,
+            length=misspelling.length,
+            misspelling_index=misspelling_index,
+        )
+        while len(self._item_cache) > MENU_ITEM_CACHE_SIZE:
+            self._item_cache.popitem(last=False)
+        return item
+
+    def _get_word(self, misspelling_index):
+        result = self.misspellings.result
+        return result.words[result.word_ids[misspelling_index]]
+
+    def get_user_choice(self, misspelling_index):
+        """Return the choice made for the misspelling, or for every occurrence of its word, or None."""
+        if misspelling_index in self._choices:
+            return self._choices[misspelling_index]
+        return self._choices_by_word.get(self._get_word(misspelling_index))
+
+    def set_user_choice(self, misspelling_index, choice):
+        """Make `choice` the choice for the misspelling; None rejects any choice."""
+        self._choices[misspelling_index] = choice
+
+    def get_suggestions(self, word, timeout=None):
+        """Return the suggestions for `word`, shared by all its occurrences.
+
+        Returns None if they are not ready within `timeout` seconds.
+        """
+        suggestions = self._suggestions_by_word.get(word)
+        if suggestions is None:
+            suggestions = self.suggestion_prefetcher.get(word, timeout)
+            if suggestions is not None:
+                self._suggestions_by_word[word] = suggestions
+        return suggestions
+
+    def get_suggestions_menu(self, item):
+        """Return the suggestions menu of the word of `item`, opened for `item`.
+
+        One menu is made per distinct word, and only filled again if more
+        occurrences of the word have been found since, or if it was opened
+        before the suggestions were ready. In that case, it is filled
+        again as soon as they are.
+        """
+        word = item.original_misspelling
+        occurrence_count = len(self.misspellings.positions_of(word))
+        made_for_count, suggestions_menu = self._suggestion_menus_by_word.get(word, (None, None))
+        if suggestions_menu is None:
+            suggestions_menu = SuggestionsMenu(name="Suggestions")
+        if made_for_count != occurrence_count or word not in self._suggestions_by_word:
+            self._fill_suggestions_menu(suggestions_menu, word, occurrence_count)
+            self._suggestion_menus_by_word[word] = (occurrence_count, suggestions_menu)
+        suggestions_menu.owner = item
+        suggestions_menu.parent = item
+        suggestions_menu.on_top_edge = item.back_to_misspelling
+        return suggestions_menu
+
+    def _fill_suggestions_menu(self, suggestions_menu, word, occurrence_count, timeout=SUGGESTION_WAIT_TIMEOUT):
+        common_kwargs = {
+            "acceptance_callback": suggestions_menu.accept,
+            "parent": suggestions_menu,
+        }
+        suggestions = self.get_suggestions(word, timeout)
+        if suggestions is None:
+            computing_item = SuggestionMenuItemObject(
+                choice_type=UserChoiceType.NO_ACTION,
+                # translators: shown in the suggestion menu until the suggestions are ready.
+                name=_("Computing suggestions"),
+                **common_kwargs,
             )
-            for item in spellchecker
-        ]
-        self.init_container_state(
-            # Here we consume our SpellChecker for the first time
-            # If you did a for-loop after this line, you'll get nothing
-            items=misspelling_menu_items
+            computing_item.states = {
+                controlTypes.STATE_UNAVAILABLE,
+            }
+            menu_items = [computing_item]
+        elif not suggestions:
+            # No suggestions
+            no_suggestions_item = SuggestionMenuItemObject(
+                choice_type=UserChoiceType.NO_ACTION,
+                name="No Suggestions",
+                **common_kwargs,
+            )
+            no_suggestions_item.states = {
+                controlTypes.STATE_UNAVAILABLE,
+            }
+            menu_items = [no_suggestions_item]
+        else:
+            menu_items = [
+                SuggestionMenuItemObject(
+                    choice_type=UserChoiceType.SUGGESTION, name=suggestion, **common_kwargs
+                )
+                for suggestion in suggestions
+            ]
+            if occurrence_count > 1:
+                menu_items.append(
+                    SuggestionMenuItemObject(
+                        choice_type=UserChoiceType.REPLACE_ALL,
+                        # translators: name of the option in the suggestion menu.
+                        name=_("Replace all {count} occurrences").format(count=occurrence_count),
+                        **common_kwargs,
+                    )
+                )
+        if suggestions_menu.action_items is None:
+            # The same objects every time, so that they stay usable while the menu is filled again
+            suggestions_menu.action_items = [
+                SuggestionMenuItemObject(
+                    choice_type=UserChoiceType.IGNORE_FOR_THIS_SESSION,
+                    # translators: name of the option in the suggestion menu
+                    name=_("Ignore for this session"),
+                    **common_kwargs,
+                ),
+                SuggestionMenuItemObject(
+                    choice_type=UserChoiceType.ADD_TO_PERSONAL_DICTIONARY,
+                    # translators: name of the option in the suggestion menu.
+                    name=_("Add to dictionary"),
+                    **common_kwargs,
+                ),
+            ]
+        menu_items.extend(suggestions_menu.action_items)
+        on_top_edge = getattr(suggestions_menu, "on_top_edge", None)
+        suggestions_menu.init_container_state(menu_items, on_top_edge=on_top_edge)
+
+    def _on_suggestions_computed(self, word, suggestions):
+        """Called on the prefetching thread whenever suggestions are ready."""
+        queueHandler.queueFunction(queueHandler.eventQueue, self._update_suggestions_menu, word)
+
+    def _update_suggestions_menu(self, word):
+        """Fill the suggestions menu of `word` again, if it was opened before its suggestions were ready."""
+        made_for_count, suggestions_menu = self._suggestion_menus_by_word.get(word, (None, None))
+        if suggestions_menu is None or word in self._suggestions_by_word:
+            return
+        focus = api.getFocusObject()
+        focused_index = suggestions_menu.index_of(focus)
+        self._fill_suggestions_menu(suggestions_menu, word, made_for_count, timeout=0)
+        if focused_index is None:
+            return
+        if any(focus is item for item in suggestions_menu.action_items):
+            # Keep the focus where it is
+            suggestions_menu.set_current(suggestions_menu.index_of(focus))
+        else:
+            # The placeholder is gone, move to what replaced it
+            suggestions_menu.set_current(0)
+            eventHandler.queueEvent("gainFocus", suggestions_menu.get_current_item())
+
+    def apply_choice_to_all(self, word, choice):
+        """Apply `choice` to every occurrence of `word`, found so far or yet to be found."""
+        self._choices_by_word[word] = choice
+        for misspelling_index in [
+            index for index in self._choices if self._get_word(index) == word
+        ]:
+            del self._choices[misspelling_index]
+        for item in self._item_cache.values():
+            if item.original_misspelling == word:
+                item.update_description()
+
+    def remove_word(self, word):
+        """Remove every occurrence of `word` from the menu, including those not found yet."""
+        word_id = self.misspellings.result.get_word_id(word)
+        if word_id is None:
+            return
+        self._ignored_word_ids.add(word_id)
+        word_ids = self.misspellings.result.word_ids
+        self._entries = array(
+            "l", (index for index in self._entries if word_ids[index] != word_id)
         )
-        # A list of ignored words in this session
-        self._ignored_words = []
+        for misspelling_index in [
+            index for index, item in self._item_cache.items() if item.original_misspelling == word
+        ]:
+            del self._item_cache[misspelling_index]
+
+    def ensure_item(self, index, timeout=STREAM_WAIT_TIMEOUT):
+        """Make sure the item at `index` exists, waiting briefly for the checker if needed.
+
+        Returns False if the item is not available, either because the text has
+        fewer misspellings or because the checker did not find it in time.
+        """
+        self.pull_misspellings()
+        while index >= len(self.items) and not self.is_complete:
+            if not self.misspellings.wait_for(self._pulled_count, timeout):
+                self.pull_misspellings()
+                break
+            self.pull_misspellings()
+        return index < len(self.items)
+
+    def get_item(self, index):
+        if index >= len(self.items):
+            self.ensure_item(index)
+        return super().get_item(index)
+
+    def go_to_next(self):
+        self._direction = 1
+        if not self.ensure_item(self._current_index + 1) and not self.is_complete:
+            # translators: announced when the user reaches the last misspelling found while checking continues.
+            ui.message(_("Still checking spelling"))
+            return
+        item = super().go_to_next()
+        self.prefetch_suggestions()
+        return item
+
+    def go_to_prev(self):
+        self._direction = -1
+        item = super().go_to_prev()
+        self.prefetch_suggestions()
+        return item
+
+    def prefetch_suggestions(self):
+        """Start computing suggestions for the current misspelling and the next ones in the direction of travel."""
+        words = []
+        index = self._current_index
+        while 0 <= index < len(self._entries) and len(words) <= self.suggestion_prefetcher.lookahead:
+            word = self._get_word(self._entries[index])
+            if word not in words:
+                words.append(word)
+            index += self._direction
+        self.suggestion_prefetcher.prefetch(words)
+
+    def event_gainFocus(self):
+        self.prefetch_suggestions()
+        super().event_gainFocus()
 
-    def make_spellchecker(self, language_dictionary, text):
-        spellchecker = SpellChecker(language_dictionary)
-        spellchecker.set_text(text)
-        return spellchecker
+    def close_menu(self):
+        # Nobody is interested in further misspellings
+        self.misspellings.cancel()
+        self.suggestion_prefetcher.close()
+        super().close_menu()
 
     def get_corrected_text(self):
-        # We should reinitialize the spellChecker class with the same text we used to initialize it in the first place
-        spellchecker = self.make_spellchecker(
-            self.language_dictionary, self.text_to_process
-        )
-        for ignored_word in self._ignored_words:
-            spellchecker.ignore_always(ignored_word)
-        replacement_info = [misspelling.get_replacement_info() for misspelling in self]
-        for (chk, replacement_info) in zip(spellchecker, replacement_info):
-            misspelling, choice_type, choice_value = replacement_info
-            # Sanity check. Remove
-            if chk.word != misspelling:
-                tones.beep(400, 400)
-            if choice_type is UserChoiceType.SUGGESTION:
-                chk.replace(choice_value)
-            elif choice_type is UserChoiceType.ADD_TO_PERSONAL_DICTIONARY:
-                chk.add()
-        return spellchecker.get_text()
+        """Splice the accepted suggestions into the checked text in one pass.
+
+        Misspellings are kept in document order with their offsets, so
+        there is no need to check the text again. Every misspelling found
+        so far is covered, including those the menu has not listed yet, so
+        a choice applied to all occurrences of a word reaches each of them.
+        Text the check has not reached yet is kept as it is.
+        """
+        self.pull_misspellings()
+        text = self.text_to_process
+        result = self.misspellings.result
+        word_ids = result.word_ids
+        ignored_word_ids = self._ignored_word_ids
+        parts = []
+        last_end = 0
+        added_words = set()
+        dictionary_lock = get_dictionary_lock(self.language_dictionary)
+        for misspelling_index in range(self._pulled_count):
+            if word_ids[misspelling_index] in ignored_word_ids:
+                continue
+            choice = self.get_user_choice(misspelling_index)
+            if choice is None:
+                continue
+            word = self._get_word(misspelling_index)
+            if choice.choice_type is UserChoiceType.SUGGESTION:
+                offset = result.offsets[misspelling_index]
+                parts.append(text[last_end:offset])
+                parts.append(choice.name)
+                last_end = offset + result.lengths[misspelling_index]
+                with dictionary_lock, suppress(Exception):
+                    self.language_dictionary.store_replacement(word, choice.name)
+            elif choice.choice_type is UserChoiceType.ADD_TO_PERSONAL_DICTIONARY:
+                if word not in added_words:
+                    added_words.add(word)
+                    with dictionary_lock:
+                        self.language_dictionary.add(word)
+        parts.append(text[last_end:])
+        return "".join(parts)
 
     def ignore_for_this_session(self, item):
         misspelling = item.original_misspelling
-        self._ignored_words.append(misspelling)
-        current_focus_index = self.index_of(item)
-        items_to_remove = [
-            menu_item
-            for menu_item in self
-            if menu_item.original_misspelling == misspelling
-        ]
-        for rmv_item in items_to_remove:
-            self.remove_item(rmv_item)
-        if self:
+        self.remove_word(misspelling)
+        if self.ensure_item(0):
             self.set_current(0)
             eventHandler.queueEvent("gainFocus", self)
         else:
@@ -457,10 +799,18 @@ class SpellCheckMenu(MenuObject):
             self.close_menu()
 
     def copy_to_clipboard(self):
+        # Stop the check first, so that the copied text matches what was found
+        self.misspellings.cancel()
         api.copyToClip(self.get_corrected_text(), True)
         self.close_menu()
 
     def replace_text(self):
+        """Paste the corrected text over the checked text.
+
+        The check is stopped first: the text it has not reached yet is
+        pasted back unchanged, even where it has more occurrences of a word
+        whose replacement was applied to all of them.
+        """
         try:
             old_clipboard_text = api.getClipData()
         except:
@@ -483,10 +833,14 @@ class SpellCheckMenu(MenuObject):
                 controlTypes.OutputReason.FOCUS,
             )
         else:
+            self.misspellings.cancel()
             api.copyToClip(self.get_corrected_text())
+            self.suggestion_prefetcher.close()
             queueHandler.queueFunction(
                 queueHandler.eventQueue, api.setFocusObject, self.parent
             )
+            # The focus may have moved elsewhere while the text was being checked
+            queueHandler.queueFunction(queueHandler.eventQueue, self.parent.setFocus)
             # Create and send the paste gesture at runtime; avoids layout-dependent errors at import time
             def _do_paste():
                 try:
@@ -0,0 +1,145 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Persistent suggestion cache.
+Users meet the same misspellings day after day, so the suggestions computed by
+hunspell are stored on disk, one compressed file per language, and reused
+for as long as the dictionary they came from stays the same.
+"""
+
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import suppress
+from logHandler import log
+from .language_dictionary import (
+    SPELLCHECK_DICTIONARIES_DIRECTORY,
+    get_local_dictionary_version,
+    add_dictionary_change_listener,
+    is_affected_by_dictionary_change,
+)
+
+
+SUGGESTION_CACHE_DIRECTORY = os.path.join(SPELLCHECK_DICTIONARIES_DIRECTORY, "suggestions")
+# Maximum number of words kept per language
+SUGGESTION_CACHE_SIZE = 5000
+# Suggestions are stored joined by this character, which never appears in a word
+_SEPARATOR = "\t"
+
+
+class _CacheTable:
+    """Suggestions of one language, for one version of its dictionary."""
+
+    def __init__(self, version, entries=None):
+        self.version = version
+        # word -> joined suggestions, least recently used first
+        self.entries = entries if entries is not None else OrderedDict()
+        self.dirty = False
+
+
+class PersistentSuggestionCache:
+    """An LRU cache of suggestions keyed by language tag, dictionary version and word.
+
+    The dictionary version is the commit recorded in `_meta.json` by
+    `set_local_dictionary_version`. Tables are loaded lazily, kept in memory
+    and written back by `save`. Installing, updating or removing a dictionary
+    drops its table.
+    """
+
+    def __init__(self, directory=SUGGESTION_CACHE_DIRECTORY, max_entries=SUGGESTION_CACHE_SIZE):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._tables = {}
+
+    def get(self, lang_tag, word):
+        """Return the cached suggestions for `word`, or None."""
+        with self._lock:
+            table = self._get_table(lang_tag)
+            joined = table.entries.get(word)
+            if joined is None:
+                return None
+            table.entries.move_to_end(word)
+            return joined.split(_SEPARATOR) if joined else []
+
+    def put(self, lang_tag, word, suggestions):
+        with self._lock:
+            table = self._get_table(lang_tag)
+            table.entries[word] = _SEPARATOR.join(suggestions)
+            table.entries.move_to_end(word)
+            while len(table.entries) > self.max_entries:
+                table.entries.popitem(last=False)
+            table.dirty = True
+
+    def invalidate(self, lang_tag):
+        """Forget every suggestion stored for `lang_tag`, and for its regional variants if it is a base language.
+
+        Other variants of the language keep theirs, as DictionaryCache keeps their dictionaries.
+        """
+        with self._lock:
+            for tag in list(self._tables):
+                if is_affected_by_dictionary_change(tag, lang_tag):
+                    del self._tables[tag]
+            if not os.path.isdir(self.directory):
+                return
+            for filename in os.listdir(self.directory):
+                if is_affected_by_dictionary_change(filename.split(".")[0], lang_tag):
+                    with suppress(OSError):
+                        os.remove(os.path.join(self.directory, filename))
+
+    def save(self):
+        """Write the tables changed since they were loaded back to disk."""
+        with self._lock:
+            for lang_tag, table in self._tables.items():
+                if not table.dirty:
+                    continue
+                try:
+                    self._write_table(lang_tag, table)
+                    table.dirty = False
+                except Exception:
+                    log.exception(f"Failed to save the suggestion cache for {lang_tag}")
+
+    def _get_path(self, lang_tag):
+        return os.path.join(self.directory, f"{lang_tag}.json.z")
+
+    def _get_table(self, lang_tag):
+        table = self._tables.get(lang_tag)
+        if table is None:
+            table = self._tables[lang_tag] = self._read_table(lang_tag)
+        return table
+
+    def _read_table(self, lang_tag):
+        version = get_local_dictionary_version(lang_tag)
+        try:
+            with open(self._get_path(lang_tag), "rb") as file:
+                data = json.loads(zlib.decompress(file.read()).decode("utf-8"))
+        except FileNotFoundError:
+            return _CacheTable(version)
+        except Exception:
+            log.exception(f"Discarding unreadable suggestion cache for {lang_tag}")
+            return _CacheTable(version)
+        if data.get("version") != version:
+            # Computed with another version of the dictionary
+            return _CacheTable(version)
+        return _CacheTable(version, OrderedDict(data.get("entries", ())))
+
+    def _write_table(self, lang_tag, table):
+        os.makedirs(self.directory, exist_ok=True)
+        data = {"version": table.version, "entries": list(table.entries.items())}
+        payload = zlib.compress(
+            json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        )
+        path = self._get_path(lang_tag)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(payload)
+        os.replace(temp_path, path)
+
+
+SUGGESTION_CACHE = PersistentSuggestionCache()
+add_dictionary_change_listener(SUGGESTION_CACHE.invalidate)
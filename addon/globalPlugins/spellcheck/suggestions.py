@@ -0,0 +1,161 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Suggestion generation.
+Hunspell can take a noticeable time to suggest corrections, so suggestions
+for the misspellings the user is likely to visit next are computed ahead
+of time on a background thread, and remembered across sessions in the
+persistent suggestion cache.
+"""
+
+import threading
+from collections import OrderedDict
+from contextlib import suppress
+from logHandler import log
+from .language_dictionary import get_dictionary_lock
+from .script_routing import get_final_dictionary
+from .suggestion_cache import SUGGESTION_CACHE
+
+
+# Number of misspellings to prefetch ahead of the focused one
+PREFETCH_LOOKAHEAD = 3
+# Maximum number of words whose suggestions are kept in memory
+PREFETCH_CACHE_SIZE = 256
+
+
+class SuggestionPrefetcher:
+    """Computes suggestions for upcoming misspellings on a background thread.
+
+    Call `prefetch` whenever the focus moves with the words the user is likely
+    to visit, most urgent first. Work queued for words that are no longer in
+    that list is dropped. `get` returns the suggestions for a word, waiting for
+    the background computation or computing them directly if needed. With a
+    timeout, `get` never computes in the calling thread: words it gives up on
+    are computed next, whatever is prefetched, and `on_computed(word,
+    suggestions)` is called from the worker thread once they are ready.
+    The worker thread only lives while there is work queued.
+    """
+
+    def __init__(
+        self,
+        language_dictionary,
+        lookahead=PREFETCH_LOOKAHEAD,
+        cache_size=PREFETCH_CACHE_SIZE,
+        on_computed=None,
+    ):
+        self.language_dictionary = language_dictionary
+        self.lookahead = lookahead
+        self.cache_size = cache_size
+        self.on_computed = on_computed
+        self._condition = threading.Condition()
+        # word -> suggestions, least recently used first
+        self._suggestions = OrderedDict()
+        self._pending = []
+        # Words `get` is waiting or gave up waiting for, computed before the pending ones
+        self._requested = []
+        self._computing = None
+        self._worker = None
+
+    def prefetch(self, words):
+        """Queue `words` for background computation, replacing the previous queue."""
+        with self._condition:
+            pending = []
+            for word in words[: self.lookahead + 1]:
+                if word in self._suggestions or word == self._computing or word in pending:
+                    continue
+                pending.append(word)
+            self._pending = pending
+            self._start_worker()
+
+    def cancel(self):
+        """Drop all queued work."""
+        with self._condition:
+            self._pending = []
+            self._requested = []
+
+    def close(self):
+        """Drop all queued work and persist what was computed so far."""
+        self.cancel()
+        SUGGESTION_CACHE.save()
+
+    def get(self, word, timeout=None):
+        """Return the suggestions for `word`, or None if they are not ready within `timeout` seconds."""
+        with self._condition:
+            if timeout is not None:
+                if word not in self._suggestions and word != self._computing and word not in self._requested:
+                    with suppress(ValueError):
+                        self._pending.remove(word)
+                    self._requested.append(word)
+                    self._start_worker()
+                self._condition.wait_for(lambda: word in self._suggestions, timeout)
+                if word not in self._suggestions:
+                    return None
+            while True:
+                if word in self._suggestions:
+                    self._suggestions.move_to_end(word)
+                    return self._suggestions[word]
+                if word != self._computing:
+                    break
+                self._condition.wait()
+            with suppress(ValueError):
+                self._pending.remove(word)
+        suggestions = self._suggest(word)
+        with self._condition:
+            self._store(word, suggestions)
+        return suggestions
+
+    def _start_worker(self):
+        if (self._requested or self._pending) and self._worker is None:
+            self._worker = threading.Thread(
+                target=self._run, name="spellcheck-suggestions", daemon=True
+            )
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                queue = self._requested or self._pending
+                if not queue:
+                    self._worker = None
+                    return
+                word = self._computing = queue.pop(0)
+                requested = queue is self._requested
+            try:
+                suggestions = self._suggest(word)
+            except Exception:
+                log.exception(f"Failed to prefetch suggestions for {word!r}")
+                # Somebody is waiting for these, do not leave them without an answer
+                suggestions = [] if requested else None
+            with self._condition:
+                self._computing = None
+                if suggestions is not None:
+                    self._store(word, suggestions)
+                self._condition.notify_all()
+            if suggestions is not None and self.on_computed is not None:
+                try:
+                    self.on_computed(word, suggestions)
+                except Exception:
+                    log.exception("Suggestions callback failed")
+
+    def _suggest(self, word):
+        # Cached under the language of the dictionary that reported the word
+        language_dictionary = get_final_dictionary(self.language_dictionary, word)
+        lang_tag = getattr(language_dictionary, "tag", None)
+        if lang_tag is not None:
+            suggestions = SUGGESTION_CACHE.get(lang_tag, word)
+            if suggestions is not None:
+                return suggestions
+        with get_dictionary_lock(language_dictionary):
+            suggestions = language_dictionary.suggest(word)
+        if lang_tag is not None:
+            SUGGESTION_CACHE.put(lang_tag, word, suggestions)
+        return suggestions
+
+    def _store(self, word, suggestions):
+        self._suggestions[word] = suggestions
+        self._suggestions.move_to_end(word)
+        while len(self._suggestions) > self.cache_size:
+            self._suggestions.popitem(last=False)
@@ -0,0 +1,185 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Word tokenizers.
+The tokenizer enchant picks for every language splits the text on whitespace,
+then walks each chunk one character at a time in Python. The tokenizers here
+find the same words with a single compiled regular expression instead, and
+can be chosen per language.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from .helpers import import_bundled_library
+
+
+with import_bundled_library():
+    import enchant.tokenize
+    from enchant.errors import TokenizerNotFoundError
+
+
+# Letters and combining marks are only assigned in the first four planes and in plane 14
+_BMP = range(0, 0x10000)
+_ASTRAL_PLANES = (range(0x10000, 0x40000), range(0xE0000, 0xF0000))
+# Characters allowed inside a word, but not at its start or end
+WORD_INNER_CHARACTERS = "'"
+_ASTRAL_CHARACTER = re.compile("[\U00010000-\U0010ffff]")
+
+
+def _to_character_class(codepoints):
+    """Return the body of a regex character class matching `codepoints` (sorted)."""
+    parts = []
+    for codepoint in codepoints:
+        if parts and parts[-1][1] == codepoint - 1:
+            parts[-1][1] = codepoint
+        else:
+            parts.append([codepoint, codepoint])
+    return "".join(
+        re.escape(chr(first)) if first == last else f"{re.escape(chr(first))}-{re.escape(chr(last))}"
+        for first, last in parts
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_unicode_classes(astral):
+    """Return the character classes of letters and of combining marks.
+
+    Python's re module has no Unicode property classes, so they are built
+    once from the Unicode database of the running interpreter. A class
+    holding only characters of the basic multilingual plane is compiled to
+    a bitmap, whereas one with astral characters is matched by scanning its
+    ranges, so astral characters get classes of their own.
+    """
+    letters = []
+    marks = []
+    category = unicodedata.category
+    for plane in _ASTRAL_PLANES if astral else (_BMP,):
+        for codepoint in plane:
+            char = chr(codepoint)
+            if char.isalpha():
+                letters.append(codepoint)
+            elif category(char)[0] == "M":
+                marks.append(codepoint)
+    return _to_character_class(letters), _to_character_class(marks)
+
+
+@lru_cache(maxsize=None)
+def get_word_pattern(inner_characters=WORD_INNER_CHARACTERS, astral=False):
+    """Return the compiled pattern matching one word.
+
+    A word is a run of letters, each followed by any combining marks,
+    possibly joined by `inner_characters`, exactly as enchant's English
+    tokenizer (which enchant uses for every language) delimits them.
+    Pass `astral=True` for texts with characters beyond the basic
+    multilingual plane; the resulting pattern is slower.
+    """
+    letters, marks = _get_unicode_classes(False)
+    letter = f"[{letters}]"
+    mark = f"[{marks}]"
+    if astral:
+        astral_letters, astral_marks = _get_unicode_classes(True)
+        # The lookahead rejects most characters before their ranges are scanned
+        letter = f"(?:{letter}|(?=[\U00010000-\U0010ffff])[{astral_letters}])"
+        mark = f"(?:{mark}|(?=[\U00010000-\U0010ffff])[{astral_marks}])"
+    letter = f"{letter}{mark}*"
+    if not inner_characters:
+        return re.compile(f"(?:{letter})+")
+    inner = f"[{re.escape(inner_characters)}]*"
+    return re.compile(f"{letter}(?:{inner}{letter})*")
+
+
+def get_text_word_pattern(text, inner_characters=WORD_INNER_CHARACTERS):
+    """Return the word pattern to use for `text`, the faster one if it has no astral characters."""
+    astral = _ASTRAL_CHARACTER.search(text) is not None
+    return get_word_pattern(inner_characters, astral)
+
+
+class RegexTokenizer(enchant.tokenize.tokenize):
+    """Yields `(word, position)` for every match of `pattern` in the text.
+
+    Accepts the text as a str, or as the array of characters the SpellChecker
+    works with, which is converted once.
+    """
+
+    def __init__(self, text, pattern):
+        if not isinstance(text, str):
+            text = text.tounicode()
+        super().__init__(text)
+        self._pattern = pattern
+        self._matches = pattern.finditer(text)
+
+    def next(self):
+        match = next(self._matches, None)
+        if match is None:
+            self._offset = len(self._text)
+            raise StopIteration()
+        self._offset = match.end()
+        return (match.group(), match.start())
+
+    def set_offset(self, offset, replaced=False):
+        super().set_offset(offset, replaced)
+        self._matches = self._pattern.finditer(self._text, offset)
+
+
+class word_tokenize(RegexTokenizer):  # noqa: N801
+    """Finds the same words, at the same positions, as enchant's default tokenizer."""
+
+    def __init__(self, text):
+        if not isinstance(text, str):
+            text = text.tounicode()
+        super().__init__(text, get_text_word_pattern(text))
+
+
+class whitespace_tokenize(RegexTokenizer):  # noqa: N801
+    """Splits the text on whitespace, stripping punctuation from both ends of each chunk.
+
+    Yields the same chunks as enchant's basic_tokenize, which filters and
+    chunkers are designed to work on.
+    """
+
+    strip_from_start = enchant.tokenize.basic_tokenize.strip_from_start
+    strip_from_end = enchant.tokenize.basic_tokenize.strip_from_end
+    _pattern = re.compile(r"\S+")
+
+    def __init__(self, text):
+        super().__init__(text, self._pattern)
+
+    def next(self):
+        while True:
+            chunk, position = super().next()
+            start = len(chunk) - len(chunk.lstrip(self.strip_from_start))
+            end = len(chunk.rstrip(self.strip_from_end))
+            if start < end:
+                return (chunk[start:end], position + start)
+
+
+def enchant_tokenize(lang_tag):
+    """Return the tokenizer enchant itself would use for `lang_tag`."""
+    try:
+        return enchant.tokenize.get_tokenizer(lang_tag)
+    except TokenizerNotFoundError:
+        return enchant.tokenize.get_tokenizer(None)
+
+
+DEFAULT_TOKENIZER = word_tokenize
+# language tag -> tokenizer, a callable taking the text and returning a token iterator
+_TOKENIZERS = {}
+
+
+def register_tokenizer(lang_tag, tokenizer):
+    """Use `tokenizer` for `lang_tag` and, if it is a base language, its regional variants."""
+    _TOKENIZERS[lang_tag] = tokenizer
+
+
+def get_tokenizer(lang_tag=None):
+    """Return the tokenizer for `lang_tag`, trying the whole tag and then its base language."""
+    if lang_tag is not None:
+        lang_tag = lang_tag.replace("-", "_")
+        tokenizer = _TOKENIZERS.get(lang_tag) or _TOKENIZERS.get(lang_tag.split("_")[0])
+        if tokenizer is not None:
+            return tokenizer
+    return DEFAULT_TOKENIZER
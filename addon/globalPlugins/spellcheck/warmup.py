@@ -0,0 +1,129 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Dictionary warm-up.
+Loading a hunspell dictionary can take a second or more for large
+languages, which the first check after NVDA starts, or after switching the
+keyboard layout, would otherwise spend while the user waits. The
+dictionaries the next check is likely to need are loaded beforehand on a
+low priority background thread.
+"""
+
+import ctypes
+import threading
+from contextlib import suppress
+import winUser
+from logHandler import log
+from .language_dictionary import preload_language_dictionary, add_dictionary_change_listener
+from .language_detection import LANGUAGE_DETECTOR
+from .language_resolver import get_input_language, load_active_lang_tag, load_mixed_script_lang_tags
+
+
+# Seconds to wait after NVDA starts, leaving it time to settle, before loading anything
+WARMUP_DELAY = 5
+# Seconds between two looks at the input language of the foreground window
+INPUT_LANGUAGE_POLL_INTERVAL = 1
+# Lowers both the CPU and the I/O priority of the calling thread
+_THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+
+
+def get_foreground_input_language():
+    """Return the input language of the foreground window, or None if there is none."""
+    hwnd = winUser.getForegroundWindow()
+    if not hwnd:
+        return None
+    _process_id, thread_id = winUser.getWindowThreadProcessID(hwnd)
+    return get_input_language(thread_id)
+
+
+class DictionaryWarmer:
+    """Preloads the dictionaries the next check is likely to need.
+
+    After `delay` seconds, the dictionaries of the language persisted by
+    `load_active_lang_tag`, of the languages configured for mixed script
+    texts, and of the current input language are loaded, and the language
+    detection profiles of the installed dictionaries are built. The input
+    language is then looked at every `poll_interval` seconds, and the
+    dictionary of every new keyboard layout is loaded as soon as the user
+    switches to it. Languages found to have no installed dictionary are not
+    tried again until `forget` is called.
+    """
+
+    def __init__(
+        self,
+        delay=WARMUP_DELAY,
+        poll_interval=INPUT_LANGUAGE_POLL_INTERVAL,
+        get_input_language=get_foreground_input_language,
+    ):
+        self.delay = delay
+        self.poll_interval = poll_interval
+        self.get_input_language = get_input_language
+        self._stopped = threading.Event()
+        self._thread = None
+        self._input_language = None
+        # Tags found to have no installed dictionary
+        self._unavailable = set()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        # A thread of its own, so that a thread stopped earlier cannot be revived
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(self._stopped,), name="spellcheck-warmup", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread = None
+
+    def forget(self, lang_tag):
+        """Allow `lang_tag` to be preloaded again, after its dictionary was installed or changed."""
+        base = lang_tag.split("_")[0]
+        self._unavailable = {tag for tag in self._unavailable if tag.split("_")[0] != base}
+        # Take the current layout again at the next look
+        self._input_language = None
+
+    def _run(self, stopped):
+        with suppress(Exception):
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), _THREAD_MODE_BACKGROUND_BEGIN)
+        if stopped.wait(self.delay):
+            return
+        self._preload(load_active_lang_tag())
+        for lang_tag in load_mixed_script_lang_tags():
+            self._preload(lang_tag)
+        try:
+            LANGUAGE_DETECTOR.prepare()
+        except Exception:
+            log.exception("Failed to prepare language detection")
+        while not stopped.is_set():
+            self._preload_input_language()
+            stopped.wait(self.poll_interval)
+
+    def _preload_input_language(self):
+        try:
+            lang_tag = self.get_input_language()
+        except Exception:
+            log.debugWarning("Could not get the input language", exc_info=True)
+            return
+        if lang_tag != self._input_language:
+            self._input_language = lang_tag
+            self._preload(lang_tag)
+
+    def _preload(self, lang_tag):
+        if not lang_tag or lang_tag in self._unavailable:
+            return
+        try:
+            if not preload_language_dictionary(lang_tag):
+                self._unavailable.add(lang_tag)
+        except Exception:
+            log.exception(f"Failed to preload the dictionary for {lang_tag}")
+
+
+DICTIONARY_WARMER = DictionaryWarmer()
+add_dictionary_change_listener(DICTIONARY_WARMER.forget)
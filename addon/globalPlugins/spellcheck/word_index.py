@@ -0,0 +1,520 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Precompiled word indexes.
+Loading a hunspell dictionary parses its .dic and .aff files and builds the
+affix tables, which takes seconds and tens of megabytes for the largest
+languages, every time NVDA starts. The words of the dictionary, with the
+forms its affix rules produce in one step, are compiled once into a hash
+table stored next to the dictionary, and memory mapped when the dictionary
+is requested. Words found in the index are correct; hunspell is only loaded
+to check the others.
+"""
+
+import codecs
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+from array import array
+from collections import namedtuple
+from contextlib import suppress
+from zlib import crc32
+from logHandler import log
+
+
+# Bump when the format of the index files, or the words they hold, change
+WORD_INDEX_FORMAT = 1
+WORD_INDEX_EXTENSION = ".wordindex"
+# Expansion stops once an index holds this many words; the rest are left to hunspell
+WORD_INDEX_MAX_WORDS = 3_000_000
+_MAGIC = b"SPWIDX\0\0"
+# Hash table slots of an empty index, doubled whenever the table is half full
+_MIN_SLOT_COUNT = 8
+# Magic, then the length of the JSON header, padded so that the offsets are aligned
+_PREAMBLE = struct.Struct("<8sI")
+# Hunspell encoding names Python does not know
+_ENCODING_ALIASES = {
+    "tis620-2533": "tis_620",
+    "microsoft-cp1251": "cp1251",
+    "iscii-devanagari": "utf-8",
+}
+# A .dic entry: the word, up to its first unescaped slash or whitespace, and its flags
+_DIC_ENTRY = re.compile(r"(?P<word>(?:\\/|[^/\s])+)(?:/(?P<flags>\S*))?")
+
+
+def read_aff_encoding(aff_path):
+    """Return the Python name of the encoding declared by a hunspell .aff file."""
+    encoding = "iso-8859-1"
+    with suppress(OSError):
+        with open(aff_path, "rb") as file:
+            for line in file:
+                if line.startswith(b"SET "):
+                    encoding = line[4:].strip().decode("ascii", "replace")
+                    break
+    encoding = _ENCODING_ALIASES.get(encoding.lower(), encoding)
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        encoding = "utf-8"
+    return encoding
+
+
+def read_dictionary_entries(dic_path, encoding="utf-8"):
+    """Yield the `(word, flags)` entries of a hunspell .dic file, flags as written."""
+    with open(dic_path, "r", encoding=encoding, errors="replace") as file:
+        # The first line holds the number of entries
+        next(file, None)
+        for line in file:
+            if not line.strip() or line.startswith(("\t", "#")):
+                continue
+            match = _DIC_ENTRY.match(line.strip())
+            if match is not None:
+                yield match.group("word").replace("\\/", "/"), match.group("flags") or ""
+
+
+# One affix rule: what to strip and add, and the condition the word must meet
+AffixRule = namedtuple("AffixRule", "strip add condition_length condition")
+
+
+class AffixRules:
+    """The parts of a hunspell .aff file which decide the forms a .dic entry stands for."""
+
+    def __init__(self):
+        self.flag_type = "char"
+        # Flag sets numbered from 1, used in place of flags when the .aff has AF lines
+        self.flag_aliases = []
+        # flag -> [AffixRule]
+        self.prefixes = {}
+        self.suffixes = {}
+        # Flags of words which are not correct by themselves
+        self.need_affix = None
+        self.only_in_compound = None
+        self.forbidden = None
+        self.circumfix = None
+        self.warn = None
+        self.forbid_warn = False
+        self.full_strip = False
+
+    def parse_flags(self, flags):
+        """Return the flags written as `flags` in a .dic entry or an affix rule."""
+        if not flags:
+            return ()
+        if self.flag_aliases and flags.isdigit():
+            index = int(flags) - 1
+            return self.flag_aliases[index] if 0 <= index < len(self.flag_aliases) else ()
+        return self._split_flags(flags)
+
+    def _split_flags(self, flags):
+        if self.flag_type == "long":
+            return tuple(flags[index:index + 2] for index in range(0, len(flags), 2))
+        if self.flag_type == "num":
+            return tuple(flag for flag in flags.split(",") if flag)
+        return tuple(flags)
+
+    @property
+    def excluded_flags(self):
+        """Flags of words, or of affixes, whose forms are not correct by themselves."""
+        flags = {self.need_affix, self.only_in_compound, self.forbidden, self.circumfix}
+        if self.forbid_warn:
+            flags.add(self.warn)
+        flags.discard(None)
+        return flags
+
+    @classmethod
+    def from_file(cls, aff_path, encoding):
+        rules = cls()
+        with open(aff_path, "r", encoding=encoding, errors="replace") as file:
+            lines = [fields for fields in map(str.split, file) if fields and not fields[0].startswith("#")]
+        # The flag type decides how every other flag is read, wherever it is declared
+        for fields in lines:
+            if fields[0] == "FLAG" and len(fields) > 1:
+                rules.flag_type = {"long": "long", "num": "num"}.get(fields[1], "char")
+        special_flags = {
+            "NEEDAFFIX": "need_affix",
+            "PSEUDOROOT": "need_affix",
+            "ONLYINCOMPOUND": "only_in_compound",
+            "FORBIDDENWORD": "forbidden",
+            "CIRCUMFIX": "circumfix",
+            "WARN": "warn",
+        }
+        aliases_remaining = None
+        # (PFX or SFX, flag) -> number of rules of that class still to read
+        rules_remaining = {}
+        # (PFX or SFX, flag, strip, add, continuation flags, condition)
+        affix_lines = []
+        for fields in lines:
+            keyword = fields[0]
+            if keyword == "AF" and len(fields) > 1:
+                if aliases_remaining is None and fields[1].isdigit():
+                    aliases_remaining = int(fields[1])
+                elif aliases_remaining:
+                    aliases_remaining -= 1
+                    rules.flag_aliases.append(rules._split_flags(fields[1]))
+            elif keyword in special_flags and len(fields) > 1:
+                setattr(rules, special_flags[keyword], fields[1])
+            elif keyword == "FORBIDWARN":
+                rules.forbid_warn = True
+            elif keyword == "FULLSTRIP":
+                rules.full_strip = True
+            elif keyword in ("PFX", "SFX") and len(fields) >= 4:
+                key = (keyword, fields[1])
+                if not rules_remaining.get(key):
+                    # The header of the class: its flag, cross product and number of rules
+                    with suppress(ValueError):
+                        rules_remaining[key] = int(fields[3])
+                    continue
+                rules_remaining[key] -= 1
+                add, _slash, continuation = fields[3].partition("/")
+                condition = fields[4] if len(fields) > 4 else "."
+                affix_lines.append((keyword, fields[1], fields[2], add, continuation, condition))
+        excluded_flags = rules.excluded_flags
+        for kind, flag, strip, add, continuation, condition in affix_lines:
+            if excluded_flags.intersection(rules.parse_flags(continuation)):
+                continue
+            compiled_condition = _compile_condition(condition)
+            if compiled_condition is None:
+                continue
+            affixes = rules.prefixes if kind == "PFX" else rules.suffixes
+            affixes.setdefault(flag, []).append(
+                AffixRule(
+                    strip="" if strip == "0" else strip,
+                    add="" if add == "0" else add,
+                    condition_length=compiled_condition[0],
+                    condition=compiled_condition[1],
+                )
+            )
+        return rules
+
+    def iter_forms(self, word, flags):
+        """Yield `word` if it is correct by itself, and the forms a single affix makes of it."""
+        excluded_flags = self.excluded_flags
+        if excluded_flags.isdisjoint(flags):
+            yield word
+        elif self.only_in_compound in flags or self.forbidden in flags:
+            return
+        elif self.forbid_warn and self.warn in flags:
+            return
+        for flag in flags:
+            for rule in self.suffixes.get(flag, ()):
+                if not word.endswith(rule.strip) or not self._can_strip(word, rule):
+                    continue
+                if rule.condition is not None and not rule.condition.fullmatch(word[-rule.condition_length:]):
+                    continue
+                yield word[: len(word) - len(rule.strip)] + rule.add
+            for rule in self.prefixes.get(flag, ()):
+                if not word.startswith(rule.strip) or not self._can_strip(word, rule):
+                    continue
+                if rule.condition is not None and not rule.condition.fullmatch(word[: rule.condition_length]):
+                    continue
+                yield rule.add + word[len(rule.strip):]
+
+    def _can_strip(self, word, rule):
+        # Stripping the whole word is only allowed with FULLSTRIP
+        return len(word) >= rule.condition_length and (
+            len(word) > len(rule.strip) or self.full_strip
+        )
+
+
+def _compile_condition(condition):
+    """Return the number of characters an affix condition looks at, and the pattern matching them.
+
+    The pattern is None for conditions that always hold. Returns None for
+    a condition that cannot be read.
+    """
+    if condition == ".":
+        return 0, None
+    parts = []
+    index = 0
+    while index < len(condition):
+        char = condition[index]
+        if char == "[":
+            end = condition.find("]", index + 1)
+            if end == -1 or end == index + 1:
+                return None
+            body = condition[index + 1:end]
+            negated = body.startswith("^")
+            if negated:
+                body = body[1:]
+            if not body:
+                return None
+            parts.append(f"[{'^' if negated else ''}{re.escape(body)}]")
+            index = end + 1
+        else:
+            parts.append("." if char == "." else re.escape(char))
+            index += 1
+    return len(parts), re.compile("".join(parts), re.DOTALL)
+
+
+def iter_dictionary_words(dic_path, aff_path):
+    """Yield the words hunspell accepts as written, from the .dic entries and their single affixes.
+
+    Words made by more than one affix, compounds, and the case variants
+    hunspell also accepts are left out, and so are the words the dictionary
+    forbids. A word made from several entries is yielded for each of them.
+    """
+    encoding = read_aff_encoding(aff_path)
+    rules = AffixRules.from_file(aff_path, encoding)
+    # Flags as written in the .dic -> their parsed form; entries share a few of them
+    parsed_flags = {}
+
+    def parse_flags(flags):
+        parsed = parsed_flags.get(flags)
+        if parsed is None:
+            parsed = parsed_flags[flags] = rules.parse_flags(flags)
+        return parsed
+
+    forbidden = set()
+    if rules.forbidden is not None:
+        # Forbidden words take precedence over the same form made from another entry, before or after them
+        forbidden.update(
+            word
+            for word, flags in read_dictionary_entries(dic_path, encoding)
+            if rules.forbidden in parse_flags(flags)
+        )
+    for word, flags in read_dictionary_entries(dic_path, encoding):
+        for form in rules.iter_forms(word, parse_flags(flags)):
+            if form and form not in forbidden:
+                yield form
+
+
+def get_index_path(directory, lang_tag, version):
+    digest = hashlib.sha1(json.dumps(version).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(directory, f"{lang_tag}.{digest}{WORD_INDEX_EXTENSION}")
+
+
+def write_word_index(path, words, version, max_words=None):
+    """Write the distinct `words` to a new index file at `path`, replacing it atomically.
+
+    The words are added to the hash table as they come, so that only the
+    index itself is held in memory however many times `words` repeats them.
+    Words after the first `max_words` distinct ones are left out. Returns
+    the number of words written.
+    """
+    encoded_words = bytearray()
+    offsets = array("I", [0])
+    # Open addressing with linear probing, at most half full; a slot holds a word number plus one
+    slots = array("I", bytes(_MIN_SLOT_COUNT * 4))
+    mask = _MIN_SLOT_COUNT - 1
+    for word in words:
+        if max_words is not None and len(offsets) > max_words:
+            break
+        encoded_word = word.encode("utf-8", "surrogatepass")
+        slot = crc32(encoded_word) & mask
+        number = slots[slot]
+        while number:
+            if encoded_words[offsets[number - 1]:offsets[number]] == encoded_word:
+                break
+            slot = (slot + 1) & mask
+            number = slots[slot]
+        if number:
+            continue
+        encoded_words += encoded_word
+        offsets.append(len(encoded_words))
+        slots[slot] = len(offsets) - 1
+        if len(offsets) * 2 > len(slots):
+            slots = _rehash(encoded_words, offsets, len(slots) * 2)
+            mask = len(slots) - 1
+    count = len(offsets) - 1
+    header = json.dumps({"version": version, "count": count, "slots": len(slots)}).encode("utf-8")
+    header += b" " * (-(_PREAMBLE.size + len(header)) % offsets.itemsize)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(_PREAMBLE.pack(_MAGIC, len(header)))
+        file.write(header)
+        slots.tofile(file)
+        offsets.tofile(file)
+        file.write(encoded_words)
+    os.replace(temp_path, path)
+    return count
+
+
+def _rehash(encoded_words, offsets, slot_count):
+    """Return a hash table of `slot_count` slots of the words written so far."""
+    slots = array("I", bytes(slot_count * 4))
+    mask = slot_count - 1
+    for number in range(1, len(offsets)):
+        slot = crc32(encoded_words[offsets[number - 1]:offsets[number]]) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = number
+    return slots
+
+
+class WordIndex:
+    """A memory mapped index file, answering whether a word is one of its words.
+
+    The file is shared by every process mapping it, and its pages are only
+    read in as lookups reach them. The words are stored one after the
+    other, and found through a hash table of their numbers, so that a
+    lookup reads one or two words.
+    Raises ValueError if the file is not an index of the given version.
+    """
+
+    def __init__(self, path, version=None):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_length = _PREAMBLE.unpack_from(self._mapping)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a word index")
+        header = json.loads(bytes(self._mapping[_PREAMBLE.size:_PREAMBLE.size + header_length]))
+        if version is not None and header["version"] != version:
+            raise ValueError(f"{path} was built from another version of the dictionary")
+        self.version = header["version"]
+        self._count = header["count"]
+        slots_start = _PREAMBLE.size + header_length
+        offsets_start = slots_start + header["slots"] * 4
+        self._words_start = offsets_start + (self._count + 1) * 4
+        view = memoryview(self._mapping)
+        self._slots = view[slots_start:offsets_start].cast("I")
+        self._offsets = view[offsets_start:self._words_start].cast("I")
+        self._mask = header["slots"] - 1
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        offsets = self._offsets
+        words_start = self._words_start
+        for number in range(self._count):
+            start = words_start + offsets[number]
+            end = words_start + offsets[number + 1]
+            yield self._mapping[start:end].decode("utf-8", "surrogatepass")
+
+    def __contains__(self, word):
+        try:
+            key = word.encode("utf-8")
+        except UnicodeEncodeError:
+            return False
+        slots = self._slots
+        offsets = self._offsets
+        mask = self._mask
+        words_start = self._words_start
+        length = len(key)
+        slot = crc32(key) & mask
+        while True:
+            number = slots[slot]
+            if not number:
+                return False
+            start = offsets[number - 1]
+            if offsets[number] - start == length:
+                start += words_start
+                if self._mapping[start:start + length] == key:
+                    return True
+            slot = (slot + 1) & mask
+
+
+class IndexedDictionary:
+    """An enchant dictionary checking words against a WordIndex first.
+
+    The enchant dictionary is only loaded once a word is not found in the
+    index, or anything other than `check` is needed. Words the user added
+    are not in the index, so they are found by enchant as before.
+    """
+
+    def __init__(self, tag, word_index, load_dictionary):
+        self.tag = tag
+        self.word_index = word_index
+        self._load_dictionary = load_dictionary
+        self._dictionary = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        return self._dictionary is not None
+
+    def load(self):
+        """Return the enchant dictionary, loading it if necessary."""
+        if self._dictionary is None:
+            with self._lock:
+                if self._dictionary is None:
+                    self._dictionary = self._load_dictionary(self.tag)
+        return self._dictionary
+
+    def check(self, word):
+        if word in self.word_index:
+            return True
+        return self.load().check(word)
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+
+def find_word_index(directory, lang_tag, dictionary_version):
+    """Return the up to date index for the dictionary `lang_tag` installed in `directory`.
+
+    `dictionary_version` identifies the installed files, as returned by
+    `language_dictionary.get_installed_dictionary_version`. Returns None if
+    the index is missing or outdated, in which case it is built in the
+    background.
+    """
+    dic_path = os.path.join(directory, f"{lang_tag}.dic")
+    aff_path = os.path.join(directory, f"{lang_tag}.aff")
+    version = [WORD_INDEX_FORMAT, sys.byteorder, *dictionary_version]
+    path = get_index_path(directory, lang_tag, version)
+    try:
+        return WordIndex(path, version)
+    except FileNotFoundError:
+        pass
+    except Exception:
+        log.exception(f"Discarding unreadable word index {path}")
+    _build_in_background(directory, lang_tag, dic_path, aff_path, version)
+    return None
+
+
+_building = set()
+_building_lock = threading.Lock()
+
+
+def _build_in_background(directory, lang_tag, dic_path, aff_path, version):
+    path = get_index_path(directory, lang_tag, version)
+    with _building_lock:
+        if path in _building:
+            return
+        _building.add(path)
+    threading.Thread(
+        target=_build,
+        args=(directory, lang_tag, dic_path, aff_path, version),
+        name="spellcheck-word-index",
+        daemon=True,
+    ).start()
+
+
+def _build(directory, lang_tag, dic_path, aff_path, version):
+    path = get_index_path(directory, lang_tag, version)
+    try:
+        count = write_word_index(
+            path, iter_dictionary_words(dic_path, aff_path), version, WORD_INDEX_MAX_WORDS
+        )
+        log.debug(f"Built the word index of {lang_tag} with {count} words")
+    except Exception:
+        log.exception(f"Failed to build the word index of {lang_tag}")
+    finally:
+        with _building_lock:
+            _building.discard(path)
+    remove_word_indexes(directory, lang_tag, keep=path)
+
+
+def remove_word_indexes(directory, lang_tag, keep=None):
+    """Remove the index files of `lang_tag`, except `keep`.
+
+    Files still mapped cannot be removed on Windows: they are removed
+    the next time around.
+    """
+    prefix = f"{lang_tag}."
+    with suppress(OSError):
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if not name.startswith(prefix) or path == keep:
+                continue
+            if name.endswith(WORD_INDEX_EXTENSION) or name.endswith(WORD_INDEX_EXTENSION + ".tmp"):
+                with suppress(OSError):
+                    os.remove(path)
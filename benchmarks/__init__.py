@@ -0,0 +1,5 @@
+"""
+Benchmarks for the Spellcheck add-on, runnable outside NVDA with plain CPython.
+
+Run the whole suite with `python -m benchmarks.run --help`.
+"""
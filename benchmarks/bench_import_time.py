@@ -0,0 +1,140 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Reports what loading the add-on costs, from the output of `python -X importtime`.
+
+The add-on is imported the way NVDA loads it, in a fresh interpreter, then
+again followed by the first network request, which imports the network stack.
+The difference between the two is what every NVDA start used to pay.
+
+Usage: python -m benchmarks.bench_import_time [--repeat N] [--top N]
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+
+from . import nvda_stubs
+
+
+REPEAT = 5
+TOP = 10
+# Top level packages of the network stack
+NETWORK_PACKAGES = (
+    "httpx",
+    "httpcore",
+    "anyio",
+    "sniffio",
+    "h11",
+    "idna",
+    "certifi",
+    "charset_normalizer",
+    "rfc3986",
+)
+_LOAD_PLUGIN = (
+    "from benchmarks import nvda_stubs; "
+    f"nvda_stubs.install(); import {nvda_stubs.PLUGIN_PACKAGE}"
+)
+_LOAD_NETWORK = f"from {nvda_stubs.PLUGIN_PACKAGE} import network; network.get_httpx()"
+_IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def _parse(output):
+    """Return {module: (self microseconds, cumulative microseconds)} from importtime output."""
+    modules = {}
+    for line in output.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match is not None:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return modules
+
+
+def measure(code):
+    """Run `code` in a fresh interpreter, and return its import times."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=nvda_stubs.REPO_DIRECTORY,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return _parse(completed.stderr)
+
+
+def _is_network_module(name):
+    return name.split(".")[0] in NETWORK_PACKAGES
+
+
+def summarize(modules, startup_modules=()):
+    """Summarize the import times of `modules`, leaving out those the interpreter imports at startup."""
+    network_modules = [
+        name for name in modules if _is_network_module(name) and name not in startup_modules
+    ]
+    plugin_modules = {
+        name: times for name, times in modules.items() if name.startswith(nvda_stubs.PLUGIN_PACKAGE)
+    }
+    return dict(
+        plugin_microseconds=modules.get(nvda_stubs.PLUGIN_PACKAGE, (0, 0))[1],
+        # Including the standard library modules httpx needs
+        network_microseconds=modules.get("httpx", (0, 0))[1],
+        network_modules=len(network_modules),
+        plugin_modules=plugin_modules,
+        modules=modules,
+    )
+
+
+def _best_of(repeat, code, startup_modules):
+    runs = [summarize(measure(code), startup_modules) for _i in range(repeat)]
+    return min(runs, key=lambda summary: summary["plugin_microseconds"])
+
+
+def run(repeat=REPEAT):
+    # A first run compiles the bytecode, so it is not timed
+    measure(_LOAD_PLUGIN)
+    # Site packages may import some of the network stack before anything else runs
+    startup_modules = set(measure("pass"))
+    return dict(
+        load=_best_of(repeat, _LOAD_PLUGIN, startup_modules),
+        load_and_network=_best_of(repeat, f"{_LOAD_PLUGIN}; {_LOAD_NETWORK}", startup_modules),
+    )
+
+
+def _milliseconds(microseconds):
+    return f"{microseconds / 1000:8.1f} ms"
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--top", type=int, default=TOP)
+    args = parser.parse_args(argv[1:])
+    results = run(args.repeat)
+    load = results["load"]
+    network = results["load_and_network"]
+    print(f"Loading the add-on                {_milliseconds(load['plugin_microseconds'])}")
+    print(
+        f"  network stack modules imported  {load['network_modules']:8}   "
+        f"{_milliseconds(load['network_microseconds'])}"
+    )
+    print(
+        f"First network request imports     {network['network_modules']:8}   "
+        f"{_milliseconds(network['network_microseconds'])}"
+    )
+    print(
+        "Loading with the network stack    "
+        f"{_milliseconds(load['plugin_microseconds'] + network['network_microseconds'])}"
+        "   (before the import was deferred)"
+    )
+    print("\nSlowest add-on modules, cumulative:")
+    slowest = sorted(load["plugin_modules"].items(), key=lambda item: item[1][1], reverse=True)
+    for name, (_self_time, cumulative) in slowest[: args.top]:
+        print(f"  {name:50} {_milliseconds(cumulative)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,89 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Benchmarks a misspellings menu with many items: position lookups as done
+on every focus change, and removal of every occurrence of a word as done
+by "Ignore for this session".
+
+Usage: python -m benchmarks.bench_item_container [item_count]
+"""
+
+import sys
+import time
+
+from . import nvda_stubs
+
+
+ITEM_COUNT = 10_000
+# Ten occurrences of each distinct misspelling
+DISTINCT_WORDS = ITEM_COUNT // 10
+
+
+def make_menu(item_count):
+    check_engine = nvda_stubs.import_plugin_module("check_engine")
+    spellcheck_ui = nvda_stubs.import_plugin_module("spellcheck_ui")
+    stream = check_engine.MisspellingStream()
+    distinct_words = max(item_count // 10, 1)
+    for index in range(item_count):
+        word = f"wrd{index % distinct_words}"
+        stream.append(check_engine.Misspelling(word, index * 8, len(word)))
+    stream.finish()
+    return spellcheck_ui.SpellCheckMenu(
+        name="Spelling Errors",
+        language_dictionary=None,
+        text_to_process="",
+        misspellings=stream,
+    )
+
+
+def _legacy_index_of(items, item):
+    """The hash-every-item lookup ItemContainerMixin used to do."""
+    items_hashes = [hash(i) for i in items]
+    item_hash = hash(item)
+    if item_hash in items_hashes:
+        return items_hashes.index(item_hash)
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def run(item_count=ITEM_COUNT):
+    results = {}
+    menu = make_menu(item_count)
+    results["construct"] = _timed(lambda: make_menu(item_count))
+
+    def position_of_every_item():
+        for item in menu.items:
+            item.positionInfo
+
+    results["positionInfo_all_items"] = _timed(position_of_every_item)
+    items = list(menu.items)
+    sample = items[:: max(item_count // 100, 1)]
+    legacy = _timed(lambda: [_legacy_index_of(items, item) for item in sample])
+    results["legacy_positionInfo_all_items_estimate"] = legacy * item_count / len(sample)
+
+    words = list(dict.fromkeys(item.original_misspelling for item in items))
+    results["ignore_one_word"] = _timed(lambda: menu.remove_word(words[0]))
+
+    def ignore_every_word():
+        for word in words[1:]:
+            menu.remove_word(word)
+
+    results["ignore_every_word"] = _timed(ignore_every_word)
+    return results
+
+
+def main(argv):
+    item_count = int(argv[1]) if len(argv) > 1 else ITEM_COUNT
+    for name, seconds in run(item_count).items():
+        print(f"{name:45} {seconds * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
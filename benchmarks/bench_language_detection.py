@@ -0,0 +1,188 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Measures detecting the language of each paragraph of a text mixing several
+languages, from the character n-gram profiles of their installed dictionaries: how
+long building the profiles takes, the detection time per KB of text, the
+first time and once the words have been scored, and
+the share of paragraphs attributed to the right language.
+
+Paragraphs are made of words drawn evenly from the vocabulary of their
+language, a few of them misspelled: the generated corpora favour the words
+that sort first, whose letters are not those of the language as a whole.
+
+The text is then checked in one go with the dictionaries of the detected
+runs, which must give the misspellings found by checking each run on its own.
+
+Usage: python -m benchmarks.bench_language_detection [size] [language...]
+Exits with a non-zero status if detection is slower than MAX_MS_PER_KB, if
+fewer than MIN_ACCURACY of the paragraphs are attributed to their language,
+or if checking the whole text finds different misspellings.
+"""
+
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from . import corpus as corpus_module
+from . import fake_enchant
+from . import run as run_module
+
+
+SIZE = 1_000_000
+LANGUAGES = ("en", "de", "fr_FR", "ru_RU", "ar")
+# Paragraphs in a row written in the same language
+MAX_BLOCK_PARAGRAPHS = 4
+MAX_MS_PER_KB = 1.0
+MIN_ACCURACY = 0.95
+DETECTION_REPEAT = 3
+
+
+def make_paragraph(rng, vocabulary, misspelling_rate=corpus_module.MISSPELLING_RATE):
+    """Return a paragraph of sentences of words drawn evenly from `vocabulary`."""
+    sentences = []
+    for _sentence in range(rng.randint(1, 6)):
+        words = rng.choices(vocabulary, k=rng.randint(4, 20))
+        for index, word in enumerate(words):
+            if rng.random() < misspelling_rate:
+                position = rng.randrange(len(word))
+                words[index] = word[:position] + rng.choice(rng.choice(vocabulary)) + word[position + 1:]
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def make_multilingual_text(vocabularies, size, seed=0):
+    """Return a text of about `size` bytes made of blocks of paragraphs in the languages of `vocabularies`.
+
+    `vocabularies` maps language tags to their words. The paragraphs of the
+    text, and their languages, are returned with it.
+    """
+    rng = random.Random(seed)
+    paragraphs = []
+    languages = []
+    byte_count = 0
+    while byte_count < size:
+        lang_tag = rng.choice(sorted(vocabularies))
+        for _i in range(rng.randint(1, MAX_BLOCK_PARAGRAPHS)):
+            paragraph = make_paragraph(rng, vocabularies[lang_tag])
+            paragraphs.append(paragraph)
+            languages.append(lang_tag)
+            byte_count += len(paragraph.encode("utf-8")) + 1
+    return "\n".join(paragraphs), paragraphs, languages
+
+
+def _check(modules, language_dictionary, text):
+    job = run_module.check_text(modules, language_dictionary, text, parallel_threshold=len(text) + 1)
+    return [(misspelling.word, misspelling.offset) for misspelling in job.misspellings]
+
+
+def run(size=SIZE, languages=LANGUAGES):
+    modules = run_module._Modules()
+    language_detection = run_module.nvda_stubs.import_plugin_module("language_detection")
+    use_fake_enchant = not fake_enchant.is_real_enchant_available()
+    vocabularies = {lang_tag: corpus_module.make_vocabulary(lang_tag) for lang_tag in languages}
+    dictionaries = {
+        lang_tag: run_module.get_dictionary(modules, lang_tag, vocabulary, use_fake_enchant)
+        for lang_tag, vocabulary in vocabularies.items()
+    }
+    text, paragraphs, expected_languages = make_multilingual_text(vocabularies, size)
+    cache_directory = tempfile.mkdtemp(prefix="spellcheck-language-profiles-")
+    try:
+        detector = language_detection.LanguageDetector(cache_directory)
+        start = time.perf_counter()
+        detector.prepare()
+        build_seconds = time.perf_counter() - start
+        reload_detector = language_detection.LanguageDetector(cache_directory)
+        start = time.perf_counter()
+        reload_detector.get_profiles()
+        load_seconds = time.perf_counter() - start
+        # The first detection scores every word, the next ones reuse those scores
+        timings = []
+        for _i in range(DETECTION_REPEAT):
+            start = time.perf_counter()
+            runs = detector.detect_paragraph_languages(text, languages[0])
+            timings.append(time.perf_counter() - start)
+        detect_seconds = timings[0]
+        warm_detect_seconds = min(timings[1:])
+    finally:
+        shutil.rmtree(cache_directory, ignore_errors=True)
+    detected_languages = []
+    run_index = 0
+    offset = 0
+    for paragraph in paragraphs:
+        while runs[run_index].end <= offset and run_index < len(runs) - 1:
+            run_index += 1
+        detected_languages.append(runs[run_index].lang_tag)
+        offset += len(paragraph) + 1
+    correct = sum(1 for expected, detected in zip(expected_languages, detected_languages) if expected == detected)
+    expected_misspellings = []
+    for language_run in runs:
+        expected_misspellings.extend(
+            (word, language_run.start + offset)
+            for word, offset in _check(
+                modules, dictionaries[language_run.lang_tag], text[language_run.start:language_run.end]
+            )
+        )
+    multilingual_dictionary = language_detection.MultilingualDictionary(
+        (language_run.start, language_run.end, dictionaries[language_run.lang_tag]) for language_run in runs
+    )
+    start = time.perf_counter()
+    misspellings = _check(modules, multilingual_dictionary, text)
+    check_seconds = time.perf_counter() - start
+    kilobytes = len(text.encode("utf-8")) / 1000
+    return dict(
+        benchmark="language_detection",
+        languages="+".join(languages),
+        size=len(text.encode("utf-8")),
+        paragraphs=len(paragraphs),
+        runs=len(runs),
+        build_seconds=build_seconds,
+        load_seconds=load_seconds,
+        detect_seconds=detect_seconds,
+        ms_per_kb=detect_seconds * 1000 / kilobytes,
+        warm_detect_seconds=warm_detect_seconds,
+        warm_ms_per_kb=warm_detect_seconds * 1000 / kilobytes,
+        accuracy=correct / len(paragraphs),
+        check_seconds=check_seconds,
+        misspellings=len(misspellings),
+        expected_misspellings=len(expected_misspellings),
+        identical=misspellings == expected_misspellings,
+    )
+
+
+def main(argv):
+    size = corpus_module.parse_size(argv[1]) if len(argv) > 1 else SIZE
+    languages = tuple(argv[2:]) or LANGUAGES
+    result = run(size, languages)
+    print(f"{result['languages']} {corpus_module.format_size(size)}, {result['paragraphs']} paragraphs")
+    print(f"  build profiles     {result['build_seconds'] * 1000:10.1f} ms")
+    print(f"  load profiles      {result['load_seconds'] * 1000:10.1f} ms")
+    print(f"  detect             {result['detect_seconds'] * 1000:10.1f} ms ({result['ms_per_kb']:.3f} ms/KB)")
+    print(
+        f"  detect again       {result['warm_detect_seconds'] * 1000:10.1f} ms "
+        f"({result['warm_ms_per_kb']:.3f} ms/KB)"
+    )
+    print(f"  accuracy           {result['accuracy'] * 100:10.1f} % of paragraphs, {result['runs']} runs")
+    print(
+        f"  check              {result['check_seconds'] * 1000:10.1f} ms, "
+        f"{result['misspellings']} misspellings ({result['expected_misspellings']} expected)"
+    )
+    failed = (
+        result["ms_per_kb"] > MAX_MS_PER_KB or result["accuracy"] < MIN_ACCURACY or not result["identical"]
+    )
+    if result["ms_per_kb"] > MAX_MS_PER_KB:
+        print(f"  SLOWER THAN {MAX_MS_PER_KB} ms/KB")
+    if result["accuracy"] < MIN_ACCURACY:
+        print(f"  LESS ACCURATE THAN {MIN_ACCURACY * 100:.0f} %")
+    if not result["identical"]:
+        print("  DIFFERENT MISSPELLINGS")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,107 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Compares the memory taken by the misspellings menu with the memory taken by
+a menu item object for every misspelling, as the menu used to make them.
+
+The menu is measured after moving through its first items, as the user
+would. NVDA objects are much larger than the stand-ins used here, so the
+items made up front weigh more in NVDA than this shows.
+
+Usage: python -m benchmarks.bench_menu_memory [error_counts]
+"""
+
+import sys
+import tracemalloc
+
+from . import bench_item_container
+from . import nvda_stubs
+
+
+ERROR_COUNTS = (1_000, 10_000, 100_000)
+# Items the user moves through before the menu is measured
+VISITED_ITEMS = 100
+
+
+def _allocated(func):
+    """Return what `func` returns, and the memory it allocated which is still in use, in bytes."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        value = func()
+        return value, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def make_every_item(menu):
+    """Make an item for every misspelling, with the indexes the menu used to keep."""
+    spellcheck_ui = nvda_stubs.import_plugin_module("spellcheck_ui")
+    items = []
+    index_by_id = {}
+    items_by_word = {}
+    for index, misspelling in enumerate(menu.misspellings):
+        item = spellcheck_ui.MisspellingMenuItemObject(
+            parent=menu,
+            name=misspelling.word,
+            lang_dict=None,
+            offset=misspelling.offset,
+            length=misspelling.length,
+            misspelling_index=index,
+        )
+        items.append(item)
+        index_by_id[id(item)] = index
+        items_by_word.setdefault(misspelling.word, []).append(item)
+    return items, index_by_id, items_by_word
+
+
+def visit_items(menu):
+    for _i in range(VISITED_ITEMS):
+        menu.go_to_next()
+    return menu
+
+
+def run(error_counts=ERROR_COUNTS):
+    results = []
+    for error_count in error_counts:
+        # The menu holds the misspellings found by the checker in both cases
+        stream = bench_item_container.make_menu(error_count).misspellings
+        spellcheck_ui = nvda_stubs.import_plugin_module("spellcheck_ui")
+
+        def make_menu():
+            menu = spellcheck_ui.SpellCheckMenu(
+                name="Spelling Errors",
+                language_dictionary=None,
+                text_to_process="",
+                misspellings=stream,
+            )
+            return visit_items(menu)
+
+        menu, menu_bytes = _allocated(make_menu)
+        _items, items_bytes = _allocated(lambda: make_every_item(menu))
+        results.append(
+            dict(
+                benchmark="menu_memory",
+                size=error_count,
+                menu_bytes=menu_bytes,
+                every_item_bytes=items_bytes,
+                ratio=items_bytes / menu_bytes,
+            )
+        )
+    return results
+
+
+def main(argv):
+    error_counts = [int(count) for count in argv[1].split(",")] if len(argv) > 1 else ERROR_COUNTS
+    for result in run(error_counts):
+        print(
+            f"{result['size']:>8} errors   menu {result['menu_bytes'] / 1024:10.1f} KB   "
+            f"item per error {result['every_item_bytes'] / 1024:10.1f} KB   {result['ratio']:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv)
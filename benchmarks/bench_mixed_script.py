@@ -0,0 +1,111 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Measures checking a text mixing two scripts, such as Arabic with English
+terms, with the dictionary of the main language alone and with words routed
+by script to the dictionary of their language.
+
+Routing must find exactly the misspellings of the main language the single
+dictionary finds, plus the misspelled foreign words, and none of the
+correctly spelled foreign words, which the single dictionary reports and
+each of which would cost a suggestion lookup.
+
+Usage: python -m benchmarks.bench_mixed_script [size] [main language] [other language]
+Exits with a non-zero status if routing finds different misspellings.
+"""
+
+import random
+import sys
+import time
+
+from . import corpus as corpus_module
+from . import fake_enchant
+from . import run as run_module
+
+
+SIZE = 1_000_000
+MAIN_LANGUAGE = "ar"
+OTHER_LANGUAGE = "en"
+# Share of the words of the text replaced by words of the other language
+FOREIGN_WORD_RATE = 0.1
+
+
+def make_mixed_text(main_corpus, other_corpus, rate=FOREIGN_WORD_RATE, seed=0):
+    """Replace a share of the words of `main_corpus` with words of `other_corpus`."""
+    rng = random.Random(seed)
+    other_words = other_corpus.text.split()
+    words = main_corpus.text.split(" ")
+    for index in range(len(words)):
+        if rng.random() < rate:
+            words[index] = rng.choice(other_words)
+    return " ".join(words)
+
+
+def _check(modules, language_dictionary, text):
+    start = time.perf_counter()
+    job = run_module.check_text(modules, language_dictionary, text, parallel_threshold=len(text) + 1)
+    return time.perf_counter() - start, list(job.misspellings)
+
+
+def run(size=SIZE, main_language=MAIN_LANGUAGE, other_language=OTHER_LANGUAGE):
+    modules = run_module._Modules()
+    script_routing = run_module.nvda_stubs.import_plugin_module("script_routing")
+    use_fake_enchant = not fake_enchant.is_real_enchant_available()
+    main_corpus = corpus_module.generate_corpus(main_language, size)
+    other_corpus = corpus_module.generate_corpus(other_language, size // 10)
+    text = make_mixed_text(main_corpus, other_corpus)
+    main_dictionary = run_module.get_dictionary(
+        modules, main_language, main_corpus.vocabulary, use_fake_enchant
+    )
+    run_module.get_dictionary(modules, other_language, other_corpus.vocabulary, use_fake_enchant)
+    routed_dictionary = script_routing.get_script_routed_dictionary(main_dictionary, [other_language])
+    single_seconds, single = _check(modules, main_dictionary, text)
+    routed_seconds, routed = _check(modules, routed_dictionary, text)
+    main_script = script_routing.get_language_script(main_language)
+
+    def is_main_script(word):
+        return script_routing.get_script(word) == main_script
+
+    other_vocabulary = set(other_corpus.vocabulary)
+    expected_main = [misspelling for misspelling in single if is_main_script(misspelling.word)]
+    routed_main = [misspelling for misspelling in routed if is_main_script(misspelling.word)]
+    routed_other = [misspelling for misspelling in routed if not is_main_script(misspelling.word)]
+    return dict(
+        benchmark="mixed_script",
+        languages=f"{main_language}+{other_language}",
+        size=len(text.encode("utf-8")),
+        single_seconds=single_seconds,
+        routed_seconds=routed_seconds,
+        single_misspellings=len(single),
+        routed_misspellings=len(routed),
+        single_distinct_misspellings=len({misspelling.word for misspelling in single}),
+        routed_distinct_misspellings=len({misspelling.word for misspelling in routed}),
+        identical=(
+            routed_main == expected_main
+            and not any(misspelling.word.lower() in other_vocabulary for misspelling in routed_other)
+        ),
+    )
+
+
+def main(argv):
+    size = corpus_module.parse_size(argv[1]) if len(argv) > 1 else SIZE
+    main_language = argv[2] if len(argv) > 2 else MAIN_LANGUAGE
+    other_language = argv[3] if len(argv) > 3 else OTHER_LANGUAGE
+    result = run(size, main_language, other_language)
+    print(f"{result['languages']} {corpus_module.format_size(size)}")
+    for name in ("single", "routed"):
+        print(
+            f"  {name:6} {result[f'{name}_seconds'] * 1000:9.1f} ms "
+            f"{result[f'{name}_misspellings']:7} misspellings, "
+            f"{result[f'{name}_distinct_misspellings']:6} to suggest for"
+        )
+    if not result["identical"]:
+        print("  DIFFERENT MISSPELLINGS")
+    return 0 if result["identical"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
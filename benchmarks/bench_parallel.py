@@ -0,0 +1,82 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Measures how checking a large text scales with the number of threads
+checking its shards, and makes sure every thread count finds the same
+misspellings, at the same offsets, as checking the text in one piece.
+
+With the word lists standing in for libenchant, lookups run in Python and
+hold the GIL, so only a real libenchant shows the speedup.
+
+Usage: python -m benchmarks.bench_parallel [size] [languages]
+Exits with a non-zero status if any thread count finds different misspellings.
+"""
+
+import sys
+import time
+
+from . import corpus as corpus_module
+from . import fake_enchant
+from . import run as run_module
+
+
+SIZE = 5_000_000
+LANGUAGES = ("en", "ru_RU")
+WORKER_COUNTS = (1, 2, 4, 8)
+
+
+def _check(modules, language_dictionary, text, workers):
+    start = time.perf_counter()
+    job = run_module.check_text(
+        modules, language_dictionary, text, parallel_threshold=0, workers=workers
+    )
+    return time.perf_counter() - start, list(job.misspellings)
+
+
+def run(size=SIZE, languages=LANGUAGES, worker_counts=WORKER_COUNTS):
+    modules = run_module._Modules()
+    use_fake_enchant = not fake_enchant.is_real_enchant_available()
+    results = []
+    for lang_tag in languages:
+        corpus = corpus_module.generate_corpus(lang_tag, size)
+        language_dictionary = run_module.get_dictionary(
+            modules, lang_tag, corpus.vocabulary, use_fake_enchant
+        )
+        # Load the dictionaries of every thread outside of the timings
+        modules.language_dictionary.DICTIONARY_CACHE.request_handles(lang_tag, max(worker_counts))
+        sequential_seconds, expected = _check(modules, language_dictionary, corpus.text, 1)
+        for workers in worker_counts:
+            seconds, misspellings = _check(modules, language_dictionary, corpus.text, workers)
+            results.append(
+                dict(
+                    benchmark="parallel_check",
+                    language=lang_tag,
+                    size=size,
+                    workers=workers,
+                    seconds=seconds,
+                    speedup=sequential_seconds / seconds,
+                    identical=misspellings == expected,
+                )
+            )
+    return results
+
+
+def main(argv):
+    size = corpus_module.parse_size(argv[1]) if len(argv) > 1 else SIZE
+    languages = argv[2].split(",") if len(argv) > 2 else LANGUAGES
+    failed = False
+    for result in run(size, languages):
+        failed = failed or not result["identical"]
+        print(
+            f"{result['language']:8} {corpus_module.format_size(size):>8} "
+            f"{result['workers']:2} threads {result['seconds'] * 1000:9.2f} ms "
+            f"{result['speedup']:5.2f}x{'' if result['identical'] else '   DIFFERENT MISSPELLINGS'}"
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,121 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Checks that the add-on's regex word tokenizer finds exactly the words
+enchant's tokenizer finds, at the same positions, and compares their speed.
+
+Usage: python -m benchmarks.bench_tokenizer [size]
+Exits with a non-zero status if any text is tokenized differently.
+"""
+
+import array
+import sys
+import time
+
+from . import nvda_stubs
+from . import corpus as corpus_module
+
+
+SIZE = 1_000_000
+# Texts exercising the corners of enchant's tokenization rules
+TRICKY_SAMPLES = (
+    "",
+    "   \t\n ",
+    "Hello, world! Don't stop: 'quoted' \"double\" (parens) [brackets] end.",
+    "rock'n'roll o''clock trailing'' 'leading ''' ' a'b'",
+    "x)'y foo-bar e-mail l'homme dell'arte aujourd'hui",
+    "123abc ab12cd 3.14 _under_ a_b x² Ⅻ ½ ٣٤ abc٣",
+    "été a'́b ́start mid̈dle não",
+    "नमस्ते दुनिया हिन्दी क्षत्रिय",
+    "مرحبا بالعالم، كيف حالك؟ ـــ",
+    "日本語のテキスト、中文文本。한국어 텍스트",
+    "\U0001d400\U0001d401c \U00010330\U00010331 a\U0001d165b \U0001f600x \U00020000\U00020001",
+    "tab\tseparated nbsp em line　ideographic",
+)
+
+
+def _enchant_tokens(tokenizers, lang_tag, text):
+    tokenizer = tokenizers.enchant_tokenize(lang_tag)
+    return [
+        (word if isinstance(word, str) else word.tounicode(), position)
+        for word, position in tokenizer(array.array("u", text))
+    ]
+
+
+def _regex_tokens(tokenizers, lang_tag, text):
+    # Not get_tokenizer: languages segmented with a dictionary are meant to differ
+    return list(tokenizers.word_tokenize(text))
+
+
+def find_mismatch(tokenizers, lang_tag, text):
+    """Return the first pair of differing tokens, or None if both tokenizers agree."""
+    expected = _enchant_tokens(tokenizers, lang_tag, text)
+    actual = _regex_tokens(tokenizers, lang_tag, text)
+    if expected == actual:
+        return None
+    for expected_token, actual_token in zip(expected, actual):
+        if expected_token != actual_token:
+            return expected_token, actual_token
+    return (expected[len(actual):][:1] or None, actual[len(expected):][:1] or None)
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def run(languages=corpus_module.LANGUAGES, size=SIZE):
+    tokenizers = nvda_stubs.import_plugin_module("tokenizers")
+    # Build the character classes outside of the timings
+    tokenizers.get_word_pattern()
+    results = []
+    for index, text in enumerate(TRICKY_SAMPLES):
+        results.append(
+            dict(
+                benchmark="tokenizer_parity",
+                language=None,
+                size=index,
+                mismatch=find_mismatch(tokenizers, "en", text),
+            )
+        )
+    for lang_tag in languages:
+        text = corpus_module.generate_corpus(lang_tag, size).text
+        enchant_seconds = _timed(lambda: _enchant_tokens(tokenizers, lang_tag, text))
+        regex_seconds = _timed(lambda: _regex_tokens(tokenizers, lang_tag, text))
+        results.append(
+            dict(
+                benchmark="tokenizer_speed",
+                language=lang_tag,
+                size=size,
+                enchant_seconds=enchant_seconds,
+                seconds=regex_seconds,
+                speedup=enchant_seconds / regex_seconds,
+                mismatch=find_mismatch(tokenizers, lang_tag, text),
+            )
+        )
+    return results
+
+
+def main(argv):
+    size = corpus_module.parse_size(argv[1]) if len(argv) > 1 else SIZE
+    failed = False
+    for result in run(size=size):
+        if result["mismatch"] is not None:
+            failed = True
+            print(f"MISMATCH {result['language'] or 'sample'} {result['size']}: {result['mismatch']}")
+        elif result["benchmark"] == "tokenizer_speed":
+            print(
+                f"{result['language']:8} {corpus_module.format_size(size):>8} "
+                f"enchant {result['enchant_seconds'] * 1000:9.2f} ms   "
+                f"regex {result['seconds'] * 1000:9.2f} ms   {result['speedup']:5.1f}x"
+            )
+    print("Tokenizers disagree" if failed else "Identical tokens for every text")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,223 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Measures the precompiled word index: how long building it takes and the
+memory it needs, the size of the file, how long opening it takes compared with loading the dictionary with
+enchant, and the time of a lookup.
+
+Without arguments, a dictionary is generated with prefix and suffix classes
+covering conditions, stripping, continuation flags, NEEDAFFIX, ONLYINCOMPOUND
+and FORBIDDENWORD, and the index must hold exactly the forms those rules
+allow. Given the path of a .dic file (with its .aff next to it), that
+dictionary is indexed instead; with a real libenchant, every indexed word is
+then checked with hunspell, which must accept all of them.
+
+Usage: python -m benchmarks.bench_word_index [path/to/tag.dic]
+Exits with a non-zero status if the index holds a word it should not.
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from . import nvda_stubs
+from . import corpus as corpus_module
+from . import fake_enchant
+
+
+VOCABULARY_SIZE = 50_000
+LOOKUP_COUNT = 100_000
+# Words hunspell is asked about when checking a real dictionary
+PARITY_SAMPLE_SIZE = 200_000
+
+_SAMPLE_AFF = """SET UTF-8
+FLAG long
+NEEDAFFIX Nn
+ONLYINCOMPOUND Oc
+FORBIDDENWORD Fb
+
+SFX Sa Y 3
+SFX Sa 0 s [^sxz]
+SFX Sa 0 es [sxz]
+SFX Sa y ies [^aeiou]y
+
+SFX Sb Y 2
+SFX Sb 0 ing/Nn .
+SFX Sb e ing e
+
+PFX Pu Y 1
+PFX Pu 0 un .
+
+PFX Pr Y 1
+PFX Pr 0 re [^e]
+"""
+# Flags given to the generated words, and whether the word itself is correct
+_SAMPLE_FLAGS = (
+    ("", True),
+    ("SaPu", True),
+    ("SbPr", True),
+    ("SaNn", False),
+    ("Oc", False),
+    ("SaSbPuPr", True),
+)
+
+
+def _expected_forms(word, flags):
+    """The forms of `word` the sample rules allow, written out by hand."""
+    if "Oc" in flags:
+        return set()
+    forms = set() if "Nn" in flags else {word}
+    if "Sa" in flags:
+        if word[-1] in "sxz":
+            forms.add(word + "es")
+        else:
+            forms.add(word + "s")
+        if word.endswith("y") and len(word) > 1 and word[-2] not in "aeiou":
+            forms.add(word[:-1] + "ies")
+    if "Sb" in flags and word.endswith("e") and len(word) > 1:
+        forms.add(word[:-1] + "ing")
+    if "Pu" in flags:
+        forms.add("un" + word)
+    if "Pr" in flags and not word.startswith("e"):
+        forms.add("re" + word)
+    return forms
+
+
+def write_sample_dictionary(directory, tag="xx_XX", size=VOCABULARY_SIZE):
+    """Write a generated dictionary, and return the path of its .dic and the words it allows."""
+    rng = random.Random("word-index")
+    vocabulary = corpus_module.make_vocabulary("en", size)
+    entries = []
+    expected = set()
+    forbidden = set()
+    for word in vocabulary:
+        flags, _correct = rng.choice(_SAMPLE_FLAGS)
+        entries.append(f"{word}/{flags}" if flags else word)
+        expected |= _expected_forms(word, flags)
+    # Forbid some of the forms the rules make of other words
+    for word in rng.sample(sorted(expected), len(expected) // 100):
+        entries.append(f"{word}/Fb")
+        forbidden.add(word)
+    dic_path = os.path.join(directory, f"{tag}.dic")
+    with open(dic_path, "w", encoding="utf-8") as file:
+        file.write(f"{len(entries)}\n")
+        file.write("\n".join(entries) + "\n")
+    with open(os.path.join(directory, f"{tag}.aff"), "w", encoding="utf-8") as file:
+        file.write(_SAMPLE_AFF)
+    return dic_path, expected - forbidden
+
+
+def _time_enchant_load(tag):
+    import enchant
+
+    start = time.perf_counter()
+    try:
+        dictionary = enchant.request_dict(tag)
+    except enchant.errors.DictNotFoundError:
+        return None, None
+    return time.perf_counter() - start, dictionary
+
+
+def run(dic_path=None):
+    nvda_stubs.install()
+    use_fake_enchant = not fake_enchant.is_real_enchant_available()
+    if use_fake_enchant:
+        fake_enchant.install_if_needed()
+    word_index = nvda_stubs.import_plugin_module("word_index")
+    directory = tempfile.mkdtemp(prefix="spellcheck-word-index-")
+    try:
+        expected = None
+        if dic_path is None:
+            dic_path, expected = write_sample_dictionary(directory)
+        tag = os.path.splitext(os.path.basename(dic_path))[0]
+        aff_path = os.path.splitext(dic_path)[0] + ".aff"
+        index_path = os.path.join(directory, f"{tag}{word_index.WORD_INDEX_EXTENSION}")
+
+        def build():
+            return word_index.write_word_index(
+                index_path,
+                word_index.iter_dictionary_words(dic_path, aff_path),
+                version=None,
+                max_words=word_index.WORD_INDEX_MAX_WORDS,
+            )
+
+        start = time.perf_counter()
+        build()
+        build_seconds = time.perf_counter() - start
+        # Built again, as tracing allocations slows building down
+        tracemalloc.start()
+        try:
+            build()
+            build_peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        start = time.perf_counter()
+        index = word_index.WordIndex(index_path)
+        open_seconds = time.perf_counter() - start
+        words = set(index)
+        sample = random.Random(0).choices(sorted(words), k=LOOKUP_COUNT)
+        start = time.perf_counter()
+        found = sum(1 for word in sample if word in index)
+        lookup_seconds = (time.perf_counter() - start) / LOOKUP_COUNT
+        result = dict(
+            benchmark="word_index",
+            language=tag,
+            words=len(words),
+            file_size=os.path.getsize(index_path),
+            build_seconds=build_seconds,
+            build_peak_memory=build_peak_memory,
+            open_seconds=open_seconds,
+            lookup_seconds=lookup_seconds,
+            all_found=found == LOOKUP_COUNT and all(word in index for word in words),
+            enchant_load_seconds=None,
+            unexpected_words=[],
+            parity="skipped",
+        )
+        if expected is not None:
+            result["unexpected_words"] = sorted(words - expected)[:10]
+            result["missing_words"] = sorted(expected - words)[:10]
+            result["parity"] = "sample rules"
+        elif not use_fake_enchant:
+            enchant_load_seconds, dictionary = _time_enchant_load(tag)
+            result["enchant_load_seconds"] = enchant_load_seconds
+            if dictionary is not None:
+                checked = sorted(words)
+                if len(checked) > PARITY_SAMPLE_SIZE:
+                    checked = random.Random(0).sample(checked, PARITY_SAMPLE_SIZE)
+                result["unexpected_words"] = [word for word in checked if not dictionary.check(word)][:10]
+                result["parity"] = f"hunspell, {len(checked)} words"
+        del index
+        return result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main(argv):
+    result = run(argv[1] if len(argv) > 1 else None)
+    print(f"{result['language']}: {result['words']} words, {result['file_size'] / 1_000_000:.1f} MB")
+    print(f"  build              {result['build_seconds'] * 1000:10.1f} ms")
+    print(f"  build peak memory  {result['build_peak_memory'] / 1_000_000:10.1f} MB")
+    print(f"  open               {result['open_seconds'] * 1000:10.3f} ms")
+    if result["enchant_load_seconds"] is not None:
+        print(f"  enchant load       {result['enchant_load_seconds'] * 1000:10.1f} ms")
+    print(f"  lookup             {result['lookup_seconds'] * 1_000_000:10.2f} us")
+    print(f"  parity check: {result['parity']}")
+    failed = not result["all_found"] or bool(result["unexpected_words"]) or bool(result.get("missing_words"))
+    if not result["all_found"]:
+        print("  SOME INDEXED WORDS ARE NOT FOUND")
+    if result["unexpected_words"]:
+        print(f"  WORDS THAT SHOULD NOT BE INDEXED: {', '.join(result['unexpected_words'])}")
+    if result.get("missing_words"):
+        print(f"  WORDS MISSING FROM THE INDEX: {', '.join(result['missing_words'])}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
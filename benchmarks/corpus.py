@@ -0,0 +1,146 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Generated text corpora for the benchmarks.
+
+Words are made up from the letters of each language, so that corpora of any
+size can be produced without shipping text or dictionaries. Each corpus comes
+with the vocabulary it was built from, which doubles as the word list of the
+replacement enchant dictionary. A small share of the words are misspelled by
+changing one letter, and numbers and punctuation are mixed in the way they
+are in real documents. Thai is written without spaces between words.
+"""
+
+import random
+from collections import namedtuple
+
+
+# Languages from downloadable_languages.txt covering several scripts
+LANGUAGES = ("en", "de", "fr_FR", "ru_RU", "ar", "hi_IN", "th_TH")
+# Corpus sizes in bytes of UTF-8
+SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+# Share of words which are misspelled
+MISSPELLING_RATE = 0.03
+VOCABULARY_SIZE = 5000
+
+_LATIN = "abcdefghijklmnopqrstuvwxyz"
+_DEVANAGARI_CONSONANTS = "कखगघचछजझटठडढणतथदधनपफबभमयरलवशषसह"
+# Dependent vowel signs are combining marks
+_DEVANAGARI_VOWEL_SIGNS = "ािीुूेैोौं"
+
+_THAI_CONSONANTS = "กขคฆงจฉชซฌญฎฏฐฑฒณดตถทธนบปผพฟภมยรลวศษสหฬอฮ"
+# Vowel signs and tone marks written above or below the consonant are combining marks
+_THAI_MARKS = "ัิีึืุู่้๊๋"
+_THAI_VOWELS = "ะาำเแโใไ"
+# Languages whose words are not separated by spaces
+_UNSPACED = {"th_TH"}
+
+# lang_tag -> (letters, has_case)
+_ALPHABETS = {
+    "en": (_LATIN, True),
+    "de": (_LATIN + "äöüß", True),
+    "fr_FR": (_LATIN + "éèêàâçùûîïô", True),
+    "ru_RU": ("абвгдеёжзийклмнопрстуфхцчшщъыьэюя", True),
+    "ar": ("ابتثجحخدذرزسشصضطظعغفقكلمنهوي", False),
+    "hi_IN": (_DEVANAGARI_CONSONANTS, False),
+    "th_TH": (_THAI_CONSONANTS, False),
+}
+_SENTENCE_END = {
+    "ar": "؟.",
+    "hi_IN": "।?",
+    "th_TH": " ",
+}
+
+Corpus = namedtuple("Corpus", "lang_tag text vocabulary")
+
+
+def _make_word(rng, lang_tag, letters):
+    length = rng.randint(1, 5)
+    if lang_tag == "hi_IN":
+        syllables = []
+        for _i in range(length):
+            syllable = rng.choice(letters)
+            if rng.random() < 0.6:
+                syllable += rng.choice(_DEVANAGARI_VOWEL_SIGNS)
+            syllables.append(syllable)
+        return "".join(syllables)
+    if lang_tag == "th_TH":
+        syllables = []
+        for _i in range(length):
+            syllable = rng.choice(letters)
+            if rng.random() < 0.5:
+                syllable += rng.choice(_THAI_MARKS)
+            if rng.random() < 0.4:
+                syllable += rng.choice(_THAI_VOWELS)
+            syllables.append(syllable)
+        return "".join(syllables)
+    return "".join(rng.choice(letters) for _i in range(length + rng.randint(1, 4)))
+
+
+def make_vocabulary(lang_tag, size=VOCABULARY_SIZE, seed=0):
+    """Return `size` distinct made up words of `lang_tag`."""
+    rng = random.Random(f"{lang_tag}-vocabulary-{seed}")
+    letters, _has_case = _ALPHABETS[lang_tag]
+    vocabulary = set()
+    while len(vocabulary) < size:
+        vocabulary.add(_make_word(rng, lang_tag, letters))
+    return sorted(vocabulary)
+
+
+def _misspell(rng, word, letters, vocabulary):
+    for _attempt in range(10):
+        position = rng.randrange(len(word))
+        misspelled = word[:position] + rng.choice(letters) + word[position + 1 :]
+        if misspelled not in vocabulary:
+            return misspelled
+    return word + rng.choice(letters)
+
+
+def generate_corpus(lang_tag, size, misspelling_rate=MISSPELLING_RATE, seed=0):
+    """Generate about `size` bytes of UTF-8 text in `lang_tag`."""
+    rng = random.Random(f"{lang_tag}-{size}-{seed}")
+    letters, has_case = _ALPHABETS[lang_tag]
+    vocabulary = make_vocabulary(lang_tag, seed=seed)
+    vocabulary_set = set(vocabulary)
+    # A Zipf-like distribution: a few words are very common
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    sentence_end = _SENTENCE_END.get(lang_tag, ".!?")
+    paragraphs = []
+    byte_count = 0
+    while byte_count < size:
+        sentences = []
+        for _sentence in range(rng.randint(1, 6)):
+            words = rng.choices(vocabulary, weights, k=rng.randint(4, 20))
+            for index, word in enumerate(words):
+                if rng.random() < misspelling_rate:
+                    words[index] = _misspell(rng, word, letters, vocabulary_set)
+                elif rng.random() < 0.01:
+                    words[index] = str(rng.randint(1, 3000))
+            if has_case:
+                words[0] = words[0].capitalize()
+            if len(words) > 6 and rng.random() < 0.3:
+                words[rng.randrange(1, len(words) - 1)] += ","
+            separator = "" if lang_tag in _UNSPACED else " "
+            sentences.append(separator.join(words) + rng.choice(sentence_end))
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        byte_count += len(paragraph.encode("utf-8")) + 1
+    return Corpus(lang_tag, "\n".join(paragraphs), vocabulary)
+
+
+def format_size(size):
+    for unit, factor in (("MB", 1_000_000), ("KB", 1_000)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return f"{size}B"
+
+
+def parse_size(text):
+    text = text.strip().upper().rstrip("B")
+    for suffix, factor in (("M", 1_000_000), ("K", 1_000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
@@ -0,0 +1,181 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+A pure Python replacement for the enchant C library, backed by word lists.
+
+It is only registered when the real library cannot be found, so that the
+bundled enchant package (and the add-on code built on it) can run on
+machines without libenchant. It implements just enough of the `_enchant`
+binding for dictionaries to be requested, checked and asked for suggestions.
+Like libenchant, a broker hands out the same dictionary for every request of
+a tag until all of them are freed.
+Timings obtained with it measure the add-on's own overhead, not hunspell.
+"""
+
+import ctypes.util
+import os
+import sys
+import types
+
+
+_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+# tag -> set of words
+_WORD_LISTS = {}
+
+
+def register_word_list(tag, words):
+    """Make a dictionary for `tag` available with the given words."""
+    _WORD_LISTS[tag] = set(words)
+
+
+def is_real_enchant_available():
+    return any(
+        ctypes.util.find_library(name)
+        for name in ("enchant-2", "libenchant-2", "enchant", "libenchant")
+    ) or bool(os.environ.get("PYENCHANT_LIBRARY_PATH"))
+
+
+class _Broker:
+    def __init__(self):
+        self.error = None
+        # tag -> [dictionary, number of requests not yet freed], as libenchant shares them
+        self.dictionaries = {}
+
+
+class _Dictionary:
+    def __init__(self, tag, words):
+        self.tag = tag
+        self.words = words
+        self.session = set()
+        self.error = None
+
+    def check(self, word):
+        if word in self.words or word in self.session:
+            return True
+        lower = word.lower()
+        if word[:1].isupper() and (lower in self.words or lower in self.session):
+            return True
+        return False
+
+    def suggest(self, word):
+        """Words one edit away, the way simple spelling correctors do it."""
+        splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+        candidates = set()
+        for left, right in splits:
+            if right:
+                candidates.add(left + right[1:])
+                for letter in _LETTERS:
+                    candidates.add(left + letter + right[1:])
+            if len(right) > 1:
+                candidates.add(left + right[1] + right[0] + right[2:])
+            for letter in _LETTERS:
+                candidates.add(left + letter + right)
+        return sorted(c for c in candidates if c in self.words)[:10]
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _make_binding():
+    binding = types.ModuleType("enchant._enchant")
+
+    def broker_init():
+        return _Broker()
+
+    def broker_request_dict(broker, tag):
+        tag = _decode(tag)
+        words = _WORD_LISTS.get(tag)
+        if words is None:
+            broker.error = f"No dictionary for {tag}".encode()
+            return None
+        entry = broker.dictionaries.get(tag)
+        if entry is None:
+            entry = broker.dictionaries[tag] = [_Dictionary(tag, words), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def broker_free_dict(broker, dictionary):
+        entry = broker.dictionaries.get(dictionary.tag)
+        if entry is not None and entry[0] is dictionary:
+            entry[1] -= 1
+            if not entry[1]:
+                del broker.dictionaries[dictionary.tag]
+
+    def broker_dict_exists(broker, tag):
+        return int(_decode(tag) in _WORD_LISTS)
+
+    def broker_list_dicts(broker, callback):
+        for tag in _WORD_LISTS:
+            callback(tag.encode(), b"wordlist", b"Word list", b"")
+
+    def dict_describe(dictionary, callback):
+        callback(dictionary.tag.encode(), b"wordlist", b"Word list", b"")
+
+    def dict_check(dictionary, word):
+        return 0 if dictionary.check(_decode(word)) else 1
+
+    def dict_suggest(dictionary, word):
+        return [w.encode() for w in dictionary.suggest(_decode(word))]
+
+    def dict_add(dictionary, word):
+        dictionary.session.add(_decode(word))
+
+    def dict_remove(dictionary, word):
+        dictionary.session.discard(_decode(word))
+
+    def dict_is_added(dictionary, word):
+        return int(_decode(word) in dictionary.session)
+
+    def dict_is_removed(dictionary, word):
+        return 0
+
+    def noop(*args, **kwargs):
+        return None
+
+    binding.__dict__.update(
+        broker_init=broker_init,
+        broker_free=noop,
+        broker_get_error=lambda broker: broker.error,
+        broker_request_dict=broker_request_dict,
+        broker_request_pwl_dict=lambda broker, path: None,
+        broker_free_dict=broker_free_dict,
+        broker_dict_exists=broker_dict_exists,
+        broker_set_ordering=noop,
+        broker_describe=lambda broker, callback: callback(b"wordlist", b"Word list", b""),
+        broker_list_dicts=broker_list_dicts,
+        broker_get_param=lambda broker, name: None,
+        broker_set_param=noop,
+        dict_describe=dict_describe,
+        dict_check=dict_check,
+        dict_suggest=dict_suggest,
+        dict_add=dict_add,
+        dict_add_to_pwl=dict_add,
+        dict_add_to_session=dict_add,
+        dict_remove=dict_remove,
+        dict_remove_from_session=dict_remove,
+        dict_is_added=dict_is_added,
+        dict_is_removed=dict_is_removed,
+        dict_store_replacement=noop,
+        dict_get_error=lambda dictionary: dictionary.error,
+        get_version=lambda: b"fake",
+        set_prefix_dir=noop,
+        get_user_config_dir=lambda: b"",
+    )
+    return binding
+
+
+def install_if_needed():
+    """Register the replacement binding unless the real library is available.
+
+    Returns True if the replacement is in use.
+    """
+    if "enchant._enchant" in sys.modules:
+        return not is_real_enchant_available()
+    if is_real_enchant_available():
+        return False
+    sys.modules["enchant._enchant"] = _make_binding()
+    return True
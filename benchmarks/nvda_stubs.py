@@ -0,0 +1,172 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Stand-ins for the NVDA modules the add-on imports, so that its code can be
+imported and timed with a plain CPython outside NVDA.
+
+Only what the add-on touches at import time, or during the benchmarked code
+paths, is modelled. Anything else resolves to an inert placeholder class.
+When the enchant C library cannot be found, a pure Python replacement backed
+by word lists is registered instead (see `fake_enchant`).
+"""
+
+import builtins
+import importlib
+import os
+import sys
+import tempfile
+import types
+
+
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDON_DIRECTORY = os.path.join(REPO_DIRECTORY, "addon")
+PLUGIN_PACKAGE = "globalPlugins.spellcheck"
+
+
+class _Placeholder:
+    """Inert stand-in usable as a base class, a callable or a constant."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        return None
+
+    def __getattr__(self, name):
+        return _Placeholder()
+
+
+class _StubModule(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        placeholder = type(name, (_Placeholder,), {})
+        setattr(self, name, placeholder)
+        return placeholder
+
+
+def _noop(*args, **kwargs):
+    return None
+
+
+class _Log:
+    def __getattr__(self, name):
+        return _noop
+
+
+class _NVDAObject:
+    processID = 0
+    name = ""
+    description = ""
+    states = set()
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def getScript(self, gesture):
+        return None
+
+    def bindGesture(self, gestureIdentifier, scriptName):
+        pass
+
+    def removeGestureBinding(self, gestureIdentifier):
+        raise LookupError(gestureIdentifier)
+
+    def reportFocus(self):
+        pass
+
+    def event_gainFocus(self):
+        pass
+
+
+def _script(*args, **kwargs):
+    def decorator(func):
+        return func
+
+    return decorator
+
+
+def _make_module(name, **attributes):
+    module = _StubModule(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def _install_translation():
+    builtins._ = lambda text: text
+    builtins.ngettext = lambda singular, plural, count: singular if count == 1 else plural
+    builtins.pgettext = lambda context, text: text
+
+
+def install(config_path=None):
+    """Register the stand-in modules. Safe to call more than once."""
+    if "globalVars" in sys.modules and getattr(sys.modules["globalVars"], "_is_stub", False):
+        return
+    if config_path is None:
+        config_path = tempfile.mkdtemp(prefix="spellcheck-bench-")
+    _install_translation()
+    _make_module(
+        "globalVars",
+        _is_stub=True,
+        appArgs=types.SimpleNamespace(configPath=config_path),
+    )
+    _make_module("logHandler", log=_Log())
+    _make_module("addonHandler", initTranslation=_install_translation)
+    _make_module("scriptHandler", script=_script)
+    _make_module("tones", beep=_noop)
+    _make_module("nvwave", playWaveFile=_noop)
+    _make_module("ui", message=_noop)
+    _make_module("speech", speakMessage=_noop, speakObject=_noop, speakSpelling=_noop)
+    _make_module("eventHandler", queueEvent=_noop)
+    _make_module(
+        "queueHandler",
+        eventQueue=object(),
+        # Run queued functions at once: the benchmarks have no main loop
+        queueFunction=lambda queue, func, *args, **kwargs: func(*args, **kwargs),
+    )
+    _make_module(
+        "api",
+        getFocusObject=lambda: _NVDAObject(),
+        copyToClip=_noop,
+        getClipData=lambda: "",
+        setFocusObject=_noop,
+    )
+    _make_module(
+        "languageHandler",
+        getLanguageDescription=lambda tag: tag,
+        windowsLCIDToLocaleName=lambda lcid: "en_US",
+    )
+    _make_module(
+        "winUser",
+        getKeyboardLayout=lambda thread_id: 0x0409,
+        getForegroundWindow=lambda: 1,
+        getWindowThreadProcessID=lambda hwnd: (0, 0),
+    )
+    _make_module("controlTypes", OutputReason=_Placeholder())
+    nvda_objects = _make_module("NVDAObjects", NVDAObject=_NVDAObject)
+    nvda_objects.__path__ = []
+    behaviors = _make_module(
+        "NVDAObjects.behaviors",
+        EditableText=type("EditableText", (_NVDAObject,), {}),
+        EditableTextWithAutoSelectDetection=type("EditableTextWithAutoSelectDetection", (_NVDAObject,), {}),
+        EditableTextWithSuggestions=type("EditableTextWithSuggestions", (_NVDAObject,), {}),
+    )
+    nvda_objects.behaviors = behaviors
+    _make_module("globalPluginHandler", GlobalPlugin=type("GlobalPlugin", (_NVDAObject,), {}))
+    for name in ("wx", "gui", "textInfos", "keyboardHandler"):
+        _make_module(name)
+    from . import fake_enchant
+
+    fake_enchant.install_if_needed()
+    if ADDON_DIRECTORY not in sys.path:
+        sys.path.insert(0, ADDON_DIRECTORY)
+
+
+def import_plugin_module(name):
+    """Import a module of the add-on, e.g. "spellcheck_ui", with the stand-ins installed."""
+    install()
+    return importlib.import_module(f"{PLUGIN_PACKAGE}.{name}")
@@ -0,0 +1,349 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""
+Runs the benchmark suite of the check pipeline on generated corpora.
+
+For each language and corpus size, it times tokenization (also with
+enchant's own tokenizer, for comparison), checking, building the
+misspellings menu, splicing the accepted suggestions into the text, and
+computing suggestions. The peak memory used while checking is recorded
+next to the size of the text. Results are printed as a table and can be
+written as JSON, then compared against an earlier run to spot regressions.
+
+Usage:
+    python -m benchmarks.run [--quick] [--languages en,de] [--sizes 1K,1M]
+        [--output results.json] [--compare baseline.json] [--threshold 1.2]
+"""
+
+import argparse
+import array
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from . import nvda_stubs
+from . import corpus as corpus_module
+from . import bench_item_container
+
+
+QUICK_SIZES = (1_000, 10_000, 100_000)
+# Number of distinct misspellings whose suggestions are timed
+SUGGESTION_SAMPLE_SIZE = 50
+# A benchmark slower than the baseline by this factor is reported as a regression
+REGRESSION_THRESHOLD = 1.2
+# Benchmarks faster than this are too noisy to be compared
+MIN_COMPARABLE_SECONDS = 0.001
+
+
+def _repeat_for(size):
+    """Small corpora are timed several times, keeping the best run."""
+    if size <= 10_000:
+        return 5
+    if size <= 100_000:
+        return 3
+    return 1
+
+
+def _peak_memory(func):
+    """Return the peak of memory allocated by Python while running `func`, in bytes."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _best_of(repeat, func):
+    best = None
+    result = None
+    for _i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+class _Modules:
+    """The add-on modules, imported once the stand-ins are installed."""
+
+    def __init__(self):
+        self.check_engine = nvda_stubs.import_plugin_module("check_engine")
+        self.spellcheck_ui = nvda_stubs.import_plugin_module("spellcheck_ui")
+        self.suggestions = nvda_stubs.import_plugin_module("suggestions")
+        self.suggestion_cache = nvda_stubs.import_plugin_module("suggestion_cache")
+        self.language_dictionary = nvda_stubs.import_plugin_module("language_dictionary")
+        self.tokenizers = nvda_stubs.import_plugin_module("tokenizers")
+
+
+def install_dictionary_files(modules, lang_tag, vocabulary):
+    """Write `vocabulary` as a hunspell dictionary, where downloaded dictionaries go."""
+    directory = os.path.join(modules.language_dictionary.SPELLCHECK_DICTIONARIES_DIRECTORY, "hunspell")
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{lang_tag}.aff"), "w", encoding="utf-8") as file:
+        file.write("SET UTF-8\n")
+    with open(os.path.join(directory, f"{lang_tag}.dic"), "w", encoding="utf-8") as file:
+        file.write(f"{len(vocabulary)}\n")
+        file.writelines(f"{word}\n" for word in vocabulary)
+
+
+def get_dictionary(modules, lang_tag, vocabulary, use_fake_enchant):
+    install_dictionary_files(modules, lang_tag, vocabulary)
+    if use_fake_enchant:
+        from . import fake_enchant
+
+        fake_enchant.register_word_list(lang_tag, vocabulary)
+        modules.language_dictionary.invalidate_dictionary_cache(lang_tag)
+    return modules.language_dictionary.get_enchant_language_dictionary(lang_tag)
+
+
+def tokenize_text(modules, language_dictionary, text):
+    """Tokenize `text` the way the checking worker does."""
+    tokenizer = modules.tokenizers.get_tokenizer(language_dictionary.tag)
+    return sum(1 for _token in tokenizer(text))
+
+
+def tokenize_text_with_enchant(modules, language_dictionary, text):
+    """Tokenize `text` with enchant's own tokenizer, for comparison."""
+    tokenizer = modules.tokenizers.enchant_tokenize(language_dictionary.tag)
+    return sum(1 for _token in tokenizer(array.array("u", text)))
+
+
+def check_text(modules, language_dictionary, text, **job_options):
+    """Run a SpellcheckJob to completion and return it."""
+    done = threading.Event()
+    errors = []
+
+    def on_error(job, exception):
+        errors.append(exception)
+        done.set()
+
+    job = modules.check_engine.SpellcheckJob(
+        language_dictionary,
+        text,
+        on_done=lambda job: done.set(),
+        on_cancelled=lambda job: done.set(),
+        on_error=on_error,
+        **job_options,
+    )
+    job.start()
+    done.wait()
+    if errors:
+        raise errors[0]
+    return job
+
+
+def make_menu(modules, language_dictionary, text, misspellings):
+    return modules.spellcheck_ui.SpellCheckMenu(
+        name="Spelling Errors",
+        language_dictionary=language_dictionary,
+        text_to_process=text,
+        misspellings=misspellings,
+    )
+
+
+def accept_replacements(modules, menu):
+    """Accept a replacement for every misspelling of the menu."""
+    spellcheck_ui = modules.spellcheck_ui
+    for word in {item.original_misspelling for item in menu}:
+        choice = spellcheck_ui.SuggestionMenuItemObject(
+            choice_type=spellcheck_ui.UserChoiceType.SUGGESTION,
+            acceptance_callback=None,
+            parent=menu,
+            name=word[::-1],
+        )
+        menu.apply_choice_to_all(word, choice)
+
+
+def time_suggestions(modules, language_dictionary, words):
+    """Time computing suggestions for `words` without any cache."""
+    suggestions = modules.suggestions
+    prefetcher = suggestions.SuggestionPrefetcher(language_dictionary)
+    # The persistent cache would be warm after the first run: use one that keeps nothing
+    persistent_cache = suggestions.SUGGESTION_CACHE
+    cache_directory = tempfile.mkdtemp(prefix="spellcheck-suggestions-")
+    suggestions.SUGGESTION_CACHE = modules.suggestion_cache.PersistentSuggestionCache(
+        cache_directory, max_entries=0
+    )
+    try:
+        start = time.perf_counter()
+        for word in words:
+            prefetcher.get(word)
+        return time.perf_counter() - start
+    finally:
+        suggestions.SUGGESTION_CACHE = persistent_cache
+        shutil.rmtree(cache_directory, ignore_errors=True)
+
+
+def run_corpus(modules, corpus, size, use_fake_enchant):
+    lang_tag = corpus.lang_tag
+    text = corpus.text
+    language_dictionary = get_dictionary(modules, lang_tag, corpus.vocabulary, use_fake_enchant)
+    repeat = _repeat_for(size)
+    results = []
+
+    def record(name, seconds, **extra):
+        results.append(
+            dict(
+                benchmark=name,
+                language=lang_tag,
+                size=size,
+                seconds=seconds,
+                repeat=repeat,
+                **extra,
+            )
+        )
+
+    seconds, token_count = _best_of(
+        repeat, lambda: tokenize_text(modules, language_dictionary, text)
+    )
+    record("tokenize", seconds, tokens=token_count)
+    seconds, token_count = _best_of(
+        repeat, lambda: tokenize_text_with_enchant(modules, language_dictionary, text)
+    )
+    record("tokenize_enchant", seconds, tokens=token_count)
+    seconds, job = _best_of(repeat, lambda: check_text(modules, language_dictionary, text))
+    misspellings = job.misspellings
+    record(
+        "check",
+        seconds,
+        tokens=job.statistics.tokens,
+        misspellings=len(misspellings),
+        dictionary_lookups=job.statistics.dictionary_lookups,
+        text_bytes=sys.getsizeof(text),
+        peak_memory=_peak_memory(lambda: check_text(modules, language_dictionary, text)),
+    )
+    seconds, menu = _best_of(
+        repeat, lambda: make_menu(modules, language_dictionary, text, misspellings)
+    )
+    record("menu_construction", seconds, items=len(menu))
+    accept_replacements(modules, menu)
+    seconds, corrected_text = _best_of(repeat, menu.get_corrected_text)
+    record("corrected_text", seconds, characters=len(corrected_text))
+    words = list(dict.fromkeys(m.word for m in misspellings))[:SUGGESTION_SAMPLE_SIZE]
+    if words:
+        seconds = time_suggestions(modules, language_dictionary, words)
+        record("suggestions", seconds, words=len(words), per_word=seconds / len(words))
+    return results
+
+
+def run_item_container(item_count=bench_item_container.ITEM_COUNT):
+    return [
+        dict(benchmark=f"item_container.{name}", language=None, size=item_count, seconds=seconds, repeat=1)
+        for name, seconds in bench_item_container.run(item_count).items()
+    ]
+
+
+def run(languages=corpus_module.LANGUAGES, sizes=corpus_module.SIZES, progress=None):
+    """Run the whole suite and return its results as a JSON-serializable dict."""
+    from . import fake_enchant
+
+    nvda_stubs.install()
+    modules = _Modules()
+    use_fake_enchant = not fake_enchant.is_real_enchant_available()
+    results = []
+    skipped = []
+    for lang_tag in languages:
+        for size in sizes:
+            if progress is not None:
+                progress(f"{lang_tag} {corpus_module.format_size(size)}")
+            corpus = corpus_module.generate_corpus(lang_tag, size)
+            try:
+                results.extend(run_corpus(modules, corpus, size, use_fake_enchant))
+            except modules.language_dictionary.LanguageDictionaryNotAvailable:
+                skipped.append(lang_tag)
+                break
+    if progress is not None:
+        progress("item container")
+    results.extend(run_item_container())
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "enchant": "word lists" if use_fake_enchant else "libenchant",
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        },
+        "skipped_languages": skipped,
+        "results": results,
+    }
+
+
+def _result_key(result):
+    return (result["benchmark"], result["language"], result["size"])
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Return (result, baseline seconds, ratio) for every result slower than the baseline by `threshold`."""
+    baseline_seconds = {_result_key(r): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for result in results["results"]:
+        previous = baseline_seconds.get(_result_key(result))
+        if previous is None or max(previous, result["seconds"]) < MIN_COMPARABLE_SECONDS:
+            continue
+        ratio = result["seconds"] / previous if previous else float("inf")
+        if ratio > threshold:
+            regressions.append((result, previous, ratio))
+    return regressions
+
+
+def format_results(results):
+    lines = [f"{'benchmark':40} {'language':8} {'size':>8} {'time':>12}"]
+    for result in results["results"]:
+        size = result["size"]
+        size = corpus_module.format_size(size) if result["language"] else str(size)
+        lines.append(
+            f"{result['benchmark']:40} {result['language'] or '-':8} {size:>8} "
+            f"{result['seconds'] * 1000:9.2f} ms"
+        )
+    if results["skipped_languages"]:
+        lines.append(f"Skipped, no dictionary: {', '.join(results['skipped_languages'])}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--languages", help="comma separated language tags")
+    parser.add_argument("--sizes", help="comma separated corpus sizes, e.g. 1K,100K,10M")
+    parser.add_argument("--quick", action="store_true", help="only use corpora up to 100KB")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+    languages = args.languages.split(",") if args.languages else corpus_module.LANGUAGES
+    if args.sizes:
+        sizes = [corpus_module.parse_size(size) for size in args.sizes.split(",")]
+    else:
+        sizes = QUICK_SIZES if args.quick else corpus_module.SIZES
+    results = run(languages, sizes, progress=lambda text: print(f"Running {text}...", file=sys.stderr))
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        for result, previous, ratio in regressions:
+            print(
+                f"REGRESSION {result['benchmark']} {result['language'] or '-'} {result['size']}: "
+                f"{previous * 1000:.2f} ms -> {result['seconds'] * 1000:.2f} ms ({ratio:.2f}x)"
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
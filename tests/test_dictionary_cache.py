@@ -0,0 +1,110 @@
+# coding: utf-8
+
+# Copyright (c) 2021 Blind Pandas Team
+# This file is covered by the GNU General Public License.
+
+"""Tests of the cache of loaded dictionaries, run outside NVDA with the benchmark stand-ins."""
+
+import threading
+import time
+import unittest
+
+from benchmarks import fake_enchant, nvda_stubs
+
+
+# Seconds a test waits for a thread before deciding it is stuck
+TIMEOUT = 5
+
+
+class _BlockingCache:
+    """Makes a DictionaryCache whose preloads wait for `release` in the middle of loading."""
+
+    def __init__(self, language_dictionary):
+        self.loading = threading.Event()
+        self.release = threading.Event()
+        test = self
+
+        class BlockingCache(language_dictionary.DictionaryCache):
+            def _load(self, lang_tag):
+                if threading.current_thread().name == "preload":
+                    test.loading.set()
+                    test.release.wait(TIMEOUT)
+                return language_dictionary.enchant.request_dict(lang_tag)
+
+        self.cache = BlockingCache()
+
+
+class DictionaryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.language_dictionary = nvda_stubs.import_plugin_module("language_dictionary")
+        fake_enchant.register_word_list("xx_XX", ["word"])
+        fake_enchant.register_word_list("yy_YY", ["other"])
+        self.blocking = _BlockingCache(self.language_dictionary)
+        self.cache = self.blocking.cache
+
+    def _start(self, name, func, *args):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(func(*args)), name=name, daemon=True)
+        thread.start()
+        return thread, results
+
+    def test_requests_during_preload(self):
+        preload, preloaded = self._start("preload", self.cache.preload, "xx_XX")
+        self.assertTrue(self.blocking.loading.wait(TIMEOUT))
+        request, requested = self._start("request", self.cache.request, "xx_XX")
+        # Other languages must not wait for the preload
+        other, _other = self._start("other", self.cache.request, "yy_YY")
+        other.join(TIMEOUT)
+        self.assertFalse(other.is_alive())
+        self.blocking.release.set()
+        preload.join(TIMEOUT)
+        request.join(TIMEOUT)
+        self.assertFalse(preload.is_alive())
+        self.assertFalse(request.is_alive())
+        self.assertEqual(preloaded, [True])
+        # The preloaded dictionary, not one loaded a second time
+        self.assertIs(requested[0], self.cache.request("xx_XX"))
+
+    def test_handles_have_dictionaries_of_their_own(self):
+        dictionary = self.cache.request("xx_XX")
+        handles = self.cache.request_handles("xx_XX", 2)
+        # The underlying dictionaries, which a broker shares between the requests of a tag
+        instances = [dictionary._this] + [handle.dictionary._this for handle in handles]
+        self.assertEqual(len({id(instance) for instance in instances}), 3)
+        self.assertIsNot(handles[0].lock, handles[1].lock)
+        self.assertEqual(self.cache.request_handles("xx_XX", 1), handles[:1])
+
+    def test_dictionaries_of_a_tag_share_a_lock(self):
+        enchant = self.language_dictionary.enchant
+        get_dictionary_lock = self.language_dictionary.get_dictionary_lock
+        # Both wrap the one hunspell instance of the global broker
+        lock = get_dictionary_lock(self.cache.request("xx_XX"))
+        self.assertIs(get_dictionary_lock(enchant.request_dict("xx_XX")), lock)
+        self.assertIsNot(get_dictionary_lock(self.cache.request("yy_YY")), lock)
+
+    def test_idle_dictionaries_evicted_without_requests(self):
+        cache = self.language_dictionary.DictionaryCache(idle_timeout=0, eviction_interval=0.01)
+        cache.request("xx_XX")
+        cache.start_eviction()
+        try:
+            deadline = time.monotonic() + TIMEOUT
+            while "xx_XX" in cache and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertNotIn("xx_XX", cache)
+        finally:
+            cache.stop_eviction()
+
+    def test_invalidate_keeps_other_variants(self):
+        fake_enchant.register_word_list("xx", ["word"])
+        fake_enchant.register_word_list("xx_YY", ["word"])
+        for lang_tag in ("xx", "xx_XX", "xx_YY"):
+            self.cache.request(lang_tag)
+        self.cache.invalidate("xx_XX")
+        self.assertEqual([tag for tag in ("xx", "xx_XX", "xx_YY") if tag in self.cache], ["xx", "xx_YY"])
+        # Regional variants may have fallen back to the dictionary of the base language
+        self.cache.invalidate("xx")
+        self.assertEqual([tag for tag in ("xx", "xx_XX", "xx_YY") if tag in self.cache], [])
+
+
+if __name__ == "__main__":
+    unittest.main()